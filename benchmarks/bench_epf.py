@@ -0,0 +1,288 @@
+"""timing benchmarks for spudtr.epf on fake epochs data
+
+Run from the top-level directory:
+
+    python benchmarks/bench_epf.py
+
+"""
+
+import tempfile
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from spudtr import epf
+import spudtr.fake_epochs_data as fake_data
+
+
+def bench_epochs_QC(n_epochs_list=(250, 500, 1000, 2000, 4000), n_samples=375):
+    """time epf._epochs_QC as the number of epochs grows, should be ~linear"""
+
+    print(f"epf._epochs_QC n_samples={n_samples}")
+    print(f"{'n_epochs':>10} {'n_rows':>10} {'seconds':>10} {'us/row':>10}")
+    for n_epochs in n_epochs_list:
+        epochs_df, channels = fake_data._generate(
+            n_epochs=n_epochs,
+            n_samples=n_samples,
+            n_categories=1,
+            n_channels=32,
+            seed=0,
+        )
+        secs = min(
+            timeit.repeat(
+                lambda: epf._epochs_QC(epochs_df, channels), number=1, repeat=3
+            )
+        )
+        n_rows = len(epochs_df)
+        print(f"{n_epochs:>10} {n_rows:>10} {secs:>10.4f} {1e6 * secs / n_rows:>10.4f}")
+
+
+def bench_layout_reuse(n_epochs=2000, n_samples=375):
+    """time a chain of transforms with and without the cached layout"""
+
+    epochs_df, channels = fake_data._generate(
+        n_epochs=n_epochs,
+        n_samples=n_samples,
+        n_categories=1,
+        n_channels=32,
+        seed=0,
+    )
+
+    def chain(epochs_df):
+        for _ in range(5):
+            epochs_df = epf.center_eeg(epochs_df, channels, 0, 100)
+        return epochs_df
+
+    def chain_no_cache(epochs_df):
+        for _ in range(5):
+            epochs_df.spudtr.layout(refresh=True)
+            epochs_df = epf.center_eeg(epochs_df, channels, 0, 100)
+        return epochs_df
+
+    print(f"5 x epf.center_eeg n_epochs={n_epochs} n_samples={n_samples}")
+    for label, func in [("cached layout", chain), ("re-validate", chain_no_cache)]:
+        secs = min(timeit.repeat(lambda: func(epochs_df), number=1, repeat=3))
+        print(f"{label:>15} {secs:>10.4f}")
+
+
+def bench_fir_filter_epochs(n_epochs=1000, n_samples=375, n_channels=32):
+    """time end to end column filtering vs. batched epoch by epoch filtering"""
+
+    epochs_df, channels = fake_data._generate(
+        n_epochs=n_epochs,
+        n_samples=n_samples,
+        n_categories=1,
+        n_channels=n_channels,
+        seed=0,
+    )
+    _fp = dict(
+        ftype="lowpass",
+        cutoff_hz=20,
+        width_hz=5,
+        ripple_db=60,
+        window="kaiser",
+        sfreq=250,
+    )
+    print(f"epf.fir_filter_epochs n_epochs={n_epochs} n_samples={n_samples}")
+    for by_epoch in [False, True]:
+        secs = min(
+            timeit.repeat(
+                lambda: epf.fir_filter_epochs(
+                    epochs_df, channels, by_epoch=by_epoch, **_fp
+                ),
+                number=1,
+                repeat=3,
+            )
+        )
+        print(f"{'by_epoch=' + str(by_epoch):>15} {secs:>10.4f}")
+
+
+def bench_resample_epochs(n_epochs=1000, n_samples=500, n_channels=32):
+    """time 4x decimation and a downstream transform at each rate"""
+
+    epochs_df, channels = fake_data._generate(
+        n_epochs=n_epochs,
+        n_samples=n_samples,
+        n_categories=1,
+        n_channels=n_channels,
+        seed=0,
+    )
+    secs = min(
+        timeit.repeat(
+            lambda: epf.resample_epochs(epochs_df, channels, 125.0, sfreq=500.0),
+            number=1,
+            repeat=3,
+        )
+    )
+    print(f"epf.resample_epochs 500 -> 125 Hz n_epochs={n_epochs} {secs:>10.4f}")
+
+    res_df = epf.resample_epochs(epochs_df, channels, 125.0, sfreq=500.0)
+    print("epf.center_eeg")
+    for label, _df in [("500 Hz", epochs_df), ("125 Hz", res_df)]:
+        secs = min(
+            timeit.repeat(
+                lambda: epf.center_eeg(_df, channels, 0, 100), number=1, repeat=3
+            )
+        )
+        mb = _df.memory_usage(deep=True).sum() / 2**20
+        print(f"{label:>15} {secs:>10.4f} {mb:>10.1f} MB")
+
+
+def bench_center_eeg_modes(n_epochs=2000, n_samples=375, n_channels=32):
+    """time the baseline modes vs. the same statistic with pandas groupby"""
+
+    epochs_df, channels = fake_data._generate(
+        n_epochs=n_epochs,
+        n_samples=n_samples,
+        n_categories=1,
+        n_channels=n_channels,
+        seed=0,
+    )
+    epochs_df.loc[epochs_df.index[::97], channels] = np.nan  # masked samples
+    start, stop = 0, 100
+    in_baseline = epochs_df["time"].between(start, stop, inclusive="left")
+
+    def groupby_baseline(mode):
+        baseline = epochs_df[in_baseline].groupby("epoch_id")[channels]
+        stat = "median" if mode == "median" else "mean"
+        epoch_ids = epochs_df["epoch_id"]
+        centered = epochs_df[channels] - baseline.agg(stat).loc[epoch_ids].to_numpy()
+        if mode == "zscore":
+            centered /= baseline.std(ddof=0).loc[epoch_ids].to_numpy()
+        return centered
+
+    print(f"epf.center_eeg n_epochs={n_epochs} n_samples={n_samples}")
+    print(f"{'mode':>15} {'center_eeg':>10} {'groupby':>10}")
+    for mode in epf.BASELINE_MODES:
+        secs = min(
+            timeit.repeat(
+                lambda: epf.center_eeg(epochs_df, channels, start, stop, mode=mode),
+                number=1,
+                repeat=3,
+            )
+        )
+        groupby = ""
+        if mode in ["nanmean", "median", "zscore"]:
+            groupby_secs = min(
+                timeit.repeat(lambda: groupby_baseline(mode), number=1, repeat=3)
+            )
+            groupby = f"{groupby_secs:.4f}"
+        print(f"{mode:>15} {secs:>10.4f} {groupby:>10}")
+
+
+def bench_re_reference(n_epochs=1000, n_samples=375, n_channels_list=(32, 128)):
+    """time three references one at a time vs. all at once"""
+
+    print(f"epf.re_reference n_epochs={n_epochs} n_samples={n_samples}")
+    print(f"{'n_channels':>10} {'3 x re_reference':>17} {'re_reference_many':>18}")
+    for n_channels in n_channels_list:
+        epochs_df, channels = fake_data._generate(
+            n_epochs=n_epochs,
+            n_samples=n_samples,
+            n_categories=1,
+            n_channels=n_channels,
+            seed=0,
+        )
+        references = {
+            "linked_pair": (channels[1:], channels[:1], "linked_pair"),
+            "common_average": (channels, channels, "common_average"),
+            "new_common": (channels, channels[n_channels // 2], "new_common"),
+        }
+        secs = [
+            min(timeit.repeat(func, number=1, repeat=3))
+            for func in [
+                lambda: [
+                    epf.re_reference(epochs_df, *args) for args in references.values()
+                ],
+                lambda: epf.re_reference_many(epochs_df, references),
+            ]
+        ]
+        print("{:>10} {:>17.4f} {:>18.4f}".format(n_channels, *secs))
+
+
+def bench_transforms_memory(n_epochs=1000, n_samples=375, n_channels=32):
+    """peak memory of a chain of four transforms, copies vs. inplace"""
+
+    epochs_df, channels = fake_data._generate(
+        n_epochs=n_epochs,
+        n_samples=n_samples,
+        n_categories=1,
+        n_channels=n_channels,
+        seed=0,
+    )
+    epochs_df["bads"] = 0
+    _fp = dict(
+        ftype="lowpass",
+        cutoff_hz=20,
+        width_hz=5,
+        ripple_db=60,
+        window="kaiser",
+        sfreq=250,
+    )
+
+    def chain(epochs_df):
+        epochs_df = epf.center_eeg(epochs_df, channels, 0, 100)
+        epochs_df = epf.re_reference(epochs_df, channels, channels, "common_average")
+        epochs_df = epf.fir_filter_epochs(epochs_df, channels, **_fp)
+        return epf.drop_bad_epochs(epochs_df, "bads", time="time")
+
+    def chain_inplace(epochs_df):
+        epf.center_eeg(epochs_df, channels, 0, 100, inplace=True)
+        epf.re_reference(epochs_df, channels, channels, "common_average", inplace=True)
+        epf.fir_filter_epochs(epochs_df, channels, inplace=True, **_fp)
+        return epf.drop_bad_epochs(epochs_df, "bads", time="time")
+
+    mb = epochs_df.memory_usage(deep=True).sum() / 2**20
+    print(f"4 transforms n_epochs={n_epochs} epochs_df {mb:.1f} MB")
+    print(f"{'':>15} {'seconds':>10} {'peak MB':>10} {'x epochs_df':>12}")
+    for label, func in [("copies", chain), ("inplace", chain_inplace)]:
+        _epochs_df = epochs_df.copy()
+        tracemalloc.start()
+        start = time.perf_counter()
+        func(_epochs_df)
+        secs = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        print(f"{label:>15} {secs:>10.4f} {peak:>10.1f} {peak / mb:>12.2f}")
+
+
+def bench_read_epochs(n_epochs=2000, n_samples=750, n_channels=32):
+    """time reading 1 of n_channels from uncompressed and lz4 files"""
+
+    epochs_df, channels = fake_data._generate(
+        n_epochs=n_epochs,
+        n_samples=n_samples,
+        n_categories=1,
+        n_channels=n_channels,
+        seed=0,
+    )
+    print(f"epf.read_epochs n_epochs={n_epochs} n_samples={n_samples}")
+    print(f"{'compression':>15} {'all':>10} {'1 channel':>10} {'pd.read_feather':>16}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for compression in ["uncompressed", "lz4"]:
+            epochs_f = Path(tmp_dir) / f"{compression}.epochs.feather"
+            epochs_df.to_feather(epochs_f, compression=compression)
+            secs = [
+                min(timeit.repeat(read, number=1, repeat=5))
+                for read in [
+                    lambda: epf.read_epochs(epochs_f),
+                    lambda: epf.read_epochs(epochs_f, columns=channels[:1]),
+                    lambda: pd.read_feather(epochs_f),
+                ]
+            ]
+            print("{:>15} {:>10.4f} {:>10.4f} {:>16.4f}".format(compression, *secs))
+
+
+if __name__ == "__main__":
+    bench_epochs_QC()
+    bench_layout_reuse()
+    bench_fir_filter_epochs()
+    bench_resample_epochs()
+    bench_center_eeg_modes()
+    bench_re_reference()
+    bench_transforms_memory()
+    bench_read_epochs()
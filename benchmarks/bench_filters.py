@@ -0,0 +1,113 @@
+"""timing benchmarks for spudtr.filters
+
+Run from the top-level directory:
+
+    python benchmarks/bench_filters.py
+
+"""
+
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from spudtr import filters
+
+
+def bench_engines(
+    n_samples_list=(375, 37_500, 375_000),
+    width_hz_list=(10.0, 5.0, 2.0, 1.0, 0.5),
+    n_channels=32,
+):
+    """time the FIR convolution engines by filter length and data length"""
+
+    rng = np.random.default_rng(0)
+    engines = [engine for engine in filters.ENGINES if engine != "auto"]
+    print(f"filters._apply_firwin_filter_data n_channels={n_channels}")
+    print(
+        f"{'n_samples':>10} {'n_taps':>8}"
+        + "".join(f"{engine:>13}" for engine in engines)
+        + f"{'auto':>13}"
+    )
+    for n_samples in n_samples_list:
+        data = rng.normal(size=(n_channels, n_samples))
+        for width_hz in width_hz_list:
+            taps = filters._design_firwin_filter(
+                ftype="highpass",
+                cutoff_hz=2.0 * width_hz,
+                sfreq=250.0,
+                width_hz=width_hz,
+                ripple_db=53.0,
+                window="kaiser",
+            )
+            if len(taps) // 2 > n_samples:
+                continue
+            secs = [
+                min(
+                    timeit.repeat(
+                        lambda: filters._apply_firwin_filter_data(
+                            data, taps, axis=1, engine=engine
+                        ),
+                        number=1,
+                        repeat=3,
+                    )
+                )
+                for engine in engines
+            ]
+            auto = filters._choose_engine(n_samples, len(taps))
+            print(
+                f"{n_samples:>10} {len(taps):>8}"
+                + "".join(f"{sec:>13.4f}" for sec in secs)
+                + f"{auto:>13}"
+            )
+
+
+def bench_multirate(
+    cutoff_hz_list=(0.1, 0.5, 1.0, 5.0),
+    n_samples=250_000,
+    n_channels=32,
+):
+    """time full rate vs. multirate slow drift highpass filtering"""
+
+    rng = np.random.default_rng(0)
+    dt = pd.DataFrame(
+        np.cumsum(rng.normal(size=(n_samples, n_channels)), axis=0)
+    ).add_prefix("ch")
+    print(
+        f"filters.fir_filter_dt highpass n_samples={n_samples} n_channels={n_channels}"
+    )
+    print(
+        f"{'cutoff_hz':>10} {'n_taps':>8} {'q':>6} {'full rate':>12} {'multirate':>12}"
+    )
+    for cutoff_hz in cutoff_hz_list:
+        _params = dict(
+            ftype="highpass",
+            cutoff_hz=cutoff_hz,
+            sfreq=500.0,
+            width_hz=cutoff_hz,
+            ripple_db=53.0,
+            window="kaiser",
+        )
+        n_taps = len(filters._design_firwin_filter(**_params))
+        q = filters._multirate_factor(**_params)
+        secs = [
+            min(
+                timeit.repeat(
+                    lambda: filters.fir_filter_dt(
+                        dt, dt.columns, multirate=multirate, **_params
+                    ),
+                    number=1,
+                    repeat=3,
+                )
+            )
+            for multirate in [False, True]
+        ]
+        print(
+            f"{cutoff_hz:>10} {n_taps:>8} {q:>6}"
+            + "".join(f"{sec:>13.4f}" for sec in secs)
+        )
+
+
+if __name__ == "__main__":
+    bench_engines()
+    bench_multirate()
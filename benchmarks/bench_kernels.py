@@ -0,0 +1,69 @@
+"""timing benchmarks for the compiled vs. pure Python epochs kernels
+
+Build the extension in place first, then run from the top-level directory:
+
+    python setup.py build_ext --inplace
+    python benchmarks/bench_kernels.py
+
+"""
+
+import timeit
+
+import numpy as np
+
+from spudtr import _kernels, filters
+
+try:
+    from spudtr import _spudtr
+except ImportError:
+    _spudtr = None
+
+
+def bench_kernels(n_epochs=2000, n_times=375, n_streams=32):
+    """time each kernel both ways on the same data"""
+
+    if _spudtr is None:
+        print("spudtr._spudtr extension is not built, nothing to compare")
+        return
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(n_epochs, n_times, n_streams))
+    series = rng.normal(size=(n_streams, 250 * 600))
+    taps = filters._design_firwin_filter(
+        ftype="bandpass",
+        cutoff_hz=[0.5, 20.0],
+        sfreq=250.0,
+        width_hz=1.0,
+        ripple_db=53.0,
+        window="kaiser",
+    )
+
+    # shuffled rows of an epochs data frame
+    order = rng.permutation(n_epochs * n_times)
+    epoch_codes = np.repeat(np.arange(n_epochs), n_times)[order]
+    time_codes = np.tile(np.arange(n_times), n_epochs)[order]
+
+    benches = [
+        ("baseline_means", lambda k: k.baseline_means(data, 0, 100)),
+        ("peak_to_peak", lambda k: k.peak_to_peak(data, 0, n_times)),
+        (
+            "grid_rows",
+            lambda k: k.grid_rows(epoch_codes, time_codes, n_epochs, n_times),
+        ),
+        (f"fir_symmetric {len(taps)} taps", lambda k: k.fir_symmetric(series, taps)),
+    ]
+
+    print(f"kernels n_epochs={n_epochs} n_times={n_times} n_streams={n_streams}")
+    print(f"{'kernel':>30} {'python':>10} {'compiled':>10} {'speedup':>10}")
+    for label, func in benches:
+        secs = [
+            min(timeit.repeat(lambda: func(kernels), number=1, repeat=3))
+            for kernels in [_kernels, _spudtr]
+        ]
+        print(
+            f"{label:>30} {secs[0]:>10.4f} {secs[1]:>10.4f} {secs[0] / secs[1]:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    bench_kernels()
@@ -0,0 +1,133 @@
+"""timing benchmarks for spudtr.mneutils on fake epochs data
+
+Run from the top-level directory:
+
+    python benchmarks/bench_mneutils.py
+
+"""
+
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from spudtr import epf, mneutils, RESOURCES_DIR
+import spudtr.fake_epochs_data as fake_data
+
+EEG_STREAMS = ["MiPf", "MiCe", "MiPa", "MiOc", "LLPf", "RLPf", "LMPf", "RMPf"]
+
+
+def _fake_epochs_df(n_epochs, n_samples):
+    epochs_df, channels = fake_data._generate(
+        n_epochs=n_epochs,
+        n_samples=n_samples,
+        n_categories=1,
+        n_channels=len(EEG_STREAMS),
+        time="time_ms",
+        seed=0,
+    )
+    return epochs_df.rename(columns=dict(zip(channels, EEG_STREAMS)))
+
+
+def _loop_epochs_data(epochs_df, layout):
+    # the old EpochsSpudtr path, one boolean mask over the frame per epoch
+    epochs_data = []
+    for epoch_i in layout.epoch_ids:
+        epoch1 = epochs_df[EEG_STREAMS][epochs_df.epoch_id == epoch_i].to_numpy()
+        epochs_data.append(epoch1.T)
+    return np.array(epochs_data)
+
+
+def _reshape_epochs_data(epochs_df, layout):
+    return epf._epochs_data(epochs_df, EEG_STREAMS, layout).transpose(0, 2, 1)
+
+
+def bench_epochs_data(n_epochs_list=(250, 500, 1000, 2000), n_samples=750):
+    """time building the MNE epochs array, per-epoch loop vs. one reshape"""
+
+    print(f"EpochsSpudtr epochs data n_samples={n_samples}")
+    print(f"{'n_epochs':>10} {'loop':>10} {'reshape':>10}")
+    for n_epochs in n_epochs_list:
+        epochs_df = _fake_epochs_df(n_epochs, n_samples)
+        layout = epf.check_epochs(epochs_df, EEG_STREAMS, time="time_ms")
+        secs = [
+            min(timeit.repeat(lambda: func(epochs_df, layout), number=1, repeat=3))
+            for func in [_loop_epochs_data, _reshape_epochs_data]
+        ]
+        print(f"{n_epochs:>10}" + "".join(f"{sec:>11.4f}" for sec in secs))
+
+
+def bench_read_spudtr_epochs(n_epochs_list=(500, 1000, 3000), n_samples=750):
+    """time end to end conversion of a feather file to mne.Epochs"""
+
+    print(f"mneutils.read_spudtr_epochs n_samples={n_samples}")
+    print(f"{'n_epochs':>10} {'seconds':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_epochs in n_epochs_list:
+            input_fname = Path(tmp_dir) / f"fake{n_epochs}.epochs.feather"
+            epochs_df = _fake_epochs_df(n_epochs, n_samples)
+            # wide string metadata like the real files, not read
+            epochs_df["dblock_path"] = "sub000/dblock_0/" + epochs_df[
+                "epoch_id"
+            ].astype(str)
+            epochs_df["log_evcodes"] = epochs_df["time_ms"].astype(str) + ",1,0"
+            epochs_df.to_feather(input_fname)
+            secs = min(
+                timeit.repeat(
+                    lambda: mneutils.read_spudtr_epochs(
+                        input_fname,
+                        EEG_STREAMS,
+                        RESOURCES_DIR / "mne_32chan_xyz_spherical.yml",
+                        "categorical",
+                        0,
+                        "epoch_id",
+                        "time_ms",
+                        0.002,
+                    ),
+                    number=1,
+                    repeat=3,
+                )
+            )
+            print(f"{n_epochs:>10} {secs:>10.4f}")
+
+
+def bench_to_spudtr_epochs(n_epochs_list=(1000, 10000, 100000), n_samples=50):
+    """time MNE Epochs to spudtr epochs_df vs. Epochs.to_data_frame"""
+    import mne
+
+    print(f"mneutils.to_spudtr_epochs n_samples={n_samples}")
+    print(f"{'n_epochs':>10} {'seconds':>10} {'to_data_frame':>14}")
+    info = mne.create_info(EEG_STREAMS, sfreq=500.0, ch_types="eeg")
+    rng = np.random.default_rng(0)
+    for n_epochs in n_epochs_list:
+        events = np.zeros((n_epochs, 3), dtype=int)
+        events[:, 0] = np.arange(n_epochs)
+        events[:, 2] = rng.integers(1, 4, n_epochs)
+        epochs = mne.EpochsArray(
+            rng.standard_normal((n_epochs, len(EEG_STREAMS), n_samples)),
+            info,
+            events=events,
+            tmin=-0.02,
+            metadata=pd.DataFrame({"stim": rng.choice(["a", "b"], n_epochs)}),
+        )
+        secs = min(
+            timeit.repeat(lambda: mneutils.to_spudtr_epochs(epochs), number=1, repeat=3)
+        )
+        # much slower, skip the big ones
+        to_df_secs = float("nan")
+        if n_epochs <= 10000:
+            to_df_secs = min(
+                timeit.repeat(lambda: epochs.to_data_frame(), number=1, repeat=3)
+            )
+        print(f"{n_epochs:>10} {secs:>10.4f} {to_df_secs:>14.4f}")
+
+
+if __name__ == "__main__":
+    import mne
+
+    mne.set_log_level("WARNING")
+    bench_epochs_data()
+    bench_read_spudtr_epochs()
+    bench_to_spudtr_epochs()
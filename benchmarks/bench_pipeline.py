@@ -0,0 +1,81 @@
+"""timing benchmarks for spudtr.pipeline on fake epochs data
+
+Run from the top-level directory:
+
+    python benchmarks/bench_pipeline.py
+
+"""
+
+import timeit
+import tracemalloc
+
+from spudtr import epf
+from spudtr.pipeline import Pipeline
+import spudtr.fake_epochs_data as fake_data
+
+
+def bench_pipeline(n_epochs=2000, n_samples=375, n_channels=32):
+    """epf transforms one at a time vs. a fused Pipeline, time and peak memory"""
+
+    epochs_df, channels = fake_data._generate(
+        n_epochs=n_epochs,
+        n_samples=n_samples,
+        n_categories=1,
+        n_channels=n_channels,
+        seed=0,
+    )
+    epochs_df["bads"] = (epochs_df["epoch_id"] % 10 == 0).astype(int)
+    _fp = dict(
+        ftype="lowpass",
+        cutoff_hz=20,
+        width_hz=5,
+        ripple_db=60,
+        window="kaiser",
+        sfreq=250,
+    )
+
+    def chain(epochs_df, resample):
+        epochs_df = epf.re_reference(epochs_df, channels, channels, "common_average")
+        epochs_df = epf.center_eeg(epochs_df, channels, 0, 100)
+        epochs_df = epf.drop_bad_epochs(epochs_df, "bads", time="time")
+        epochs_df = epf.fir_filter_epochs(epochs_df, channels, by_epoch=True, **_fp)
+        if resample:
+            epochs_df = epf.resample_epochs(epochs_df, channels, 125, sfreq=250)
+        return epochs_df
+
+    def pipeline(resample):
+        pipe = (
+            Pipeline(channels)
+            .re_reference(channels, channels, "common_average")
+            .center_eeg(channels, 0, 100)
+            .drop_bad_epochs("bads")
+            .fir_filter_epochs(channels, by_epoch=True, **_fp)
+        )
+        if resample:
+            pipe.resample_epochs(125, sfreq=250)
+        return pipe
+
+    print(f"4-5 transforms n_epochs={n_epochs} n_channels={n_channels}")
+    print(f"{'':>20} {'seconds':>10} {'peak MB':>10}")
+    for resample in [False, True]:
+        pipe = pipeline(resample)
+        for label, func in [
+            ("epf", lambda: chain(epochs_df, resample)),
+            ("Pipeline", lambda: pipe.run(epochs_df)),
+        ]:
+            func()  # warm up the layout cache
+            secs = min(timeit.repeat(func, number=1, repeat=3))
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            label = f"{label}{' resample' if resample else ''}"
+            print(f"{label:>20} {secs:>10.4f} {peak:>10.1f}")
+
+        pipe.run(epochs_df)  # stage times without tracemalloc
+        for stage, secs in pipe.stage_seconds.items():
+            print(f"{stage:>40} {secs:>10.4f}")
+
+
+if __name__ == "__main__":
+    bench_pipeline()
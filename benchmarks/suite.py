@@ -0,0 +1,445 @@
+"""performance regression suite for the spudtr public functions
+
+Sweeps n_epochs, n_times, n_streams and the filter length over
+synthetic data from fake_epochs_data.generate_epochs and records the
+wall time and peak memory of each case. The spudtr in this checkout is
+benchmarked, installed or not:
+
+    python benchmarks/suite.py run -o baseline.json
+    ... change things ...
+    python benchmarks/suite.py run -o results.json
+    python benchmarks/suite.py compare baseline.json results.json
+
+The wall time is the best of --repeat runs. The peak memory is taken
+from a separate run, once with tracemalloc for the Python and numpy
+allocations and once as the growth of the process peak RSS, reset
+before the run through /proc/self/clear_refs (Linux only, otherwise
+null). The RSS growth depends on what the allocator already holds so
+it is recorded but only compared with --rss. compare exits 1 if any
+case is slower or bigger than the baseline by more than --threshold,
+so it can gate CI.
+
+The import.* cases time importing spudtr modules in a fresh
+interpreter, once per run rather than per size, to catch heavy
+dependencies creeping back into the import path. They record the
+wall time only.
+
+Results are machine specific, compare runs from the same machine.
+"""
+
+import argparse
+import datetime
+import fnmatch
+import gc
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# run from a checkout without installing spudtr, an installed spudtr
+# is shadowed by the checkout
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import spudtr  # noqa: E402
+from spudtr import epf, filters, RESOURCES_DIR  # noqa: E402
+import spudtr.fake_epochs_data as fake_data  # noqa: E402
+from spudtr.pipeline import Pipeline  # noqa: E402
+
+EEG_LOCATIONS_F = RESOURCES_DIR / "mne_32chan_xyz_spherical.yml"
+SFREQ = 250.0
+
+# (n_epochs, n_times, n_streams) swept for every case, --quick uses the
+# first of each
+GRID = dict(n_epochs=(200, 2000), n_times=(250, 750), n_streams=(8, 32))
+WIDTHS_HZ = (5.0, 1.0)  # filter transition bands, ~150 and ~750 taps
+
+
+def _cap_streams(n_streams):
+    """channel names with locations in the default cap, for MNE"""
+    with open(EEG_LOCATIONS_F) as stream:
+        sensors = [
+            sensor for sensor in yaml.safe_load(stream)["sensors"] if sensor != "gnd"
+        ]
+    if n_streams > len(sensors):
+        raise ValueError(f"the cap has only {len(sensors)} sensors")
+    return sensors[:n_streams]
+
+
+def _epochs_df(n_epochs, n_times, n_streams):
+    chunks, channels = fake_data.generate_epochs(
+        n_epochs,
+        n_times,
+        n_streams,
+        sfreq=SFREQ,
+        chunk_epochs=n_epochs,
+        dtype=np.float64,
+        seed=0,
+    )
+    streams = _cap_streams(n_streams)
+    epochs_df = next(chunks).rename(columns=dict(zip(channels, streams)))
+    return epochs_df, streams
+
+
+def _filter_params(width_hz):
+    return dict(
+        ftype="bandpass",
+        cutoff_hz=[2.0 * width_hz, 30.0],
+        width_hz=width_hz,
+        ripple_db=53.0,
+        window="kaiser",
+        sfreq=SFREQ,
+    )
+
+
+# each case sets up the data for the sizes and returns the call to time
+def _check_epochs(epochs_df, streams, tmp_dir):
+    return lambda: epf.check_epochs(epochs_df, streams)
+
+
+def _center_eeg(epochs_df, streams, tmp_dir, mode):
+    return lambda: epf.center_eeg(epochs_df, streams, -200, 0, mode=mode)
+
+
+def _drop_bad_epochs(epochs_df, streams, tmp_dir):
+    return lambda: epf.drop_bad_epochs(epochs_df, "eeg_artifact", time=epf.TIME)
+
+
+def _peak_to_peak(epochs_df, streams, tmp_dir):
+    return lambda: epf.peak_to_peak(epochs_df, streams)
+
+
+def _re_reference(epochs_df, streams, tmp_dir):
+    return lambda: epf.re_reference(epochs_df, streams, streams, "common_average")
+
+
+def _re_reference_many(epochs_df, streams, tmp_dir):
+    references = {
+        "linked_pair": (streams[1:], streams[:1], "linked_pair"),
+        "common_average": (streams, streams, "common_average"),
+        "new_common": (streams, streams[-1], "new_common"),
+    }
+    return lambda: epf.re_reference_many(epochs_df, references)
+
+
+def _resample_epochs(epochs_df, streams, tmp_dir):
+    return lambda: epf.resample_epochs(epochs_df, streams, SFREQ / 2, sfreq=SFREQ)
+
+
+def _read_epochs(epochs_df, streams, tmp_dir):
+    epochs_f = Path(tmp_dir) / "epochs.feather"
+    epochs_df.to_feather(epochs_f, compression="uncompressed")
+    return lambda: epf.read_epochs(epochs_f, columns=streams[:1])
+
+
+def _fir_filter_epochs(epochs_df, streams, tmp_dir, width_hz):
+    _fp = _filter_params(width_hz)
+    return lambda: epf.fir_filter_epochs(epochs_df, streams, **_fp)
+
+
+def _fir_filter_dt(epochs_df, streams, tmp_dir, width_hz):
+    _fp = _filter_params(width_hz)
+    return lambda: filters.fir_filter_dt(epochs_df, streams, **_fp)
+
+
+def _fir_filter_data(epochs_df, streams, tmp_dir, width_hz):
+    data, _fp = epochs_df[streams[0]].to_numpy(), _filter_params(width_hz)
+    return lambda: filters.fir_filter_data(data, **_fp)
+
+
+def _pipeline(epochs_df, streams, tmp_dir):
+    pipe = (
+        Pipeline(streams)
+        .re_reference(streams, streams, "common_average")
+        .center_eeg(streams, -200, 0)
+        .drop_bad_epochs("eeg_artifact")
+        .fir_filter_epochs(streams, by_epoch=True, **_filter_params(WIDTHS_HZ[0]))
+    )
+    return lambda: pipe.run(epochs_df)
+
+
+def _read_spudtr_epochs(epochs_df, streams, tmp_dir):
+    from spudtr import mneutils
+
+    return lambda: mneutils.read_spudtr_epochs(
+        epochs_df,
+        streams,
+        EEG_LOCATIONS_F,
+        "categorical",
+        0,
+        epf.EPOCH_ID,
+        epf.TIME,
+        0.001,
+    )
+
+
+def _to_spudtr_epochs(epochs_df, streams, tmp_dir):
+    from spudtr import mneutils
+
+    epochs = mneutils.read_spudtr_epochs(
+        epochs_df,
+        streams,
+        EEG_LOCATIONS_F,
+        "categorical",
+        0,
+        epf.EPOCH_ID,
+        epf.TIME,
+        0.001,
+    )
+    return lambda: mneutils.to_spudtr_epochs(epochs)
+
+
+def _generate_epochs(epochs_df, streams, tmp_dir):
+    n_epochs = epochs_df[epf.EPOCH_ID].nunique()
+    n_times = epochs_df[epf.TIME].nunique()
+
+    def generate():
+        chunks, _ = fake_data.generate_epochs(
+            n_epochs, n_times, len(streams), sfreq=SFREQ, seed=0
+        )
+        for _ in chunks:
+            pass
+
+    return generate
+
+
+# name: (setup, extra parameter grid)
+CASES = {
+    "epf.check_epochs": (_check_epochs, {}),
+    "epf.center_eeg": (_center_eeg, {"mode": epf.BASELINE_MODES}),
+    "epf.drop_bad_epochs": (_drop_bad_epochs, {}),
+    "epf.peak_to_peak": (_peak_to_peak, {}),
+    "epf.re_reference": (_re_reference, {}),
+    "epf.re_reference_many": (_re_reference_many, {}),
+    "epf.resample_epochs": (_resample_epochs, {}),
+    "epf.read_epochs": (_read_epochs, {}),
+    "epf.fir_filter_epochs": (_fir_filter_epochs, {"width_hz": WIDTHS_HZ}),
+    "filters.fir_filter_dt": (_fir_filter_dt, {"width_hz": WIDTHS_HZ}),
+    "filters.fir_filter_data": (_fir_filter_data, {"width_hz": WIDTHS_HZ}),
+    "pipeline.Pipeline": (_pipeline, {}),
+    "mneutils.read_spudtr_epochs": (_read_spudtr_epochs, {}),
+    "mneutils.to_spudtr_epochs": (_to_spudtr_epochs, {}),
+    "fake_epochs_data.generate_epochs": (_generate_epochs, {}),
+}
+
+# name: modules imported together, timed once in a fresh interpreter
+# since the import cost does not depend on the data sizes
+IMPORTS = {
+    "import.spudtr": "spudtr",
+    "import.spudtr.epf,filters,mneutils": "spudtr.epf, spudtr.filters, spudtr.mneutils",
+}
+
+
+def _case_key(name, params):
+    return name + "[" + ",".join(f"{key}={val}" for key, val in params.items()) + "]"
+
+
+def _rss_mb(field):
+    """VmRSS or VmHWM (peak) of this process in MB, None if not Linux"""
+    try:
+        status = Path("/proc/self/status").read_text()
+    except OSError:
+        return None
+    for line in status.splitlines():
+        if line.startswith(field + ":"):
+            return int(line.split()[1]) / 1024  # kB
+    return None
+
+
+def _reset_peak_rss():
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def _measure(func, repeat):
+    """best wall time and peak memory of func() in seconds and MB"""
+    func()  # warm up caches, e.g., filter designs and layouts
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+
+    gc.collect()
+    _reset_peak_rss()
+    rss_start = _rss_mb("VmRSS")
+    func()
+    rss_peak = _rss_mb("VmHWM")
+    rss_mb = None if rss_start is None else max(rss_peak - rss_start, 0.0)
+
+    tracemalloc.start()
+    try:
+        func()
+        tracemalloc_mb = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+    return dict(seconds=seconds, tracemalloc_mb=tracemalloc_mb, rss_mb=rss_mb)
+
+
+def _measure_import(modules, repeat):
+    """best wall time of importing modules in a fresh interpreter
+
+    Only the import is timed, not the interpreter start up. The memory
+    is in the child process so it is not recorded.
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {modules}; print(time.perf_counter() - start)"
+    )
+    # the same spudtr as this process, installed or not
+    env = dict(os.environ, PYTHONPATH=str(Path(spudtr.__file__).parents[1]))
+    times = [
+        float(
+            subprocess.run(
+                [sys.executable, "-c", code],
+                capture_output=True,
+                text=True,
+                check=True,
+                env=env,
+            ).stdout
+        )
+        for _ in range(repeat + 1)
+    ]
+    seconds = min(times[1:])  # the first warms up the .pyc files
+    return dict(seconds=seconds, tracemalloc_mb=None, rss_mb=None)
+
+
+def run(pattern="*", quick=False, repeat=5):
+    """run the matching cases over the size grid, returns the results dict"""
+    grid = {key: vals[:1] if quick else vals for key, vals in GRID.items()}
+    results = {}
+    for key, modules in IMPORTS.items():
+        if not fnmatch.fnmatch(key, pattern):
+            continue
+        results[key] = _measure_import(modules, repeat)
+        print(f"{key:<75} {results[key]['seconds']:>9.4f} s", flush=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for sizes in itertools.product(*grid.values()):
+            sizes = dict(zip(grid, sizes))
+            epochs_df, streams = _epochs_df(**sizes)
+            for name, (setup, extra_grid) in CASES.items():
+                if not fnmatch.fnmatch(name, pattern):
+                    continue
+                extra_grid = {
+                    key: vals[:1] if quick else vals for key, vals in extra_grid.items()
+                }
+                for extra in itertools.product(*extra_grid.values()):
+                    extra = dict(zip(extra_grid, extra))
+                    key = _case_key(name, {**sizes, **extra})
+                    func = setup(epochs_df, streams, tmp_dir, **extra)
+                    results[key] = _measure(func, repeat)
+                    print(
+                        f"{key:<75} {results[key]['seconds']:>9.4f} s"
+                        f" {results[key]['tracemalloc_mb']:>9.1f} MB",
+                        flush=True,
+                    )
+    return results
+
+
+def _meta():
+    import mne
+    import scipy
+
+    return dict(
+        date=datetime.datetime.now().isoformat(timespec="seconds"),
+        machine=platform.node(),
+        platform=platform.platform(),
+        python=platform.python_version(),
+        spudtr=spudtr.__version__,
+        compiled_kernels=epf._kernels.COMPILED,
+        numpy=np.__version__,
+        pandas=pd.__version__,
+        scipy=scipy.__version__,
+        mne=mne.__version__,
+    )
+
+
+def compare(baseline, results, threshold=0.25, min_seconds=0.01, min_mb=1.0, rss=False):
+    """cases in results slower or bigger than baseline by more than threshold
+
+    Times under min_seconds and memory under min_mb in both runs are
+    too noisy to flag, as is the RSS growth unless `rss`.
+
+    Returns
+    -------
+    regressions : list of str
+        one line per regression
+    """
+    floors = dict(seconds=min_seconds, tracemalloc_mb=min_mb)
+    if rss:
+        floors["rss_mb"] = min_mb
+    regressions = []
+    for key in sorted(set(baseline) & set(results)):
+        for metric, floor in floors.items():
+            old, new = baseline[key].get(metric), results[key].get(metric)
+            if old is None or new is None or max(old, new) < floor:
+                continue
+            ratio = new / max(old, floor)
+            if ratio > 1.0 + threshold:
+                regressions.append(
+                    f"{key} {metric} {old:.4g} -> {new:.4g} ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite")
+    run_parser.add_argument("-o", "--output", help="results .json file")
+    run_parser.add_argument("-k", "--cases", default="*", help="case name pattern")
+    run_parser.add_argument("--quick", action="store_true", help="smallest sizes only")
+    run_parser.add_argument("--repeat", type=int, default=5)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions")
+    compare_parser.add_argument("baseline", help="baseline results .json file")
+    compare_parser.add_argument("results", help="new results .json file")
+    compare_parser.add_argument("--threshold", type=float, default=0.25)
+    compare_parser.add_argument("--min-seconds", type=float, default=0.01)
+    compare_parser.add_argument("--min-mb", type=float, default=1.0)
+    compare_parser.add_argument("--rss", action="store_true", help="compare RSS too")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        import mne
+
+        mne.set_log_level("WARNING")
+        start = time.perf_counter()
+        results = run(args.cases, quick=args.quick, repeat=args.repeat)
+        print(f"{len(results)} cases in {time.perf_counter() - start:.1f} s")
+        if args.output:
+            with open(args.output, "w") as fh:
+                json.dump(dict(meta=_meta(), results=results), fh, indent=1)
+        return 0
+
+    with open(args.baseline) as fh:
+        baseline = json.load(fh)
+    with open(args.results) as fh:
+        results = json.load(fh)
+    regressions = compare(
+        baseline["results"],
+        results["results"],
+        threshold=args.threshold,
+        min_seconds=args.min_seconds,
+        min_mb=args.min_mb,
+        rss=args.rss,
+    )
+    n_cases = len(set(baseline["results"]) & set(results["results"]))
+    for regression in regressions:
+        print(regression)
+    print(f"{len(regressions)} regressions in {n_cases} cases > {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,25 @@
 # to work in development mode use:  pip install -e .
 
-from setuptools import find_packages, setup  # , Extension
+from setuptools import find_packages, setup, Extension
 from pathlib import Path
 import re
 from spudtr import get_ver
 
 __version__ = get_ver()
 
+# optional compiled kernels, spudtr falls back to spudtr/_kernels.py
+# if Cython isn't installed or the extension doesn't build
+try:
+    from Cython.Build import cythonize
+
+    ext_modules = cythonize(
+        [Extension("spudtr._spudtr", ["src/_spudtr.pyx"])], language_level=3
+    )
+    for ext in ext_modules:
+        ext.optional = True  # a failed compile is a warning, not an error
+except ImportError:
+    ext_modules = []
+
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
@@ -27,4 +40,5 @@ setup(
     packages=find_packages(exclude=["tests"]),
     scripts=["bin/stub"],
     package_data={"spudtr": ["resources/*.*"]},
+    ext_modules=ext_modules,
 )
@@ -44,12 +44,223 @@ def get_ver():
         return pf_ver["ver_str"]
 
 
-def get_demo_df(filename, url=DATA_URL):
-    """fetch and cache feather format demo EEG epochs data 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # bytes per streamed read and write
+DOWNLOAD_MAX_WORKERS = 4  # concurrent demo file downloads
+
+# mkh5 bookkeeping columns dropped from the demo files
+_MKH5_INTERNAL = [
+    "data_group",
+    "dblock_tick_idx",
+    "dblock_ticks",
+    "crw_ticks",
+    "raw_evcodes",
+    "log_flags",
+    "epoch_match_tick_delta",
+    "epoch_ticks",
+    "idx",
+    "dlim",
+    "match_str",
+    "match_code",
+    "match_tick",
+    "match_time",
+    "match_group",
+    "is_anchor",
+    "anchor_str",
+    "anchor_code",
+    "anchor_tick",
+    "anchor_tick_delta",
+    "anchor_time",
+    "anchor_time_delta",
+    "regexp",
+    "pygarv",
+]
+
+
+def _read_manifest(manifest):
+    """filename -> "algorithm:hexdigest" from a dict or checksum file
+
+    A manifest file has one ``checksum filename`` per line like
+    ``md5sum`` output, a checksum without an ``algorithm:`` prefix
+    is md5, as are Zenodo file checksums.
+    """
+    if manifest is None:
+        return {}
+
+    if not isinstance(manifest, dict):
+        manifest_f, manifest = manifest, {}
+        for n, line in enumerate(Path(manifest_f).read_text().splitlines(), 1):
+            if not line.strip():
+                continue
+            fields = line.split(None, 1)
+            if len(fields) != 2:
+                raise ValueError(
+                    f"{manifest_f} line {n} is not checksum filename: {line!r}"
+                )
+            manifest[fields[1]] = fields[0]
+
+    checksums = {}
+    for filename, checksum in manifest.items():
+        if ":" not in checksum:
+            checksum = f"md5:{checksum}"
+        checksums[Path(filename.strip().lstrip("*")).name] = checksum.lower()
+    return checksums
+
+
+def _file_checksum(path, algorithm):
+    import hashlib
+
+    file_hash = hashlib.new(algorithm)
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(DOWNLOAD_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+    return f"{algorithm}:{file_hash.hexdigest()}"
+
+
+def _download(file_url, part_f, session):
+    """stream file_url to part_f, resuming a partial download"""
+
+    # resume where an interrupted download stopped, identity encoding
+    # so the byte range offsets are into the file itself
+    headers = {"Accept-Encoding": "identity"}
+    n_bytes = part_f.stat().st_size if part_f.exists() else 0
+    if n_bytes:
+        headers["Range"] = f"bytes={n_bytes}-"
+
+    with session.get(file_url, headers=headers, stream=True) as resp:
+        if resp.status_code == 416:  # nothing left in the range
+            return
+        resp.raise_for_status()
+
+        # 200 means the server sent the whole file, start over
+        mode = "ab" if resp.status_code == 206 else "wb"
+        with open(part_f, mode) as fh:
+            for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                fh.write(chunk)
+
+
+def _fetch_demo_file(filename, url, checksums, session):
+    """download, verify and cache one demo file, returns the cache path"""
+
+    import os
+    import tempfile
+    import pandas as pd
+
+    cache_f = DATA_DIR / filename
+    if cache_f.exists():
+        return cache_f
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+    print(f"downloading ./spudtr/data/{filename} from {url} ... please wait")
+    if not url[-1] == r"/":
+        url += r"/"
+    part_f = DATA_DIR / f"{filename}.part"
+    _download(url + filename, part_f, session)
+
+    if filename in checksums:
+        expected = checksums[filename]
+        checksum = _file_checksum(part_f, expected.split(":", 1)[0])
+        if checksum != expected:
+            part_f.unlink()
+            raise ValueError(
+                f"{filename} download checksum {checksum} does not match {expected}"
+            )
+
+    df = pd.read_feather(part_f)
+    df["epoch_id"] = df["epoch_id"].astype(int)
+    df.insert(1, "time_ms", df["match_time"])
+    df.insert(2, "sub_id", df["data_group"])
+    df.insert(3, "eeg_artifact", df["log_flags"])
+    df.drop(columns=_MKH5_INTERNAL, inplace=True)
+
+    # write beside the cache file and rename so readers never see half
+    fd, tmp_f = tempfile.mkstemp(dir=DATA_DIR, prefix=f".{filename}.")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            df.to_feather(fh, compression="uncompressed")  # for memory mapping
+        os.replace(tmp_f, cache_f)
+    except BaseException:
+        os.unlink(tmp_f)
+        raise
+    part_f.unlink()
+    return cache_f
+
+
+def _session(max_workers=1):
+    import requests  # URL IO
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=max_workers
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_demo_files(
+    filenames, url=DATA_URL, manifest=None, max_workers=DOWNLOAD_MAX_WORKERS
+):
+    """download and cache several demo files concurrently
+
+    The files are fetched in a thread pool over one pooled HTTP session,
+    see ``get_demo_df`` for the caching.
+
+    Parameters
+    ----------
+    filenames : list of str
+       files to fetch
+
+    url : str {DATA_URL}
+       top-level URL to fetch from
+
+    manifest : dict or str or Path, optional
+       checksums to verify the downloads, see ``get_demo_df``
+
+    max_workers : int
+       number of concurrent downloads
+
+    Returns
+    -------
+    paths : dict
+       filename -> the cached file Path
+
+    """
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    filenames = list(dict.fromkeys(filenames))  # once each
+    checksums = _read_manifest(manifest)
+    with _session(max_workers) as session:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            paths = pool.map(
+                lambda filename: _fetch_demo_file(filename, url, checksums, session),
+                filenames,
+            )
+            return dict(zip(filenames, paths))
+
+
+def get_demo_df(
+    filename,
+    url=DATA_URL,
+    manifest=None,
+    columns=None,
+    epoch_ids=None,
+    start=None,
+    stop=None,
+    categorical=True,
+):
+    """fetch and cache feather format demo EEG epochs data
 
     default = Zenodo eeg-workshops/mkpy_data_examples/data, v0.0.3
               https://doi.org/10.5281/zenodo.3968485/files
 
+    The download streams to ``filename.part`` in the cache directory
+    and an interrupted download resumes from there on the next call.
+    The finished file is checked against the manifest checksum, if
+    any, trimmed to the spudtr columns and renamed into the cache
+    uncompressed so reads of some of it are memory mapped, see
+    ``epf.read_epochs``.
+
     Parameters
     ----------
     filename : str
@@ -58,63 +269,52 @@ def get_demo_df(filename, url=DATA_URL):
     url : str {DATA_URL}
        top-level URL to fetch from
 
+    manifest : dict or str or Path, optional
+       checksums to verify downloads against, either a dict of
+       ``filename: checksum`` or a file with one ``checksum filename``
+       per line like ``md5sum`` output. Checksums are
+       ``algorithm:hexdigest``, e.g., ``"md5:9e10..."`` as Zenodo lists
+       them, or bare md5 hex digests. Files not in the manifest are not
+       checked.
+
+    columns : list of str, optional
+       the columns to read, default all, ``epoch_id`` and ``time_ms``
+       are always read
+
+    epoch_ids : list-like, optional
+       read only these epochs, default all
+
+    start, stop : int, optional
+       read only the ``time_ms`` time stamps in [start, stop), default all
+
+    categorical : bool
+       load low cardinality string columns as pd.Categorical
+
     Returns
     -------
     df : pandas.DataFrame
         spudtr epochs format data frame with epoch_id, time_ms columns
 
+    Raises
+    ------
+    ValueError
+        if the downloaded file doesn't match its manifest checksum
+
     """
 
-    import pandas as pd
-    import io
-    import os
-    import requests  # URL IO
+    from spudtr.epf import read_epochs
 
     # shortcut if previously downloaded
-    if (DATA_DIR / filename).exists():
-        return pd.read_feather(DATA_DIR / filename)
-    else:
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    # otherwise download
-    print(f"downloading ./spudtr/data/{filename} from {url} ... please wait")
-    if not url[-1] == r"/":
-        url += r"/"
-    resp = requests.get(url + filename, stream=True)
-    resp.raw.decode_content = True
-    mem_fh = io.BytesIO(resp.raw.read())
-    df = pd.read_feather(mem_fh)
-
-    df["epoch_id"] = df["epoch_id"].astype(int)
-    df.insert(1, "time_ms", df["match_time"])
-    df.insert(2, "sub_id", df["data_group"])
-    df.insert(3, "eeg_artifact", df["log_flags"])
-    _mkh5_internal = [
-        "data_group",
-        "dblock_tick_idx",
-        "dblock_ticks",
-        "crw_ticks",
-        "raw_evcodes",
-        "log_flags",
-        "epoch_match_tick_delta",
-        "epoch_ticks",
-        "idx",
-        "dlim",
-        "match_str",
-        "match_code",
-        "match_tick",
-        "match_time",
-        "match_group",
-        "is_anchor",
-        "anchor_str",
-        "anchor_code",
-        "anchor_tick",
-        "anchor_tick_delta",
-        "anchor_time",
-        "anchor_time_delta",
-        "regexp",
-        "pygarv",
-    ]
-    df.drop(columns=_mkh5_internal, inplace=True)
-    df.to_feather(DATA_DIR / filename)
-    return df
+    if not (DATA_DIR / filename).exists():
+        with _session() as session:
+            _fetch_demo_file(filename, url, _read_manifest(manifest), session)
+    return read_epochs(
+        DATA_DIR / filename,
+        columns=columns,
+        epoch_ids=epoch_ids,
+        start=start,
+        stop=stop,
+        categorical=categorical,
+        epoch_id="epoch_id",
+        time="time_ms",
+    )
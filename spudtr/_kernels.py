@@ -0,0 +1,76 @@
+"""pure Python kernels for the epochs hot loops
+
+Same functions and call signatures as the optional compiled extension
+built from src/_spudtr.pyx, imported in its place when it isn't built.
+
+The data arrays are C-contiguous float64 (n_epochs, n_times,
+n_streams) or (n_series, n_samples), the callers take care of that.
+"""
+
+import numpy as np
+from scipy import ndimage
+
+COMPILED = False
+
+
+def _check_slice(start, stop, n_times):
+    if not 0 <= start < stop <= n_times:
+        raise ValueError(f"time slice [{start}, {stop}) is empty or out of bounds")
+
+
+def baseline_means(data, start, stop):
+    """mean of each epoch and stream over the time slice [start, stop)
+
+    Returns
+    -------
+    np.ndarray, shape=(n_epochs, n_streams)
+    """
+    _check_slice(start, stop, data.shape[1])
+    return data[:, start:stop, :].mean(axis=1)
+
+
+def grid_rows(epoch_codes, time_codes, n_epochs, n_times):
+    """row index at each (epoch, time) position of the epochs grid
+
+    Returns
+    -------
+    np.ndarray of intp, shape=(n_epochs * n_times,) or None
+        rows in epoch, time order or None if there are missing or
+        duplicate epoch_id, time combinations
+    """
+    n_rows = len(epoch_codes)
+    if n_rows != n_epochs * n_times:
+        return None
+
+    grid_idx = epoch_codes * n_times + time_codes
+    if not (np.bincount(grid_idx, minlength=n_rows) == 1).all():
+        return None
+
+    rows = np.empty(n_rows, dtype=np.intp)
+    rows[grid_idx] = np.arange(n_rows)
+    return rows
+
+
+def fir_symmetric(data, taps):
+    """centered FIR convolution of each row with mirror padded edges
+
+    Returns
+    -------
+    np.ndarray, shape=(n_series, n_samples)
+    """
+    if len(taps) % 2 == 0:
+        raise ValueError(f"symmetric FIR taps must have odd length not {len(taps)}")
+    return ndimage.convolve1d(data, taps, axis=-1, mode="reflect")
+
+
+def peak_to_peak(data, start, stop):
+    """max - min of each epoch and stream over the time slice [start, stop)
+
+    NaN anywhere in the slice gives NaN like np.ptp.
+
+    Returns
+    -------
+    np.ndarray, shape=(n_epochs, n_streams)
+    """
+    _check_slice(start, stop, data.shape[1])
+    return np.ptp(data[:, start:stop, :], axis=1)
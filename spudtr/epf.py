@@ -1,15 +1,39 @@
-"""utilities for epoched EEG data in a pandas.DataFrame """
+"""utilities for epoched EEG data in a pandas.DataFrame"""
+
 from pathlib import Path
+from fractions import Fraction
+import copy
+import functools
+import hashlib
 import warnings
 import numpy as np
 import pandas as pd
 import bottleneck as bn
+from scipy import signal
+
+from spudtr.filters import (
+    _apply_firwin_filter_data,
+    _copy_on_write,
+    _design_firwin_filter,
+    check_filter_params,
+    fir_filter_dt,
+)
 
-from spudtr.filters import _design_firwin_filter, fir_filter_dt
+try:
+    from spudtr import _spudtr as _kernels  # optional compiled kernels
+except ImportError:
+    from spudtr import _kernels
 
 EPOCH_ID = "epoch_id"  # default epoch ID column
 TIME = "time"  # default time column
 
+# read_epochs string columns with at most this many unique values per
+# row are loaded as categoricals
+CATEGORICAL_MAX_FRACTION = 0.1
+
+# center_eeg baseline modes, all but "mean" ignore NaN samples
+BASELINE_MODES = ("mean", "nanmean", "median", "zscore", "percent", "detrend")
+
 
 def _validate_epochs_df(epochs_df, epoch_id=EPOCH_ID, time=TIME):
     """check form and index of the epochs_df is as expected
@@ -60,42 +84,386 @@ def _epochs_QC(epochs_df, data_streams, epoch_id=EPOCH_ID, time=TIME):
     _validate_epochs_df(epochs_df, epoch_id=epoch_id, time=time)
 
     # check values of epoch_id in every time group are the same, and
-    # unique in each time group. Make our own copy so we are immune to
-    # modification to original table
-    table = epochs_df.copy().reset_index().set_index(epoch_id).sort_index()
-    assert table.index.names == [epoch_id]
-
-    snapshots = table.groupby([time])
-
-    # check that snapshots across epochs have equal index by transitivity
-    prev_group = None
-    for idx, cur_group in snapshots:
-        if prev_group is not None:
-            if not prev_group.index.equals(cur_group.index):
-                raise ValueError(
-                    f"Snapshot {idx} differs from "
-                    f"previous snapshot in {epoch_id} index:\n"
-                    f"Current snapshot's indices:\n"
-                    f"{cur_group.index}\n"
-                    f"Previous snapshot's indices:\n"
-                    f"{prev_group.index}"
-                )
-        prev_group = cur_group
-
-    def list_duplicates(seq):
-        seen = set()
-        seen_add = seen.add
-        # adds all elements it doesn't know yet to seen and all other to seen_twice
-        seen_twice = set(x for x in seq if x in seen or seen_add(x))
-        # turn the set into a list (as requested)
-        return list(seen_twice)
-
-    if not prev_group.index.is_unique:
-        dupes = list_duplicates(list(prev_group.index))
+    # unique in each time group. The epoch_id and time columns are
+    # factorized and the rows counted into an epoch x time grid, no
+    # copy of the table is made. The layout is cached on the data frame
+    # so this is skipped if the epoch_id and time columns are unchanged.
+    epochs_df.spudtr.layout(epoch_id=epoch_id, time=time)
+    return epochs_df
+
+
+def _factorize(values, sort=False):
+    """pd.factorize with missing values coded as one more unique value
+
+    Same as ``use_na_sentinel=False`` in pandas >= 1.5, which older
+    pandas doesn't have.
+    """
+    codes, uniques = pd.factorize(values, sort=sort)
+    is_na = codes == -1
+    if is_na.any():
+        codes[is_na] = len(uniques)
+        uniques = np.append(uniques, np.nan)
+    return codes, uniques
+
+
+def _epochs_grid(epochs_df, epoch_id=EPOCH_ID, time=TIME):
+    """factorize epoch_id and time and check they form a complete grid
+
+    Every epoch must have exactly one row at every time stamp, i.e.,
+    the epoch_id values in each time group are the same and there are
+    no duplicates.
+
+    Parameters
+    ----------
+    epochs_df : pd.DataFrame
+
+    epoch_id : str (optional, default=epf.EPOCH_ID)
+        column name for epoch indexes
+
+    time: str (optional, default=epf.TIME)
+        column name for time stamps
+
+    Returns
+    -------
+    epoch_ids : np.ndarray, shape=(n_epochs,)
+        unique epoch_id values in order of first appearance
+    times : np.ndarray, shape=(n_times,)
+        unique time stamps in ascending order
+    rows : np.ndarray of int, shape=(n_epochs * n_times,)
+        the data frame row at each epoch, time stamp position
+
+    Raises
+    ------
+    ValueError
+        if the time groups have different epoch_id values or duplicate
+        epoch_id values
+
+    """
+    epoch_codes, epoch_ids = _factorize(epochs_df[epoch_id].to_numpy())
+    time_codes, times = _factorize(epochs_df[time].to_numpy(), sort=True)
+    n_epochs, n_times = len(epoch_ids), len(times)
+
+    # exactly one row per epoch per time stamp is a pass
+    rows = _kernels.grid_rows(epoch_codes, time_codes, n_epochs, n_times)
+    if rows is not None:
+        return epoch_ids, times, rows
+
+    # diagnose the failure in ascending epoch_id, time order
+    counts = np.bincount(
+        epoch_codes * n_times + time_codes, minlength=n_epochs * n_times
+    )
+    ids_order = np.argsort(epoch_ids, kind="stable")
+    counts = counts.reshape(n_epochs, n_times)[ids_order, :]
+    sorted_ids = epoch_ids[ids_order]
+
+    def _snapshot_index(j):
+        return pd.Index(np.repeat(sorted_ids, counts[:, j]), name=epoch_id)
+
+    changes = np.flatnonzero((counts[:, 1:] != counts[:, :-1]).any(axis=0))
+    if len(changes):
+        j = changes[0] + 1
         raise ValueError(
-            f"Duplicate values of epoch_id in each" f"time group not allowed:\n{dupes}"
+            f"Snapshot {times[j]} differs from "
+            f"previous snapshot in {epoch_id} index:\n"
+            f"Current snapshot's indices:\n"
+            f"{_snapshot_index(j)}\n"
+            f"Previous snapshot's indices:\n"
+            f"{_snapshot_index(j - 1)}"
         )
-    return epochs_df
+
+    # every snapshot is the same so duplicates are the same in each
+    dupes = sorted_ids[counts[:, 0] > 1].tolist()
+    raise ValueError(
+        f"Duplicate values of epoch_id in each" f"time group not allowed:\n{dupes}"
+    )
+
+
+def _column_checksum(column):
+    """digest of a column's values in row order"""
+    values = column.to_numpy()
+    if values.dtype.kind not in "biufmM":
+        values = pd.util.hash_array(values.astype(object))
+    return hashlib.blake2b(np.ascontiguousarray(values).data, digest_size=16).digest()
+
+
+def _layout_fingerprint(epochs_df, epoch_id, time):
+    """cheap summary of the data frame, changes when the layout might
+
+    The epoch_id and time values are checksummed so edits made in place
+    are caught too, this costs a pass over the two columns, much less
+    than re-validating the epoch_id x time grid.
+    """
+    return (
+        epochs_df.shape,
+        tuple(epochs_df.columns),
+        _column_checksum(epochs_df[epoch_id]),
+        _column_checksum(epochs_df[time]),
+    )
+
+
+class EpochsLayout:
+    """validated epoch_id x time layout of a spudtr format epochs data frame
+
+    Layouts are built and cached by the ``spudtr`` data frame accessor,
+    ``epochs_df.spudtr.layout()``, and returned by :func:`check_epochs`.
+
+    Attributes
+    ----------
+    epoch_id : str
+        epoch index column name
+    time : str
+        time stamp column name
+    epoch_ids : np.ndarray, shape=(n_epochs,)
+        unique epoch_id values in order of first appearance
+    times : np.ndarray, shape=(n_times,)
+        unique time stamps in ascending order
+    n_epochs : int
+        number of epochs
+    n_times : int
+        number of time stamps in each epoch
+    sampling_interval : scalar or None
+        time stamp interval, None if the sampling is irregular
+    is_sorted : bool
+        True if the rows are in epoch by epoch order with time
+        ascending in each epoch, i.e., the data reshape to
+        (n_epochs, n_times)
+    row_order : np.ndarray or None
+        integer row positions that put the rows in sorted order, None if
+        the rows are already sorted
+
+    """
+
+    def __init__(self, epoch_id, time, epoch_ids, times, row_order, fingerprint):
+        self.epoch_id = epoch_id
+        self.time = time
+        self.epoch_ids = epoch_ids
+        self.times = times
+        self.row_order = row_order
+        self.fingerprint = fingerprint
+
+        intervals = np.diff(times)
+        if len(intervals) and np.allclose(intervals, intervals[0]):
+            self.sampling_interval = intervals[0]
+        else:
+            self.sampling_interval = None
+
+    def __repr__(self):
+        return (
+            f"EpochsLayout({self.epoch_id}={self.n_epochs} epochs, "
+            f"{self.time}={self.n_times} times, is_sorted={self.is_sorted})"
+        )
+
+    @property
+    def n_epochs(self):
+        return len(self.epoch_ids)
+
+    @property
+    def n_times(self):
+        return len(self.times)
+
+    @property
+    def is_sorted(self):
+        return self.row_order is None
+
+    def is_valid(self, epochs_df):
+        """True if the layout still describes epochs_df"""
+        return self.fingerprint == _layout_fingerprint(
+            epochs_df, self.epoch_id, self.time
+        )
+
+
+def _epochs_layout(epochs_df, epoch_id=EPOCH_ID, time=TIME):
+    """validate the epoch_id x time grid and return the EpochsLayout"""
+
+    epoch_ids, times, rows = _epochs_grid(epochs_df, epoch_id=epoch_id, time=time)
+
+    # rows are already in the sorted (n_epochs, n_times) grid order
+    row_order = None
+    if not np.array_equal(rows, np.arange(len(rows))):
+        row_order = rows
+
+    return EpochsLayout(
+        epoch_id,
+        time,
+        epoch_ids,
+        times,
+        row_order,
+        _layout_fingerprint(epochs_df, epoch_id, time),
+    )
+
+
+@pd.api.extensions.register_dataframe_accessor("spudtr")
+class _SpudtrAccessor:
+    """``epochs_df.spudtr`` caches the validated layout with the data frame
+
+    The cached layout is re-derived if rows are added or dropped, the
+    columns change, or any value in the epoch_id or time column changes,
+    in place or not.
+
+    """
+
+    def __init__(self, epochs_df):
+        self._obj = epochs_df
+
+        # stash the cache on the data frame object itself so it lives
+        # and dies with it and isn't carried along by copies
+        if "_spudtr_layouts" not in epochs_df.__dict__:
+            object.__setattr__(epochs_df, "_spudtr_layouts", dict())
+        self._layouts = epochs_df.__dict__["_spudtr_layouts"]
+
+    def layout(self, epoch_id=EPOCH_ID, time=TIME, refresh=False):
+        """return the cached EpochsLayout, validating epochs_df if needed
+
+        Raises
+        ------
+        ValueError
+            if the data are not in spudtr epochs format
+
+        """
+        _validate_epochs_df(self._obj, epoch_id=epoch_id, time=time)
+        layout = self._layouts.get((epoch_id, time), None)
+        if refresh or layout is None or not layout.is_valid(self._obj):
+            layout = _epochs_layout(self._obj, epoch_id=epoch_id, time=time)
+            self._layouts[(epoch_id, time)] = layout
+        return layout
+
+    def _bind(self, layout):
+        """attach a layout known to describe this data frame, e.g., a copy"""
+        bound = copy.copy(layout)
+        bound.fingerprint = _layout_fingerprint(self._obj, layout.epoch_id, layout.time)
+        self._layouts[(layout.epoch_id, layout.time)] = bound
+
+
+def _epochs_QC_layout(epochs_df, data_streams, epoch_id=EPOCH_ID, time=TIME):
+    """Quality control for spudtr format epochs, returns the cached EpochsLayout"""
+    _epochs_QC(epochs_df, data_streams, epoch_id=epoch_id, time=time)
+    return epochs_df.spudtr.layout(epoch_id=epoch_id, time=time)
+
+
+def _epochs_data(epochs_df, data_streams, layout):
+    """data stream columns as an (n_epochs, n_times, n_streams) array"""
+    data = epochs_df[data_streams].to_numpy()
+    if not layout.is_sorted:
+        data = data[layout.row_order]
+    return data.reshape(layout.n_epochs, layout.n_times, len(data_streams))
+
+
+def _float_copy(data):
+    """copy of an array, promoted to float if need be for arithmetic"""
+    if data.dtype.kind in "biu":
+        return data.astype(float)
+    return data.copy()
+
+
+def _replace_streams(epochs_df, streams, data, layout, inplace=False):
+    """new epochs_df with (n_rows, n_streams) data in place of streams
+
+    The other columns are copied, or shared with epochs_df when pandas
+    copy-on-write is on, and the layout is bound to the new frame. Much
+    faster than setting the columns on a copy. With inplace=True the
+    streams are set in epochs_df itself and the return is None.
+    """
+    if inplace:
+        if (epochs_df.dtypes[streams] == "float64").all():
+            # into the columns' own memory, unless shared copy-on-write
+            epochs_df.loc[:, streams] = data
+        else:
+            for i, stream in enumerate(streams):
+                epochs_df[stream] = data[:, i]
+        epochs_df.spudtr._bind(layout)
+        return None
+
+    # Series, not their arrays, so copy-on-write tracks the sharing
+    share = _copy_on_write()
+    columns = {stream: data[:, i] for i, stream in enumerate(streams)}
+    for col in epochs_df.columns:
+        if col not in columns:
+            columns[col] = epochs_df[col] if share else epochs_df[col].array.copy()
+    new_epochs_df = pd.DataFrame(
+        {col: columns[col] for col in epochs_df.columns},
+        index=epochs_df.index,
+        copy=False,
+    ).__finalize__(epochs_df)
+    new_epochs_df.spudtr._bind(layout)
+    return new_epochs_df
+
+
+def _replace_tensor_streams(epochs, stream_idxs, data, inplace=False):
+    """EpochsTensor with (n_epochs, n_times, n_streams) data in place of streams
+
+    A copy of epochs unless inplace=True, then the data are set in the
+    epochs data array, which must be floating point, and the return is
+    None.
+    """
+    if inplace:
+        if epochs.data.dtype.kind != "f":
+            raise TypeError(
+                f"inplace needs floating point data, not {epochs.data.dtype}"
+            )
+        epochs.data[:, :, stream_idxs] = data
+        return None
+    new_data = _float_copy(epochs.data)
+    new_data[:, :, stream_idxs] = data
+    return epochs.copy(data=new_data)
+
+
+def _check_epoch_length(n_times, taps):
+    """epochs must be longer than the filter delay to filter one at a time"""
+    delay = int((len(taps) - 1) / 2)
+    if n_times <= delay:
+        raise ValueError(
+            f"epochs are too short to filter one at a time: {n_times} samples, "
+            f"the filter delay is {delay} samples"
+        )
+
+
+def _check_baseline_mode(mode):
+    if mode not in BASELINE_MODES:
+        raise ValueError(f"unknown baseline mode {mode}, use one of {BASELINE_MODES}")
+
+
+def _baseline_epochs_data(data, istart, istop, mode="mean"):
+    """baseline (n_epochs, n_times, n_streams) float64 data in place
+
+    The baseline statistics reduce the [istart, istop) slice along the
+    time axis of each epoch and stream and broadcast back, see
+    center_eeg for the modes.
+    """
+    if mode == "mean":
+        data -= _kernels.baseline_means(data, istart, istop)[:, np.newaxis, :]
+        return data
+
+    baseline = data[:, istart:istop, :]
+    if mode == "detrend":
+        # NaN-aware least squares line through the baseline samples,
+        # sample positions centered on the interval for accuracy
+        positions = np.arange(data.shape[1]) - (istart + istop - 1) / 2
+        baseline_positions = np.where(
+            np.isnan(baseline), np.nan, positions[istart:istop, np.newaxis]
+        )
+        mean_pos = bn.nanmean(baseline_positions, axis=1)
+        mean_amp = bn.nanmean(baseline, axis=1)
+        slope = (
+            bn.nanmean(baseline_positions * baseline, axis=1) - mean_pos * mean_amp
+        ) / (bn.nanmean(baseline_positions**2, axis=1) - mean_pos**2)
+        data -= (mean_amp - slope * mean_pos)[:, np.newaxis, :]
+        data -= slope[:, np.newaxis, :] * positions[:, np.newaxis]
+        return data
+
+    if mode == "median":
+        centers = bn.nanmedian(baseline, axis=1)
+    else:
+        centers = bn.nanmean(baseline, axis=1)
+    scales = None
+    if mode == "zscore":
+        scales = bn.nanstd(baseline, axis=1)
+    elif mode == "percent":
+        scales = centers / 100.0
+
+    data -= centers[:, np.newaxis, :]
+    if scales is not None:
+        data /= scales[:, np.newaxis, :]
+    return data
 
 
 def _hdf_read_epochs(epochs_f, h5_group, epoch_id=EPOCH_ID, time=TIME):
@@ -135,8 +503,8 @@ def _hdf_read_epochs(epochs_f, h5_group, epoch_id=EPOCH_ID, time=TIME):
 def _find_subscript(times, start, stop):
     """start stop interval includes end both end time stamps
 
-    This makes the timestamp interval open left and right, 
-    [start, stop] when slicing with pandas and open left, 
+    This makes the timestamp interval open left and right,
+    [start, stop] when slicing with pandas and open left,
     closed right, [start, stop) when slicing with numpy.
     """
     istart = np.where(times >= start)[0]
@@ -166,6 +534,313 @@ def _find_subscript(times, start, stop):
 # ------------------------------------------------------------
 
 
+def _metadata_time_idx(times, time_stamp=None, time=TIME):
+    """position of the time stamp to read epoch metadata at
+
+    The default is time 0, where drop_bad_epochs reads the bads, or the
+    first time stamp if there is no time 0.
+    """
+    if time_stamp is None:
+        time_idx = np.flatnonzero(times == 0)
+        return time_idx[0] if len(time_idx) else 0
+    time_idx = np.flatnonzero(times == time_stamp)
+    if not len(time_idx):
+        raise ValueError(f"time_stamp {time_stamp} not found in {time}")
+    return time_idx[0]
+
+
+class EpochsTensor:
+    """dense (n_epochs, n_times, n_streams) epochs data with epoch-level metadata
+
+    The epf transforms accept an EpochsTensor in place of a spudtr
+    format epochs data frame and return an EpochsTensor, working on the
+    data array directly instead of data frame rows and groups.
+
+    Parameters
+    ----------
+    data : np.ndarray, shape=(n_epochs, n_times, n_streams)
+        data stream values
+    times : np.ndarray, shape=(n_times,)
+        epoch time stamps, ascending
+    streams : list of str
+        data stream names, one per slice on the last axis of `data`
+    metadata : pd.DataFrame
+        epoch-level variables, one row per epoch, must include the
+        `epoch_id` column
+    epoch_id : str, optional
+        column name for the epoch index
+    time : str, optional
+        column name for the time stamps
+
+
+    Examples
+    --------
+    >>> epochs = epf.EpochsTensor.from_epochs_df(epochs_df, eeg_streams)
+    >>> epochs = epf.center_eeg(epochs, eeg_streams, -100, 0)
+    >>> epochs_df = epochs.to_epochs_df()
+
+    """
+
+    def __init__(self, data, times, streams, metadata, epoch_id=EPOCH_ID, time=TIME):
+
+        data = np.asanyarray(data)
+        times = np.asanyarray(times)
+        streams = list(streams)
+
+        if data.ndim != 3:
+            raise ValueError(
+                f"data must be 3-D (n_epochs, n_times, n_streams) not {data.shape}"
+            )
+        if data.shape[1:] != (len(times), len(streams)):
+            raise ValueError(
+                f"data shape {data.shape} does not match {len(times)} times "
+                f"and {len(streams)} streams"
+            )
+        if not isinstance(metadata, pd.DataFrame) or len(metadata) != len(data):
+            raise ValueError(
+                "metadata must be a Pandas DataFrame with one row per epoch"
+            )
+        if epoch_id not in metadata.columns:
+            raise ValueError(f"epoch_id column not found: {epoch_id}")
+
+        self.data = data
+        self.times = times
+        self.streams = streams
+        self.metadata = metadata
+        self.epoch_id = epoch_id
+        self.time = time
+
+        # column order when converted back to a data frame
+        self._columns = None
+
+    def __repr__(self):
+        n_epochs, n_times, n_streams = self.data.shape
+        return (
+            f"EpochsTensor({n_epochs} epochs x {n_times} times x {n_streams} streams, "
+            f"metadata={list(self.metadata.columns)})"
+        )
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def epoch_ids(self):
+        return self.metadata[self.epoch_id].to_numpy()
+
+    @classmethod
+    def from_epochs_df(
+        cls, epochs_df, data_streams, epoch_id=EPOCH_ID, time=TIME, time_stamp=None
+    ):
+        """build an EpochsTensor from a spudtr format epochs data frame
+
+        The data array is a reshape view of the data stream columns
+        when the rows are in epoch by epoch, ascending time order,
+        otherwise the rows are put in order with a single permutation.
+
+        Parameters
+        ----------
+        epochs_df : pd.DataFrame
+            spudtr format epochs data with `epoch_id` and `time` columns
+        data_streams : list of str
+            columns to put in the data array
+        epoch_id : str, optional
+            column name for the epoch index
+        time : str, optional
+            column name for the time stamps
+        time_stamp : scalar, optional
+            the other columns are looked up at this time stamp to
+            build the epoch metadata, default is time 0 if there is
+            one, otherwise the first time stamp
+
+        Returns
+        -------
+        EpochsTensor
+
+        """
+
+        layout = _epochs_QC_layout(
+            epochs_df, data_streams, epoch_id=epoch_id, time=time
+        )
+        n_epochs, n_times = layout.n_epochs, layout.n_times
+
+        data = _epochs_data(epochs_df, data_streams, layout)
+
+        # epoch-level variables at one time stamp
+        time_idx = _metadata_time_idx(layout.times, time_stamp, time=time)
+        meta_rows = np.arange(n_epochs) * n_times + time_idx
+        if not layout.is_sorted:
+            meta_rows = layout.row_order[meta_rows]
+        meta_cols = [
+            col for col in epochs_df.columns if col not in data_streams and col != time
+        ]
+        metadata = epochs_df[meta_cols].iloc[meta_rows].reset_index(drop=True)
+
+        epochs = cls(data, layout.times, data_streams, metadata, epoch_id, time)
+        epochs._columns = list(epochs_df.columns)
+        return epochs
+
+    def to_epochs_df(self):
+        """return the spudtr format epochs data frame
+
+        The data stream columns are views of the data array, the
+        metadata are repeated at each time stamp.
+
+        Returns
+        -------
+        pd.DataFrame
+
+        """
+
+        n_epochs, n_times, n_streams = self.data.shape
+
+        epochs_df = self.metadata.take(np.repeat(np.arange(n_epochs), n_times))
+        epochs_df.reset_index(drop=True, inplace=True)
+        epochs_df[self.time] = np.tile(self.times, n_epochs)
+        streams_df = pd.DataFrame(
+            self.data.reshape(n_epochs * n_times, n_streams),
+            columns=self.streams,
+            copy=False,
+        )
+        epochs_df = pd.concat([epochs_df, streams_df], axis=1)
+
+        # restore the original column order if nothing was added
+        if self._columns is not None and set(self._columns) == set(epochs_df.columns):
+            epochs_df = epochs_df[self._columns]
+
+        epochs_df.spudtr._bind(
+            EpochsLayout(
+                self.epoch_id,
+                self.time,
+                self.epoch_ids,
+                self.times,
+                None,
+                None,
+            )
+        )
+        return epochs_df
+
+    def stream_index(self, streams):
+        """positions of the named streams on the last data axis"""
+        if not isinstance(streams, list) or not all(
+            isinstance(item, str) for item in streams
+        ):
+            raise ValueError("data_streams should be a list of strings.")
+        missing_streams = set(streams) - set(self.streams)
+        if missing_streams:
+            raise ValueError(
+                "data_streams should all be present in the epochs tensor, "
+                f"the following are missing: {list(missing_streams)}"
+            )
+        return [self.streams.index(stream) for stream in streams]
+
+    def copy(self, data=None, times=None, metadata=None):
+        """return a new EpochsTensor, optionally swapping in new values
+
+        The new tensor has its own data array unless `data` is given.
+        The metadata are shared unless `metadata` is given.
+        """
+        epochs = EpochsTensor(
+            self.data.copy() if data is None else data,
+            self.times if times is None else times,
+            self.streams,
+            self.metadata if metadata is None else metadata,
+            epoch_id=self.epoch_id,
+            time=self.time,
+        )
+        epochs._columns = self._columns
+        return epochs
+
+
+def _downcast_categorical(epochs_df, skip):
+    """low cardinality string columns to categoricals, in place"""
+    for col in epochs_df.columns.difference(skip, sort=False):
+        values = epochs_df[col]
+        if not pd.api.types.is_string_dtype(values) or isinstance(
+            values.dtype, pd.CategoricalDtype
+        ):
+            continue
+        if values.nunique() <= CATEGORICAL_MAX_FRACTION * len(values):
+            epochs_df[col] = values.astype("category")  # sorted categories
+
+
+def read_epochs(
+    epochs_f,
+    columns=None,
+    epoch_ids=None,
+    start=None,
+    stop=None,
+    categorical=True,
+    epoch_id=EPOCH_ID,
+    time=TIME,
+):
+    """read some or all of a feather format epochs file
+
+    The file is memory mapped and only the buffers of the columns read
+    are touched, so reading a few channels of an uncompressed file costs
+    about their share of the I/O. The epoch and time filters are applied
+    to the Arrow table before converting to pandas.
+
+    Parameters
+    ----------
+    epochs_f : str or Path
+        feather (Arrow IPC) format spudtr epochs file
+
+    columns : list of str, optional
+        the columns to read, default all. The `epoch_id` and `time`
+        columns are always read.
+
+    epoch_ids : list-like, optional
+        read only these epochs, default all
+
+    start, stop : int or float, optional
+        read only the time stamps in [start, stop), default all
+
+    categorical : bool
+        load string columns with few unique values, e.g., condition
+        labels repeated at every time stamp, as pd.Categorical with the
+        categories sorted, see `CATEGORICAL_MAX_FRACTION`.
+
+    epoch_id : str, optional
+        column name for the epoch index
+
+    time: str, optional
+        column name for the time stamps
+
+    Returns
+    -------
+    epochs_df : pd.DataFrame
+
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import feather
+
+    if columns is not None:
+        columns = list(dict.fromkeys([epoch_id, time, *columns]))
+    try:
+        table = feather.read_table(epochs_f, columns=columns, memory_map=True)
+    except pa.ArrowInvalid as err:
+        raise ValueError(f"{epochs_f}: {err}") from err
+    _validate_epochs_df(table.schema.empty_table().to_pandas(), epoch_id, time)
+
+    masks = []
+    if epoch_ids is not None:
+        epoch_ids = pa.array(np.asarray(epoch_ids), type=table[epoch_id].type)
+        masks.append(pc.is_in(table[epoch_id], value_set=epoch_ids))
+    if start is not None:
+        masks.append(pc.greater_equal(table[time], start))
+    if stop is not None:
+        masks.append(pc.less(table[time], stop))
+    if masks:
+        table = table.filter(functools.reduce(pc.and_, masks))
+
+    epochs_df = table.to_pandas()
+    if categorical:
+        _downcast_categorical(epochs_df, [epoch_id, time])
+    return epochs_df
+
+
 def check_epochs(epochs_df, data_streams, epoch_id=EPOCH_ID, time=TIME):
     """check epochs data are in spudtr format
 
@@ -175,7 +850,7 @@ def check_epochs(epochs_df, data_streams, epoch_id=EPOCH_ID, time=TIME):
 
     data_streams: list of str
         the columns containing data
-        
+
     epoch_id : str, optional
         column name for the epoch index
 
@@ -183,24 +858,41 @@ def check_epochs(epochs_df, data_streams, epoch_id=EPOCH_ID, time=TIME):
         column name for the time stamps
 
 
+    Returns
+    -------
+    EpochsLayout
+       the validated layout, cached with `epochs_df` so later transforms
+       of the same data frame skip re-validation
+
+
     Raises
     ------
-    Exception 
+    Exception
        diagnostic for what went wrong
 
     """
 
-    _ = _epochs_QC(epochs_df, data_streams, epoch_id=epoch_id, time=time)
+    _epochs_QC(epochs_df, data_streams, epoch_id=epoch_id, time=time)
+    return epochs_df.spudtr.layout(epoch_id=epoch_id, time=time, refresh=True)
 
 
-def center_eeg(epochs_df, eeg_streams, start, stop, epoch_id=EPOCH_ID, time=TIME):
-
+def center_eeg(
+    epochs_df,
+    eeg_streams,
+    start,
+    stop,
+    epoch_id=EPOCH_ID,
+    time=TIME,
+    streams_only=False,
+    mode="mean",
+    inplace=False,
+):
     """center (a.k.a. "baseline") EEG amplitude on mean amplitude in [start, stop)
-    
+
 
     Parameters
     ----------
-    epochs_df : pd.DataFrame
+    epochs_df : pd.DataFrame or EpochsTensor
         must have epoch_id and time columns
 
     eeg_streams: list of str
@@ -215,12 +907,36 @@ def center_eeg(epochs_df, eeg_streams, start, stop, epoch_id=EPOCH_ID, time=TIME
     time : str, optional
         column to use for the time stamp index
 
+    streams_only : bool, optional
+        return only the centered `eeg_streams`, row for row with
+        `epochs_df`, not a copy of all the columns
+
+    mode : str, optional
+        how to baseline each epoch and stream on the [start, stop)
+        interval, one of `BASELINE_MODES`
+
+        * "mean" subtract the mean, NaN anywhere in the interval
+          gives NaN
+        * "nanmean" subtract the mean of the non-NaN samples
+        * "median" subtract the median of the non-NaN samples
+        * "zscore" subtract the mean and divide by the standard
+          deviation of the non-NaN samples
+        * "percent" percent change from the mean of the non-NaN
+          samples, `100 * (x - mean) / mean`
+        * "detrend" subtract the least squares line through the
+          non-NaN samples, extended over the whole epoch
+
+    inplace : bool, optional
+        if True, center the `eeg_streams` in `epochs_df` itself and
+        return None
+
 
     Returns
     -------
-    centered_epochs_df : pd.DataFrame
+    centered_epochs_df : pd.DataFrame or EpochsTensor or None
        each epoch and channel time series centered on the [start, stop)
-       interval mean amplitude
+       interval mean amplitude, or as given by `mode`. The other
+       columns are shared with `epochs_df` copy-on-write, else copied.
 
     Notes
     -----
@@ -230,32 +946,63 @@ def center_eeg(epochs_df, eeg_streams, start, stop, epoch_id=EPOCH_ID, time=TIME
     since the data are sliced with np.arange, the upper bound is not
     included, i.e., start_stamp <= timestamps < stop_stamp.  So, for
     instance, start=-200, stop=0, would include timestamps at -200,
-    -199, ... -1, but not 0. 
+    -199, ... -1, but not 0.
 
-    """
+    The baseline means are computed on the (n_epochs, n_times,
+    n_streams) data in one pass over the interval and subtracted by
+    broadcasting, rows out of epoch, time order are put in order with
+    one permutation and back again. The other modes use bottleneck's
+    NaN-aware reductions along the time axis the same way, so masked
+    artifact samples needn't be filled first.
 
-    _epochs_QC(epochs_df, eeg_streams, epoch_id=epoch_id, time=time)
+    """
 
-    # calculate the row-index vector to slice the centering intervals
-    n_times = len(epochs_df[time].unique())
-    n_epochs = len(epochs_df[epoch_id].unique())
-    times = epochs_df[time].unique()
-    istart, istop = _find_subscript(times, start, stop)
-    center_idxs = np.array(
-        [
-            np.arange(istart + (i * n_times), istop + (i * n_times))
-            for i in range(n_epochs)
-        ]
-    ).flatten()
+    _check_baseline_mode(mode)
+    if streams_only and inplace:
+        raise ValueError("streams_only and inplace can't both be True")
+
+    if isinstance(epochs_df, EpochsTensor):
+        stream_idxs = epochs_df.stream_index(eeg_streams)
+        istart, istop = _find_subscript(epochs_df.times, start, stop)
+        data = np.array(epochs_df.data[:, :, stream_idxs], dtype="float64", order="C")
+        _baseline_epochs_data(data, istart, istop, mode)
+        if streams_only:
+            return EpochsTensor(
+                data,
+                epochs_df.times,
+                eeg_streams,
+                epochs_df.metadata,
+                epoch_id=epochs_df.epoch_id,
+                time=epochs_df.time,
+            )
+        return _replace_tensor_streams(epochs_df, stream_idxs, data, inplace)
+
+    layout = _epochs_QC_layout(epochs_df, eeg_streams, epoch_id=epoch_id, time=time)
+    istart, istop = _find_subscript(layout.times, start, stop)
+
+    # C-contiguous float copy of the streams in epoch, time order
+    values = epochs_df[eeg_streams].to_numpy()
+    data = np.empty(values.shape, dtype="float64")
+    data[:] = values if layout.is_sorted else values[layout.row_order]
+
+    # reduce over the interval, broadcast back in place
+    _baseline_epochs_data(
+        data.reshape(layout.n_epochs, layout.n_times, len(eeg_streams)),
+        istart,
+        istop,
+        mode,
+    )
 
-    # use pandas iloc index slicing then groupby epoch_id to compute means
-    mns = epochs_df.iloc[center_idxs, :].groupby(epoch_id)[eeg_streams].mean()
+    if not layout.is_sorted:
+        sorted_data, data = data, np.empty_like(data)
+        data[layout.row_order] = sorted_data
 
-    # inflate the means to the shape of the data and subtract in place, not sure if view() saves memory
-    centered_epochs_df = epochs_df.copy()
-    centered_epochs_df[eeg_streams] -= np.repeat(mns.to_numpy().view(), n_times, axis=0)
+    if streams_only:
+        return pd.DataFrame(
+            data, index=epochs_df.index, columns=eeg_streams, copy=False
+        )
 
-    return centered_epochs_df
+    return _replace_streams(epochs_df, eeg_streams, data, layout, inplace)
 
 
 def drop_bad_epochs(epochs_df, bads_column, epoch_id=EPOCH_ID, time=EPOCH_ID):
@@ -267,11 +1014,14 @@ def drop_bad_epochs(epochs_df, bads_column, epoch_id=EPOCH_ID, time=EPOCH_ID):
 
     Parameters
     ----------
-    epochs_df : pd.DataFrame
+    epochs_df : pd.DataFrame or EpochsTensor
         must have epoch_id and time row index names
 
     bads_column : str
-        column name with QC codes: non-zero == drop
+        column name with QC codes: non-zero == drop. For an
+        EpochsTensor this is a data stream, read at time 0, or a
+        metadata column, which :meth:`EpochsTensor.from_epochs_df`
+        reads at time 0 by default
 
     epoch_id : str, optional
         column name for epoch indexes
@@ -281,24 +1031,108 @@ def drop_bad_epochs(epochs_df, bads_column, epoch_id=EPOCH_ID, time=EPOCH_ID):
 
     Returns
     -------
-    good_epochs_df : pd.DataFrame
+    good_epochs_df : pd.DataFrame or EpochsTensor
        subset of the epochs with code 0 on `bads_column` at timestamp == 0
 
     """
 
+    if isinstance(epochs_df, EpochsTensor):
+        if bads_column in epochs_df.streams:
+            time_idx = np.flatnonzero(epochs_df.times == 0)
+            if not len(time_idx):
+                raise ValueError("drop_bad_epochs needs the time stamp 0")
+            stream_idx = epochs_df.stream_index([bads_column])[0]
+            bads = epochs_df.data[:, time_idx[0], stream_idx]
+        elif bads_column in epochs_df.metadata.columns:
+            bads = epochs_df.metadata[bads_column].to_numpy()
+        else:
+            raise ValueError(f"bads_column not found: {bads_column}")
+        good = bads == 0
+        return epochs_df.copy(
+            data=epochs_df.data[good],
+            metadata=epochs_df.metadata[good].reset_index(drop=True),
+        )
+
     _epochs_QC(epochs_df, [bads_column], epoch_id=epoch_id, time=time)
 
     # get the group of time == 0
-    group = epochs_df.groupby([time]).get_group(0)
+    group = epochs_df[epochs_df[time] == 0]
 
     good_idx = list(group[epoch_id][group[bads_column] == 0])
 
-    good_epochs_df = epochs_df[epochs_df[epoch_id].isin(good_idx)].copy()
+    good_epochs_df = epochs_df[epochs_df[epoch_id].isin(good_idx)]
+    if not _copy_on_write():
+        # a plain frame, not a flagged slice of epochs_df
+        good_epochs_df = good_epochs_df.copy()
 
     return good_epochs_df
 
 
-def re_reference(epochs_df, eeg_streams, ref, ref_type, epoch_id=EPOCH_ID, time=TIME):
+def peak_to_peak(
+    epochs_df, data_streams, start=None, stop=None, epoch_id=EPOCH_ID, time=TIME
+):
+    """peak-to-peak amplitude of each epoch and data stream, e.g., to screen artifacts
+
+    Parameters
+    ----------
+    epochs_df : pd.DataFrame or EpochsTensor
+        must have epoch_id and time columns
+
+    data_streams: list of str
+        column names to measure
+
+    start,stop : int, optional
+        time interval to measure, `start <= t < stop` like
+        :py:func:`center_eeg`, default is the whole epoch
+
+    epoch_id : str, optional
+        column name for epoch indexes
+
+    time: str, optional
+        column name for time stamps
+
+    Returns
+    -------
+    pd.DataFrame
+        max - min amplitude, one row per epoch indexed by `epoch_id`,
+        one column per data stream
+
+
+    Examples
+    --------
+    >>> ptp = epf.peak_to_peak(epochs_df, eeg_streams, -100, 800)
+    >>> bad_epoch_ids = ptp.index[(ptp > 150).any(axis=1)]
+
+    """
+
+    if isinstance(epochs_df, EpochsTensor):
+        data = epochs_df.data[:, :, epochs_df.stream_index(data_streams)]
+        times, epoch_ids = epochs_df.times, epochs_df.epoch_ids
+        epoch_id = epochs_df.epoch_id
+    else:
+        layout = _epochs_QC_layout(
+            epochs_df, data_streams, epoch_id=epoch_id, time=time
+        )
+        data = _epochs_data(epochs_df, data_streams, layout)
+        times, epoch_ids = layout.times, layout.epoch_ids
+
+    istart, istop = 0, len(times)
+    if start is not None:
+        istart = _find_subscript(times, start, times[-1])[0]
+    if stop is not None:
+        istop = _find_subscript(times, times[0], stop)[1]
+
+    ptps = _kernels.peak_to_peak(
+        np.ascontiguousarray(data, dtype="float64"), istart, istop
+    )
+    return pd.DataFrame(
+        ptps, index=pd.Index(epoch_ids, name=epoch_id), columns=data_streams
+    )
+
+
+def re_reference(
+    epochs_df, eeg_streams, ref, ref_type, epoch_id=EPOCH_ID, time=TIME, inplace=False
+):
     """Convert EEG data recorded with a common reference to a different reference
 
     .. warning::
@@ -309,28 +1143,33 @@ def re_reference(epochs_df, eeg_streams, ref, ref_type, epoch_id=EPOCH_ID, time=
 
     Parameters
     ----------
-    epochs_df : pd.DataFrame
+    epochs_df : pd.DataFrame or EpochsTensor
         must have epoch_id and time row index names
-   
+
     eeg_streams : list-like of str
         the names of colums to transform
-       
+
     ref : str or list-like of str
         name of the 2nd stream for a linked pair, the new common
         reference, or the complete list of streams to use for a common
         average reference
-        
+
     type : str = {'linked_pair', 'new_common', 'common_average'}
 
     epoch_id : str, optional
 
     time : str, optional
 
+    inplace : bool, optional
+        if True, re-reference the `eeg_streams` in `epochs_df` itself
+        and return None
+
 
     Returns
     -------
-    pd.DataFrame
-       a copy of epochs_df with `eeg_streams` re-referenced
+    pd.DataFrame or EpochsTensor or None
+       epochs_df with `eeg_streams` re-referenced, the other columns
+       are shared with `epochs_df` copy-on-write, else copied
 
 
     Note
@@ -347,7 +1186,7 @@ def re_reference(epochs_df, eeg_streams, ref, ref_type, epoch_id=EPOCH_ID, time=
 
     `new_common`
         Transforms EEG to a different common reference location:
-    
+
         .. math::
            EEG_{\\text{re-referenced}} = EEG - EEG_{ref}
 
@@ -361,7 +1200,7 @@ def re_reference(epochs_df, eeg_streams, ref, ref_type, epoch_id=EPOCH_ID, time=
            EEG_{\\text{re-referenced}} = EEG - \\frac{\\sum_{i=0}^{i=N}{EEG_{ref[i]}}}{N}
 
 
-   
+
     Examples
     --------
 
@@ -370,22 +1209,37 @@ def re_reference(epochs_df, eeg_streams, ref, ref_type, epoch_id=EPOCH_ID, time=
     >>> eeg_streams = ['MiPf', 'MiCe', 'MiPa', 'MiOc']
     >>> re_reference(epochs_df, eeg_streams, 'A2', 'linked_pair')
 
-    
+
     Switch to a vertex reference, MiCe
 
-    >>> eeg_streams = ['MiPf', 'MiCe', 'MiPa', 'MiOc']  
+    >>> eeg_streams = ['MiPf', 'MiCe', 'MiPa', 'MiOc']
     >>> br_epochs_df = epf.re_reference(epochs_df, eeg_streams, 'MiCe', "new_common")
 
 
     Switch to a common average reference (typically all available EEG data streams)
 
-    >>> eeg_streams = ['MiPf', 'MiCe', 'MiPa', 'MiOc']  
+    >>> eeg_streams = ['MiPf', 'MiCe', 'MiPa', 'MiOc']
     >>> ref = eeg_streams
     >>> br_epochs_df = epf.re_reference(epochs_df, eeg_streams, ref, "common_average")
 
+
+    See Also
+    --------
+    re_reference_many : several references with one matrix product
+
     """
 
-    _epochs_QC(epochs_df, eeg_streams, epoch_id=epoch_id, time=time)
+    layout, [data] = _re_reference_data(
+        epochs_df, [(eeg_streams, ref, ref_type)], epoch_id=epoch_id, time=time
+    )
+    if isinstance(epochs_df, EpochsTensor):
+        stream_idxs = epochs_df.stream_index(eeg_streams)
+        return _replace_tensor_streams(epochs_df, stream_idxs, data, inplace)
+    return _replace_streams(epochs_df, list(eeg_streams), data, layout, inplace)
+
+
+def _reference_streams(ref, ref_type):
+    """check the ref and ref_type, return the reference streams as a list"""
 
     # ref must be a list of strings with len(ref)>1 for ref_type of 'common_average'
     if ref_type == "common_average":
@@ -396,23 +1250,182 @@ def re_reference(epochs_df, eeg_streams, ref, ref_type, epoch_id=EPOCH_ID, time=
                 "ref should be a list of strings with length greater than 1."
             )
 
-    if isinstance(ref, list) and len(ref) == 1:
-        ref = "".join(ref)
+    if ref_type not in ["linked_pair", "new_common", "common_average"]:
+        raise ValueError(f"unknown reference type: ref_type={ref_type}")
+
+    return [ref] if isinstance(ref, str) else list(ref)
+
+
+def _reference_weights(in_streams, ref, ref_type):
+    """weights of the in_streams that sum to the new reference"""
+    refs = _reference_streams(ref, ref_type)
+    weight = (0.5 if ref_type == "linked_pair" else 1.0) / len(refs)
+    weights = np.zeros(len(in_streams))
+    for ref_stream in refs:
+        weights[in_streams.index(ref_stream)] += weight
+    return weights
+
+
+def _nan_references(in_data, in_streams, references, axis):
+    """new references from the reference streams alone, NaN-aware
+
+    The matrix product spreads a NaN in any stream read to every new
+    reference. This reduces just the reference streams, skipping NaN
+    samples for a common average like the pandas mean does, with the
+    new references stacked on the stream axis.
+    """
+    new_refs = []
+    for _, ref, ref_type in references:
+        weights = _reference_weights(in_streams, ref, ref_type)
+        idxs = np.flatnonzero(weights)
+        ref_data = np.take(in_data, idxs, axis=axis)
+        if ref_type == "common_average":
+            new_refs.append(bn.nanmean(ref_data, axis=axis))
+        else:
+            new_refs.append(np.tensordot(ref_data, weights[idxs], axes=([axis], [0])))
+    return np.stack(new_refs, axis=axis)
+
+
+def re_reference_many(epochs_df, references, epoch_id=EPOCH_ID, time=TIME):
+    """Re-reference EEG data several ways reading the data only once
+
+    Parameters
+    ----------
+    epochs_df : pd.DataFrame or EpochsTensor
+        must have epoch_id and time row index names
+
+    references : dict
+        `{name: (eeg_streams, ref, ref_type)}`, the `re_reference`
+        arguments for each new reference
+
+    epoch_id : str, optional
+
+    time : str, optional
+
+
+    Returns
+    -------
+    dict
+        `{name: pd.DataFrame or EpochsTensor}`, each the same as
+        `re_reference(epochs_df, eeg_streams, ref, ref_type)`
+
+
+    Notes
+    -----
+
+    Each re-reference is a linear operator from the streams read to
+    the eeg_streams, the identity less the reference weights in every
+    column. So all the new references are computed with one matrix
+    product of the streams and the (n_streams, n_references) weights
+    and subtracted from the eeg_streams by broadcasting, which scales
+    with the number of streams not its square like the full operator
+    matrix does on high density caps. If the data have NaN samples
+    each reference is reduced from its own streams instead, so NaN
+    samples are skipped by a common average, as in `re_reference`,
+    and don't reach the other references. The other columns of the
+    returned frames are shared with `epochs_df` copy-on-write, else
+    copied.
+
+
+    Examples
+    --------
+
+    Linked mastoids, common average and vertex references at once
+
+    >>> eeg_streams = ['MiPf', 'MiCe', 'MiPa', 'MiOc']
+    >>> refs = epf.re_reference_many(
+    ...     epochs_df,
+    ...     {
+    ...         "bimastoid": (eeg_streams, "A2", "linked_pair"),
+    ...         "average": (eeg_streams, eeg_streams, "common_average"),
+    ...         "vertex": (eeg_streams, "MiCe", "new_common"),
+    ...     },
+    ... )
+    >>> refs["average"]
+
+    """
+
+    layout, re_referenced = _re_reference_data(
+        epochs_df, references.values(), epoch_id=epoch_id, time=time
+    )
+    re_referenced = dict(zip(references, re_referenced))
+    for name, (eeg_streams, _, _) in references.items():
+        if isinstance(epochs_df, EpochsTensor):
+            re_referenced[name] = _replace_tensor_streams(
+                epochs_df, epochs_df.stream_index(eeg_streams), re_referenced[name]
+            )
+        else:
+            re_referenced[name] = _replace_streams(
+                epochs_df, list(eeg_streams), re_referenced[name], layout
+            )
+    return re_referenced
+
+
+def _re_reference_data(epochs_df, references, epoch_id=EPOCH_ID, time=TIME):
+    """re-referenced eeg_streams data for each (eeg_streams, ref, ref_type)
 
-    if ref_type == "linked_pair":
-        new_ref = epochs_df[ref] / 2.0
-    elif ref_type == "new_common":
-        new_ref = epochs_df[ref]
-    elif ref_type == "common_average":
-        new_ref = epochs_df[ref].mean(axis=1)
+    Returns
+    -------
+    layout : EpochsLayout or None
+        None for an EpochsTensor
+    re_referenced : list of np.ndarray
+        (n_rows, n_eeg_streams) or (n_epochs, n_times, n_eeg_streams)
+        for an EpochsTensor
+    """
+    references = list(references)
+
+    # every stream read, once
+    in_streams = []
+    for eeg_streams, ref, ref_type in references:
+        for stream in list(eeg_streams) + _reference_streams(ref, ref_type):
+            if stream not in in_streams:
+                in_streams.append(stream)
+
+    layout = None
+    is_tensor = isinstance(epochs_df, EpochsTensor)
+    if is_tensor:
+        epochs_df.stream_index(in_streams)
+        streams = epochs_df.streams
     else:
-        raise ValueError(f"unknown reference type: ref_type={ref_type}")
+        layout = _epochs_QC_layout(epochs_df, in_streams, epoch_id=epoch_id, time=time)
+        streams = list(epochs_df.columns)
+
+    # in the order stored, reordering the columns would copy them
+    in_streams.sort(key=streams.index)
+
+    weights = np.column_stack(
+        [
+            _reference_weights(in_streams, ref, ref_type)
+            for _, ref, ref_type in references
+        ]
+    )
 
-    br_epochs_df = epochs_df.copy()
-    for col in eeg_streams:
-        br_epochs_df[col] = br_epochs_df[col] - new_ref
+    if is_tensor:
+        # (n_epochs, n_times, n_in_streams)
+        in_data = epochs_df.data[:, :, epochs_df.stream_index(in_streams)]
+        if np.isnan(in_data).any():
+            new_refs = _nan_references(in_data, in_streams, references, axis=-1)
+        else:
+            new_refs = in_data @ weights
+        return layout, [
+            in_data[:, :, [in_streams.index(stream) for stream in eeg_streams]]
+            - new_refs[:, :, i, None]
+            for i, (eeg_streams, _, _) in enumerate(references)
+        ]
 
-    return br_epochs_df
+    # stream by stream, re-referencing is row by row so the rows can
+    # stay in any order
+    in_data = epochs_df[in_streams].to_numpy(dtype="float64").T
+    if np.isnan(in_data).any():
+        new_refs = _nan_references(in_data, in_streams, references, axis=0)
+    else:
+        new_refs = weights.T @ in_data
+    re_referenced = []
+    for (eeg_streams, _, _), new_ref in zip(references, new_refs):
+        data = in_data[[in_streams.index(stream) for stream in eeg_streams]]
+        data -= new_ref
+        re_referenced.append(data.T)
+    return layout, re_referenced
 
 
 def fir_filter_epochs(
@@ -425,14 +1438,17 @@ def fir_filter_epochs(
     window=None,
     sfreq=None,
     trim_edges=False,
+    by_epoch=False,
+    engine="auto",
     epoch_id=EPOCH_ID,
     time=TIME,
+    inplace=False,
 ):
     """apply FIRLS filtering to spudtr format epoched data
 
     Parameters
     ----------
-    epochs_df : pd.DataFrame 
+    epochs_df : pd.DataFrame or EpochsTensor
         must be a spudtr format epochs dataframe with epoch_id, time columns
     data_columns: list of str
         column names to apply the transform
@@ -450,15 +1466,27 @@ def fir_filter_epochs(
         sampling frequency, e.g., 250.0, 500.0
     trim_edges : bool
         True trim edges, False not trim edges
+    by_epoch : bool
+        True filters each epoch separately with its own mirror padded
+        edges, all epochs and columns in one pass. False (default)
+        filters each column end to end as one time series, so the
+        filter runs across the epoch boundaries.
+    engine : str {'auto', 'direct', 'fft', 'overlap-add'}, optional
+        convolution algorithm, the default 'auto' picks the cheapest
+        for the filter length and epoch length
     epoch_id : str {"epoch_id"}, optional
         column name for epoch index
     time: str {"time"}, optional
         column name for timestamps
+    inplace : bool, optional
+        if True, filter the `data_columns` in `epochs_df` itself and
+        return None, not with `trim_edges`
 
     Returns
     -------
-    pd.DataFrame
-        a copy of epochs_df, with data in `data_columns` filtered
+    pd.DataFrame or EpochsTensor or None
+        epochs_df with data in `data_columns` filtered, the other
+        columns are shared with `epochs_df` copy-on-write, else copied
 
 
     Notes
@@ -467,6 +1495,9 @@ def fir_filter_epochs(
     ``filter_params`` dictionary and expanding it like so
     ``fir_filter_epochs( ..., **filter_params)``.
 
+    With `by_epoch=True` each epoch must be longer than the filter
+    delay, i.e., 1/2 the filter length.
+
     By default the filtered epochs have the same length as the
     original. The `trim_edges` option returns the center interval of
     each epoch, free from distortion at the edges but this may result in
@@ -484,7 +1515,7 @@ def fir_filter_epochs(
     >>> epoch_id = "epoch_id"
     >>> time = "time_ms"
     >>> filt_test_df = epochs_filters(
-            epochs_df, 
+            epochs_df,
             data_columns,
             ftype=ftype,
             cutoff_hz=cutoff_hz,
@@ -501,8 +1532,6 @@ def fir_filter_epochs(
 
     # it is crucial to enforce the spudtr epochs format because trimming
     # needs to know about epoch boundaries and times
-    _epochs_QC(epochs_df, data_columns, epoch_id=epoch_id, time=time)
-
     _fparams = dict(
         ftype=ftype,
         cutoff_hz=cutoff_hz,
@@ -512,17 +1541,243 @@ def fir_filter_epochs(
         window=window,
     )
 
+    if trim_edges and inplace:
+        raise ValueError("trim_edges drops samples, it can't be done inplace")
+
+    if isinstance(epochs_df, EpochsTensor):
+        stream_idxs = epochs_df.stream_index(data_columns)
+        taps = _design_firwin_filter(**check_filter_params(**_fparams))
+        n_epochs, n_times, n_streams = epochs_df.shape
+
+        if by_epoch:
+            _check_epoch_length(n_times, taps)
+            data = _apply_firwin_filter_data(
+                _float_copy(epochs_df.data[:, :, stream_idxs]),
+                taps,
+                axis=1,
+                engine=engine,
+            )
+        else:
+            # filter the epochs end to end like the data frame columns
+            data = np.empty((n_epochs * n_times, len(stream_idxs)))
+            flat_data = epochs_df.data.reshape(n_epochs * n_times, n_streams)
+            for i, idx in enumerate(stream_idxs):
+                data[:, i] = _apply_firwin_filter_data(
+                    _float_copy(flat_data[:, idx]), taps, engine=engine
+                )
+            data = data.reshape(n_epochs, n_times, len(stream_idxs))
+
+        if not trim_edges:
+            return _replace_tensor_streams(epochs_df, stream_idxs, data, inplace)
+
+        filt_epochs = _replace_tensor_streams(epochs_df, stream_idxs, data)
+        n_edge = int(np.floor(len(taps) / 2.0))
+        return filt_epochs.copy(
+            data=filt_epochs.data[:, n_edge : n_times - n_edge, :],
+            times=filt_epochs.times[n_edge : n_times - n_edge],
+        )
+
+    layout = _epochs_QC_layout(epochs_df, data_columns, epoch_id=epoch_id, time=time)
+
     # build and apply the filter
-    filt_epochs_df = fir_filter_dt(epochs_df, data_columns, **_fparams)
+    if by_epoch:
+        taps = _design_firwin_filter(**check_filter_params(**_fparams))
+        _check_epoch_length(layout.n_times, taps)
+
+        # (n_epochs, n_times, n_columns) in one batch along the time axis
+        data = _apply_firwin_filter_data(
+            _epochs_data(epochs_df, data_columns, layout),
+            taps,
+            axis=1,
+            engine=engine,
+        ).reshape(len(epochs_df), len(data_columns))
+        if not layout.is_sorted:
+            sorted_data, data = data, np.empty_like(data)
+            data[layout.row_order] = sorted_data
+
+        filt_epochs_df = _replace_streams(
+            epochs_df, data_columns, data, layout, inplace
+        )
+    else:
+        filt_epochs_df = fir_filter_dt(
+            epochs_df, data_columns, engine=engine, inplace=inplace, **_fparams
+        )
+    if inplace:
+        epochs_df.spudtr._bind(layout)
+        return None
 
     # this trims edges in *each epoch*, 1/2 length of the filter
     if trim_edges:
         taps = _design_firwin_filter(**_fparams)
         n_edge = int(np.floor(len(taps) / 2.0))
-        times = filt_epochs_df[time].unique()
+        times = layout.times
         start_good = times[n_edge]  # first good sample
         stop_good = times[-(n_edge + 1)]  # last good sample
         qstr = f"{time} >= @start_good and {time} <= @stop_good"
-        filt_epochs_df = filt_epochs_df.query(qstr).copy()
+        filt_epochs_df = filt_epochs_df.query(qstr)
+    else:
+        filt_epochs_df.spudtr._bind(layout)
 
     return filt_epochs_df
+
+
+def _resample_params(times, sfreq, new_sfreq, width_hz, ripple_db, window, time=TIME):
+    """how to resample epochs with these time stamps, see resample_epochs
+
+    Returns
+    -------
+    start : int
+        samples to drop from the start of each epoch to keep time 0
+    up, down : int
+        resampling ratio
+    taps : np.ndarray
+        anti-aliasing lowpass filter at the upsampled rate
+    new_times : np.ndarray
+        time stamps at the new sampling rate
+    """
+    for _key, _val in [("sfreq", sfreq), ("new_sfreq", new_sfreq)]:
+        try:
+            assert float(_val) > 0
+        except Exception:
+            raise ValueError(f"{_key}={_val}, must be a positive number")
+
+    ratio = Fraction(float(new_sfreq) / float(sfreq)).limit_denominator(1000)
+    up, down = ratio.numerator, ratio.denominator
+
+    # evenly spaced to within rounding like EpochsLayout.sampling_interval
+    intervals = np.diff(times)
+    if not len(intervals) or not np.allclose(intervals, intervals[0]):
+        raise ValueError(f"{time} stamps must be evenly spaced to resample")
+    interval = (times[-1] - times[0]) / len(intervals)
+
+    # keep time 0 on the new time grid
+    start = 0
+    zero_idx = np.flatnonzero(times == 0)
+    if len(zero_idx):
+        start = zero_idx[0] % down
+    times = times[start:]
+
+    # anti-aliasing lowpass at the upsampled rate, stop band at the lower Nyquist
+    nyquist_hz = min(float(sfreq), float(new_sfreq)) / 2.0
+    if width_hz is None:
+        width_hz = 0.2 * nyquist_hz
+    taps = _design_firwin_filter(
+        **check_filter_params(
+            ftype="lowpass",
+            cutoff_hz=nyquist_hz - width_hz / 2.0,
+            sfreq=float(sfreq) * up,
+            width_hz=width_hz,
+            ripple_db=ripple_db,
+            window=window,
+        )
+    )
+
+    # resample_poly output length
+    n_times = -(-len(times) * up // down)
+    new_times = times[0] + np.arange(n_times) * (interval * down / up)
+    if np.issubdtype(times.dtype, np.integer) and np.all(
+        new_times == np.round(new_times)
+    ):
+        new_times = new_times.astype(times.dtype)
+    return start, up, down, taps, new_times
+
+
+def resample_epochs(
+    epochs_df,
+    data_streams,
+    new_sfreq,
+    sfreq=None,
+    width_hz=None,
+    ripple_db=53.0,
+    window="kaiser",
+    time_stamp=None,
+    epoch_id=EPOCH_ID,
+    time=TIME,
+):
+    """change the sampling rate of spudtr format epochs with polyphase filtering
+
+    Each epoch of each data stream is upsampled, anti-alias lowpass
+    filtered and downsampled in one polyphase pass along the time axis
+    with mirror padded edges like :py:func:`fir_filter_epochs`.
+
+    Parameters
+    ----------
+    epochs_df : pd.DataFrame or EpochsTensor
+        must be a spudtr format epochs dataframe with epoch_id, time columns
+    data_streams: list of str
+        column names to resample
+    new_sfreq : float
+        new sampling frequency, e.g., 125.0
+    sfreq : float
+        current sampling frequency, e.g., 500.0
+    width_hz : float, optional
+        anti-aliasing filter transition band width (Hz), the stop band
+        starts at the lower of the two Nyquist frequencies. The default
+        is 20% of the lower Nyquist frequency.
+    ripple_db : float, optional
+        anti-aliasing filter ripple, in dB
+    window : str {'kaiser','hamming','hann','blackman'}, optional
+        window type for the anti-aliasing filter
+    time_stamp : scalar, optional
+        the other columns are epoch-level metadata, looked up at this
+        time stamp, default is time 0 if there is one, otherwise the
+        first time stamp. Per-sample columns, e.g., artifact flags,
+        are not resampled, the value at this time stamp is repeated at
+        each new time stamp.
+    epoch_id : str {"epoch_id"}, optional
+        column name for epoch index
+    time: str {"time"}, optional
+        column name for timestamps
+
+    Returns
+    -------
+    pd.DataFrame or EpochsTensor
+        spudtr format epochs with the `data_streams` at the new
+        sampling rate, a new `time` column and the epoch metadata
+
+
+    Notes
+    -----
+    The ratio of sampling rates is approximated by a fraction up /
+    down with denominator at most 1000. When time 0 is one of the
+    time stamps, the first few samples of each epoch are dropped as
+    needed to keep it one of the new time stamps.
+
+
+    Examples
+    --------
+    >>> epochs_df = epf.resample_epochs(epochs_df, eeg_streams, 125.0, sfreq=500.0)
+
+    """
+
+    is_tensor = isinstance(epochs_df, EpochsTensor)
+    if is_tensor:
+        epochs = epochs_df
+        stream_idxs = epochs.stream_index(data_streams)
+        data = epochs.data[:, :, stream_idxs]
+    else:
+        epochs = EpochsTensor.from_epochs_df(
+            epochs_df, data_streams, epoch_id=epoch_id, time=time, time_stamp=time_stamp
+        )
+        data = epochs.data
+
+    start, up, down, taps, new_times = _resample_params(
+        epochs.times, sfreq, new_sfreq, width_hz, ripple_db, window, time=time
+    )
+    data = signal.resample_poly(
+        data[:, start:, :], up, down, axis=1, window=taps, padtype="symmetric"
+    )
+
+    resampled = EpochsTensor(
+        data,
+        new_times,
+        data_streams,
+        epochs.metadata,
+        epoch_id=epochs.epoch_id,
+        time=epochs.time,
+    )
+    if is_tensor:
+        return resampled
+
+    resampled._columns = epochs._columns
+    return resampled.to_epochs_df()
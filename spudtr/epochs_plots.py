@@ -1,142 +1,104 @@
-from matplotlib import pyplot as plt
-import pandas as pd
-import mne
-import tkinter
-import tkinter.filedialog
-import yaml
-from tkinter import font as tkFont
-from spudtr import mneutils, DATA_DIR, RESOURCES_DIR
-
-root = tkinter.Tk()
-helv16 = tkFont.Font(family="Helvetica", size=16, weight=tkFont.BOLD)
+"""tkinter GUI to pick a spudtr epochs file and plot it with MNE
 
+Run as a script::
 
-def OpenFile():
-    global f_eeg
-    f_eeg = tkinter.filedialog.askopenfilename(
-        parent=root,
-        initialdir=DATA_DIR,
-        title="Choose file",
-        filetypes=[("feather files", "*.feather"), ("all files", "*.*")],
-    )
-    print(f_eeg)
+    python -m spudtr.epochs_plots
 
+Importing the module doesn't open a window or load tkinter, matplotlib
+or mne, they are loaded when ``main()`` runs so the module is safe to
+import on display-less machines.
+"""
 
-config_file = RESOURCES_DIR / "default.yml"
-
+from spudtr import mneutils, DATA_DIR, RESOURCES_DIR
 
-def OpenYaml_config():
-    global config_file
-    config_file = tkinter.filedialog.askopenfilename(
-        parent=root,
-        initialdir=RESOURCES_DIR,
-        title="Choose yaml file",
-        filetypes=[("yaml files", "*.yml"), ("all files", "*.*")],
+# (button text, color) for the epochs_plot choices 1, 2, ...
+PLOT_BUTTONS = [
+    ("Create evokeds plot", "yellow"),
+    ("Create compare evokeds plot", "blue"),
+    ("Create epochs plot", "green"),
+    ("Create epochs image plot", "orange"),
+    ("Plot psd topomap", "black"),
+    ("Evokeds animation", "magenta"),
+]
+
+
+def choose_plot():
+    """show the file and plot pickers, returns f_eeg, config_file, epochs_plot"""
+    import tkinter
+    import tkinter.filedialog
+    from tkinter import font as tkFont
+
+    choice = dict(f_eeg=None, config_file=RESOURCES_DIR / "default.yml", epochs_plot=0)
+
+    root = tkinter.Tk()
+    helv16 = tkFont.Font(family="Helvetica", size=16, weight=tkFont.BOLD)
+
+    def OpenFile():
+        choice["f_eeg"] = tkinter.filedialog.askopenfilename(
+            parent=root,
+            initialdir=DATA_DIR,
+            title="Choose file",
+            filetypes=[("feather files", "*.feather"), ("all files", "*.*")],
+        )
+        print(choice["f_eeg"])
+
+    def OpenYaml_config():
+        choice["config_file"] = tkinter.filedialog.askopenfilename(
+            parent=root,
+            initialdir=RESOURCES_DIR,
+            title="Choose yaml file",
+            filetypes=[("yaml files", "*.yml"), ("all files", "*.*")],
+        )
+        print(choice["config_file"])
+
+    def quit(n):
+        choice["epochs_plot"] = n
+        root.destroy()
+
+    b1 = tkinter.Button(
+        root,
+        text="Select a eeg file. *",
+        height=3,
+        width=20,
+        font=helv16,
+        fg="red",
+        command=OpenFile,
     )
-    print(config_file)
-
-
-def quit(n):
-    global epochs_plot
-    epochs_plot = n
-    root.destroy()
-
-
-b1 = tkinter.Button(
-    root,
-    text="Select a eeg file. *",
-    height=3,
-    width=20,
-    font=helv16,
-    fg="red",
-    command=OpenFile,
-)
-b1.pack(fill="x")
-b2 = tkinter.Button(
-    root,
-    text="Select a config yaml file. *",
-    height=3,
-    width=20,
-    font=helv16,
-    fg="red",
-    command=OpenYaml_config,
-)
-b2.pack(fill="x")
-
-button_plot1 = tkinter.Button(
-    root,
-    text="Create evokeds plot",
-    height=3,
-    width=20,
-    font=helv16,
-    fg="yellow",
-    command=lambda: quit(1),
-)
-button_plot1.pack(fill="x")
-
-button_plot2 = tkinter.Button(
-    root,
-    text="Create compare evokeds plot",
-    height=3,
-    width=20,
-    font=helv16,
-    fg="blue",
-    command=lambda: quit(2),
-)
-button_plot2.pack(fill="x")
-
-button_plot3 = tkinter.Button(
-    root,
-    text="Create epochs plot",
-    height=3,
-    width=20,
-    font=helv16,
-    fg="green",
-    command=lambda: quit(3),
-)
-button_plot3.pack(fill="x")
-
-button_plot4 = tkinter.Button(
-    root,
-    text="Create epochs image plot",
-    height=3,
-    width=20,
-    font=helv16,
-    fg="orange",
-    command=lambda: quit(4),
-)
-button_plot4.pack(fill="x")
-
-button_plot5 = tkinter.Button(
-    root,
-    text="Plot psd topomap",
-    height=3,
-    width=20,
-    font=helv16,
-    fg="black",
-    command=lambda: quit(5),
-)
-button_plot5.pack(fill="x")
-
-button_plot6 = tkinter.Button(
-    root,
-    text="Evokeds animation",
-    height=3,
-    width=20,
-    font=helv16,
-    fg="magenta",
-    command=lambda: quit(6),
-)
-button_plot6.pack(fill="x")
-
-
-if __name__ == '__main__':
-
-    epochs_plot = 0
+    b1.pack(fill="x")
+    b2 = tkinter.Button(
+        root,
+        text="Select a config yaml file. *",
+        height=3,
+        width=20,
+        font=helv16,
+        fg="red",
+        command=OpenYaml_config,
+    )
+    b2.pack(fill="x")
+
+    for n, (text, fg) in enumerate(PLOT_BUTTONS, 1):
+        button_plot = tkinter.Button(
+            root,
+            text=text,
+            height=3,
+            width=20,
+            font=helv16,
+            fg=fg,
+            command=lambda n=n: quit(n),
+        )
+        button_plot.pack(fill="x")
 
     root.wm_title("Spudtr epochs plots")
     root.geometry("320x618")
     root.mainloop()
+    return choice["f_eeg"], choice["config_file"], choice["epochs_plot"]
+
+
+def plot_epochs(f_eeg, config_file, epochs_plot):
+    """read the epochs file with the config settings and show the plot"""
+    from matplotlib import pyplot as plt
+    import mne
+    import yaml
 
     with open(config_file, "r") as stream:
         config_data = yaml.safe_load(stream)
@@ -170,7 +132,9 @@ if __name__ == '__main__':
     evokeds_dict = {cond: epochs[cond].average() for cond in mne_event_id}
 
     if epochs_plot == 1:
-        fig, ax = plt.subplots(len(evokeds_dict), 1, figsize=(10, len(evokeds_dict) * 3))
+        fig, ax = plt.subplots(
+            len(evokeds_dict), 1, figsize=(10, len(evokeds_dict) * 3)
+        )
         if len(evokeds_dict) == 1:
             for x in evokeds_dict:
                 evokeds_dict[x].plot(
@@ -205,7 +169,11 @@ if __name__ == '__main__':
     elif epochs_plot == 3:
         for x in events_list:
             epochs[x].plot(
-                picks="eeg", scalings="auto", show=False, n_channels=10, n_epochs=10,
+                picks="eeg",
+                scalings="auto",
+                show=False,
+                n_channels=10,
+                n_epochs=10,
             )
         plt.show()
     elif epochs_plot == 4:
@@ -238,3 +206,11 @@ if __name__ == '__main__':
             )
             fig.suptitle(x)
         plt.show()
+
+
+def main():
+    plot_epochs(*choose_plot())
+
+
+if __name__ == "__main__":
+    main()
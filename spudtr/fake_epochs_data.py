@@ -2,7 +2,14 @@ import numpy as np
 import pandas as pd
 
 from spudtr.epf import EPOCH_ID, TIME
-from patsy import balanced, demo_data
+
+# generate_epochs ERP components, latency and width in ms, amplitude
+# in uV plus the amplitude step for each category after the first
+ERP_COMPONENTS = [
+    (100.0, 20.0, -4.0, 0.0),
+    (180.0, 30.0, 3.0, 0.0),
+    (350.0, 80.0, 8.0, 4.0),
+]
 
 
 def _generate(
@@ -53,9 +60,9 @@ def _get_df(n_a=2, n_b=3, n_epochs=4, n_streams=3):
 
     epoch_id = np.repeat(range(n_epochs), n_times)
     time = np.tile(range(n_times), n_epochs)
-    factors = np.repeat(
-        pd.DataFrame(balanced(a=n_a, b=n_b)).to_numpy(), n_epochs, axis=0
-    )
+    # fully crossed a1 b1, a1 b2, ... like patsy.balanced
+    levels = [[f"a{i}", f"b{j}"] for i in range(1, n_a + 1) for j in range(1, n_b + 1)]
+    factors = np.repeat(np.array(levels), n_epochs, axis=0)
     data = np.arange(n_obs * n_streams).reshape(n_streams, n_obs).T
 
     df = pd.concat(
@@ -63,3 +70,215 @@ def _get_df(n_a=2, n_b=3, n_epochs=4, n_streams=3):
     )
     df.columns = ["epoch_id", "time", "a", "b", "x", "y", "z"]
     return df
+
+
+def _pink_noise(rng, shape, sfreq, alpha, dtype):
+    """1/f^alpha noise along the last axis with unit variance"""
+    freqs = np.fft.rfftfreq(shape[-1], d=1.0 / sfreq)
+    scale = np.zeros_like(freqs)
+    scale[1:] = freqs[1:] ** (-alpha / 2.0)  # amplitude, no DC
+    spectrum = np.fft.rfft(rng.standard_normal(shape, dtype=dtype), axis=-1)
+    noise = np.fft.irfft(spectrum * scale, n=shape[-1], axis=-1)
+    noise /= np.sqrt(np.mean(scale[1:] ** 2) * shape[-1] / (shape[-1] - 1))
+    return noise.astype(dtype, copy=False)
+
+
+def _epochs_chunk(
+    rng, categories, erps, times_s, sfreq, noise_uv, alpha, artifact_rate
+):
+    """(n_epochs, n_samples, n_channels) data and blink flags"""
+    n_epochs = len(categories)
+    _, n_samples, n_channels = erps.shape
+    dtype = erps.dtype
+
+    # background EEG, independent 1/f per channel plus a shared part
+    noise = _pink_noise(rng, (n_epochs, n_channels, n_samples), sfreq, alpha, dtype)
+    noise += 0.5 * _pink_noise(rng, (n_epochs, 1, n_samples), sfreq, alpha, dtype)
+    data = np.ascontiguousarray(noise.transpose(0, 2, 1))
+    data *= dtype.type(noise_uv / np.sqrt(1.25))  # 1 + 0.5**2 variance
+
+    # ERPs vary in amplitude from trial to trial
+    gains = rng.normal(1.0, 0.25, n_epochs).astype(dtype)
+    data += gains[:, None, None] * erps[categories]
+
+    # blinks, big slow positive bumps strongest at the first channels
+    artifacts = rng.random(n_epochs) < artifact_rate
+    n_artifacts = artifacts.sum()
+    if n_artifacts:
+        onsets = rng.uniform(times_s[0], times_s[-1], n_artifacts)
+        amps = rng.uniform(100.0, 200.0, n_artifacts)
+        blinks = amps[:, None] * np.exp(
+            -0.5 * ((times_s - onsets[:, None]) / 0.05) ** 2
+        )
+        frontal = np.exp(-np.arange(n_channels) / max(n_channels / 4.0, 1.0))
+        data[artifacts] += (blinks[:, :, None] * frontal).astype(dtype)
+
+    return data, artifacts
+
+
+def generate_epochs(
+    n_epochs,
+    n_samples,
+    n_channels,
+    n_categories=2,
+    sfreq=250.0,
+    tmin=-0.2,
+    chunk_epochs=1000,
+    dtype=np.float32,
+    noise_uv=10.0,
+    alpha=1.0,
+    artifact_rate=0.05,
+    seed=None,
+    epoch_id=EPOCH_ID,
+    time=TIME,
+):
+    """fake EEG epochs with 1/f background, ERPs and blinks, in chunks
+
+    Each chunk of `chunk_epochs` epochs is generated on demand with its
+    own random generator seeded from the `seed` and the chunk number,
+    so the data are reproducible chunk by chunk and only one chunk is
+    in memory at a time. The same `seed` and `chunk_epochs` give the
+    same data.
+
+    The categories cycle through ``cat0``, ``cat1``, ... like
+    `_generate`, the P3-like ERP component grows with the category
+    number. Epochs with blinks are flagged in ``eeg_artifact``.
+
+    Parameters
+    ----------
+    n_epochs, n_samples, n_channels, n_categories : int
+        size of the data, `n_epochs` in total
+
+    sfreq : float
+        samples per second
+
+    tmin : float
+        time of the first sample in seconds, the `time` column is in
+        milliseconds, int when they land on whole ms
+
+    chunk_epochs : int
+        epochs per chunk
+
+    dtype : np.float32 or np.float64
+        data stream dtype
+
+    noise_uv : float
+        background EEG standard deviation in microvolts
+
+    alpha : float
+        background spectrum is 1/f^alpha
+
+    artifact_rate : float
+        proportion of epochs with a blink
+
+    seed : int or None
+        entropy for np.random.SeedSequence, None for fresh entropy
+
+    epoch_id, time : str
+        column names
+
+    Returns
+    -------
+    chunks : iterator of pd.DataFrame
+        spudtr format epochs data, `chunk_epochs` epochs each, the last
+        may be shorter
+    channels : list of str
+        data stream column names, ``channel0``, ``channel1``, ...
+
+    """
+
+    seed_seq = np.random.SeedSequence(seed)
+    channels = [f"channel{i}" for i in range(n_channels)]
+    labels = np.array([f"cat{i}" for i in range(n_categories)])
+
+    times_s = tmin + np.arange(n_samples) / sfreq
+    times_ms = times_s * 1000.0
+    if np.allclose(times_ms, np.round(times_ms), rtol=0, atol=1e-6):
+        times_ms = np.round(times_ms).astype(np.int64)
+
+    # category ERP waveforms with a channel topography, the same every chunk
+    rng = np.random.default_rng(
+        np.random.SeedSequence(seed_seq.entropy, spawn_key=(0,))
+    )
+    topo = rng.uniform(0.5, 1.5, n_channels)
+    erps = np.zeros((n_categories, n_samples, n_channels), dtype=dtype)
+    for cat in range(n_categories):
+        for latency, width, amp, step in ERP_COMPONENTS:
+            wave = (amp + cat * step) * np.exp(
+                -0.5 * ((times_s - latency / 1000.0) / (width / 1000.0)) ** 2
+            )
+            erps[cat] += (wave[:, None] * topo).astype(dtype)
+
+    def chunks():
+        for chunk, first_epoch in enumerate(range(0, n_epochs, chunk_epochs)):
+            chunk_rng = np.random.default_rng(
+                np.random.SeedSequence(seed_seq.entropy, spawn_key=(1, chunk))
+            )
+            epoch_ids = np.arange(
+                first_epoch, min(first_epoch + chunk_epochs, n_epochs)
+            )
+            categories = epoch_ids % n_categories
+            data, artifacts = _epochs_chunk(
+                chunk_rng,
+                categories,
+                erps,
+                times_s,
+                sfreq,
+                noise_uv,
+                alpha,
+                artifact_rate,
+            )
+            index_df = pd.DataFrame(
+                {
+                    epoch_id: np.repeat(epoch_ids, n_samples),
+                    time: np.tile(times_ms, len(epoch_ids)),
+                    "categorical": np.repeat(labels[categories], n_samples),
+                    "eeg_artifact": np.repeat(artifacts.astype(np.int64), n_samples),
+                }
+            )
+            eeg_df = pd.DataFrame(
+                data.reshape(-1, n_channels), columns=channels, copy=False
+            )
+            yield pd.concat([index_df, eeg_df], axis=1)
+
+    return chunks(), channels
+
+
+def write_epochs(epochs_f, n_epochs, n_samples, n_channels, **kwargs):
+    """write `generate_epochs` data to a feather file chunk by chunk
+
+    The file is uncompressed Arrow IPC (feather v2), written one chunk
+    at a time so it can be bigger than memory, read it back with
+    ``epf.read_epochs``.
+
+    Parameters
+    ----------
+    epochs_f : str or Path
+        file to write
+
+    n_epochs, n_samples, n_channels : int
+        size of the data
+
+    **kwargs
+        passed to `generate_epochs`
+
+    Returns
+    -------
+    channels : list of str
+        data stream column names
+
+    """
+    import pyarrow as pa
+
+    chunks, channels = generate_epochs(n_epochs, n_samples, n_channels, **kwargs)
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pa.ipc.new_file(str(epochs_f), table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return channels
@@ -1,4 +1,4 @@
-"""FIR filter wrappers and utility functions. 
+"""FIR filter wrappers and utility functions.
 
 All filter functions require explicit parameters except
 ``check_filter_params()`` and ``show_filter()`` which will,
@@ -6,29 +6,56 @@ respectively, return and display suggested defaults for ``window``,
 ``width_hz`` (transition band) and ``ripple_db`` if these are not
 specified.
 
+matplotlib is imported by the plotting functions when they are
+called, not with the module, so headless compute doesn't load it.
+
 """
 
+import functools
+import hashlib
+import os
 import warnings
+from collections import namedtuple
+from pathlib import Path
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 
-from scipy import signal, fftpack
+from scipy import ndimage, signal, fftpack
 
 import logging as LOGGER
 from scipy.signal import kaiserord, firwin, freqz, lfilter
 
+try:
+    from spudtr import _spudtr as _kernels  # optional compiled kernels
+except ImportError:
+    from spudtr import _kernels
+
 
 FTYPES = ["lowpass", "highpass", "bandpass", "bandstop"]
 WINDOWS = ["kaiser", "hamming", "hann", "blackman"]
+ENGINES = ["auto", "direct", "fft", "overlap-add"]
+
+DESIGN_CACHE_SIZE = 256  # in-memory filter designs
+MULTIRATE_MIN_FACTOR = 4  # smallest decimation worth resampling for
+FFT_BATCH_BYTES = 2**25  # padded time series per fft convolution batch
+_DESIGN_CACHE = {"dir": os.environ.get("SPUDTR_DESIGN_CACHE_DIR", None), "disk_hits": 0}
 
 
 # ------------------------------------------------------------
 # "private"-ish functions
 
 
-def _trans_bwidth_ripple(ftype=None, cutoff_hz=None, sfreq=None, window=None):
+def _copy_on_write():
+    """True if pandas copy-on-write is on, it always is in pandas >= 3"""
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    try:
+        return pd.options.mode.copy_on_write is True
+    except (AttributeError, KeyError):  # pandas < 2 has no such option
+        return False
+
 
+def _trans_bwidth_ripple(ftype=None, cutoff_hz=None, sfreq=None, window=None):
     """
     Calculate reasonable default transition width and ripple dB
 
@@ -74,7 +101,6 @@ def _trans_bwidth_ripple(ftype=None, cutoff_hz=None, sfreq=None, window=None):
 
 
 def _suggest_epoch_length(sfreq=None, width_hz=None, ripple_db=None):
-
     """
     Parameters
     ----------
@@ -120,8 +146,7 @@ def _suggest_epoch_length(sfreq=None, width_hz=None, ripple_db=None):
 
 
 def _mfreqz(b=None, a=1, cutoff_hz=None, sfreq=None, width_hz=None):
-
-    """ Plot the frequency and phase response of a digital filter.
+    """Plot the frequency and phase response of a digital filter.
 
     Parameters
     ----------
@@ -144,6 +169,8 @@ def _mfreqz(b=None, a=1, cutoff_hz=None, sfreq=None, width_hz=None):
     for kwarg in [b, cutoff_hz, sfreq, width_hz, a]:
         assert kwarg is not None
 
+    import matplotlib.pyplot as plt
+
     w, h = signal.freqz(b, a)
     h_dB = 20 * np.log10(abs(h))
 
@@ -189,8 +216,7 @@ def _mfreqz(b=None, a=1, cutoff_hz=None, sfreq=None, width_hz=None):
 
 
 def _impz(b=None, a=1):
-
-    """ Plot step and impulse response.
+    """Plot step and impulse response.
 
     Parameters
     ----------
@@ -204,6 +230,8 @@ def _impz(b=None, a=1):
     fig : `~.figure.Figure`
     """
 
+    import matplotlib.pyplot as plt
+
     for kwarg in [b, a]:
         assert kwarg is not None
 
@@ -234,6 +262,165 @@ def _design_firwin_filter(
 ):
     """calculate odd length, symmetric, linear phase FIR filter coefficients
 
+    Designs are memoized, the coefficients for the same parameters are
+    returned from an in-memory LRU cache, and optionally an on-disk
+    store, see :func:`set_design_cache_dir`. The returned array is
+    shared and read-only.
+
+    Parameters
+    ----------
+
+    ftype : string
+        filter type, one of 'lowpass' , 'highpass', 'bandpass', 'bandstop'
+
+    cutoff_hz : float or 1D array_like
+        cutoff frequency in Hz, e.g., 5.0, 30.0 for lowpass or
+        highpass. 1D array_like, e.g. [10.0, 30.0] for bandpass or
+        bandstop
+
+    sfreq : float
+        sampling frequency, e.g., 250.0, 500.0
+
+    width_hz : float
+        transition band width start to stop in Hz
+
+    ripple_db : float
+        attenuation in the stop band, in dB, e.g., 24.0, 60.0
+
+
+    Returns
+    -------
+    taps : np.array
+        coefficients of FIR filter.
+
+    """
+
+    for kwarg in [ftype, cutoff_hz, sfreq, width_hz, ripple_db, window]:
+        assert kwarg is not None
+
+    try:
+        key = _design_key(ftype, cutoff_hz, sfreq, width_hz, ripple_db, window)
+    except (AttributeError, TypeError, ValueError):
+        # not a valid design, let the parameter checks say why
+        return _firwin_taps(ftype, cutoff_hz, sfreq, width_hz, ripple_db, window)
+
+    return _cached_firwin_taps(key)
+
+
+def _design_key(ftype, cutoff_hz, sfreq, width_hz, ripple_db, window):
+    """normalized, hashable filter parameters
+
+    ftype and window are lowercased, the designs don't depend on case.
+    """
+    if np.ndim(cutoff_hz) == 0:
+        cutoff_hz = float(cutoff_hz)
+    else:
+        cutoff_hz = tuple(float(hz) for hz in cutoff_hz)
+    return (
+        ftype.lower(),
+        cutoff_hz,
+        float(sfreq),
+        float(width_hz),
+        float(ripple_db),
+        window.lower(),
+    )
+
+
+def _key_firwin_taps(key):
+    """design or load the read-only filter coefficients for a design key"""
+
+    ftype, cutoff_hz, sfreq, width_hz, ripple_db, window = key
+    if isinstance(cutoff_hz, tuple):
+        cutoff_hz = list(cutoff_hz)
+
+    taps = None
+    taps_f = None
+    if _DESIGN_CACHE["dir"] is not None:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        taps_f = Path(_DESIGN_CACHE["dir"]) / f"firwin_{digest}.npy"
+        try:
+            if taps_f.exists():
+                taps = np.load(taps_f)
+                _DESIGN_CACHE["disk_hits"] += 1
+        except (OSError, ValueError):
+            taps = None  # unreadable, redesign and overwrite
+
+    if taps is None:
+        taps = _firwin_taps(ftype, cutoff_hz, sfreq, width_hz, ripple_db, window)
+        if taps_f is not None:
+            # write then rename so concurrent readers never see part of a
+            # file, the store is best-effort, the design is good regardless
+            tmp_f = taps_f.with_name(f"{taps_f.stem}.{os.getpid()}.tmp.npy")
+            try:
+                taps_f.parent.mkdir(parents=True, exist_ok=True)
+                np.save(tmp_f, taps)
+                os.replace(tmp_f, taps_f)
+            except OSError as err:
+                warnings.warn(f"filter design not stored in {taps_f.parent}: {err}")
+                try:
+                    tmp_f.unlink()
+                except OSError:
+                    pass
+
+    taps.setflags(write=False)
+    return taps
+
+
+_cached_firwin_taps = functools.lru_cache(maxsize=DESIGN_CACHE_SIZE)(_key_firwin_taps)
+
+DesignCacheInfo = namedtuple(
+    "DesignCacheInfo", ["hits", "misses", "disk_hits", "maxsize", "currsize", "dir"]
+)
+
+
+def design_cache_info():
+    """FIR filter design cache statistics
+
+    Returns
+    -------
+    DesignCacheInfo
+        named tuple with the in-memory `hits`, `misses`, `maxsize` and
+        `currsize`, the number of misses loaded from the on-disk store,
+        `disk_hits`, and the store directory, `dir`, or None
+    """
+    info = _cached_firwin_taps.cache_info()
+    return DesignCacheInfo(
+        info.hits,
+        info.misses,
+        _DESIGN_CACHE["disk_hits"],
+        info.maxsize,
+        info.currsize,
+        _DESIGN_CACHE["dir"],
+    )
+
+
+def clear_design_cache():
+    """empty the in-memory FIR filter design cache and reset the statistics"""
+    _cached_firwin_taps.cache_clear()
+    _DESIGN_CACHE["disk_hits"] = 0
+
+
+def set_design_cache_dir(cache_dir=None):
+    """store FIR filter designs on disk for reuse across processes
+
+    The default is the ``SPUDTR_DESIGN_CACHE_DIR`` environment variable
+    if it is set, otherwise designs are only cached in memory.
+
+    Parameters
+    ----------
+    cache_dir : str or Path or None
+        directory for the design files, created if need be. None
+        turns the on-disk store off. Designs that can't be stored or
+        loaded are kept in memory only, with a warning.
+    """
+    _DESIGN_CACHE["dir"] = cache_dir
+
+
+def _firwin_taps(
+    ftype=None, cutoff_hz=None, sfreq=None, width_hz=None, ripple_db=None, window=None
+):
+    """calculate odd length, symmetric, linear phase FIR filter coefficients, uncached
+
     FIRLS at https://scipy-cookbook.readthedocs.io/items/FIRFilter.html
 
     Parameters
@@ -292,28 +479,44 @@ def _design_firwin_filter(
     if ftype.lower() == "lowpass":
         if window.lower() == "kaiser":
             taps = firwin(
-                N, cutoff_hz, window=("kaiser", beta), pass_zero="lowpass", fs=sfreq,
+                N,
+                cutoff_hz,
+                window=("kaiser", beta),
+                pass_zero="lowpass",
+                fs=sfreq,
             )
         else:
             taps = firwin(N, cutoff_hz, window=window, pass_zero="lowpass", fs=sfreq)
     elif ftype.lower() == "highpass":
         if window.lower() == "kaiser":
             taps = firwin(
-                N, cutoff_hz, window=("kaiser", beta), pass_zero="highpass", fs=sfreq,
+                N,
+                cutoff_hz,
+                window=("kaiser", beta),
+                pass_zero="highpass",
+                fs=sfreq,
             )
         else:
             taps = firwin(N, cutoff_hz, window=window, pass_zero="highpass", fs=sfreq)
     elif ftype.lower() == "bandpass":
         if window.lower() == "kaiser":
             taps = firwin(
-                N, cutoff_hz, window=("kaiser", beta), pass_zero="bandpass", fs=sfreq,
+                N,
+                cutoff_hz,
+                window=("kaiser", beta),
+                pass_zero="bandpass",
+                fs=sfreq,
             )
         else:
             taps = firwin(N, cutoff_hz, window=window, pass_zero="bandpass", fs=sfreq)
     elif ftype.lower() == "bandstop":
         if window.lower() == "kaiser":
             taps = firwin(
-                N, cutoff_hz, window=("kaiser", beta), pass_zero="bandstop", fs=sfreq,
+                N,
+                cutoff_hz,
+                window=("kaiser", beta),
+                pass_zero="bandstop",
+                fs=sfreq,
             )
         else:
             taps = firwin(N, cutoff_hz, window=window, pass_zero="bandstop", fs=sfreq)
@@ -341,7 +544,7 @@ def _sins_test_data(
     Returns
     -------
     t,x : float
-        time and values of a noisy signal  
+        time and values of a noisy signal
 
     Examples
     --------
@@ -360,22 +563,54 @@ def _sins_test_data(
         x += amplitude_list[i] * np.sin(2 * np.pi * freq_list[i] * t)
 
     if show_plot:
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots(figsize=(18, 4))
         ax.plot(t, x)
 
     return t, x
 
 
-def _apply_firwin_filter_data(data, taps):
+def _choose_engine(n_samples, n_taps):
+    """pick the cheapest convolution engine for the filter and data length
+
+    Direct convolution costs O(n_samples * n_taps) and wins for short
+    filters. FFT convolution costs O(n log n) in the padded length
+    regardless of filter length. Overlap-add FFT convolution in blocks
+    a few times the filter length wins when the data are orders of
+    magnitude longer than the filter. The crossovers are from
+    benchmarks/bench_filters.py.
+    """
+    if n_taps <= 64:
+        return "direct"
+    if n_samples >= 1000 * n_taps:
+        return "overlap-add"
+    return "fft"
+
+
+def _is_symmetric(taps):
+    """odd length linear phase FIR taps"""
+    return len(taps) % 2 == 1 and np.array_equal(taps, taps[::-1])
+
+
+def _apply_firwin_filter_data(data, taps, axis=0, engine="auto"):
     """apply and phase compensate the FIRLS filtering to each column
 
     Parameters
     ----------
     data : array
+        1-D time series or N-D array of time series along `axis`
 
     taps : ndarray
         Coefficients of FIR filter.
 
+    axis : int, optional
+        the time axis, all the time series are filtered in one pass,
+        each with its own mirror padded edges
+
+    engine : str {'auto', 'direct', 'fft', 'overlap-add'}, optional
+        convolution algorithm, 'auto' picks by filter and data length
+
     Returns
     -------
     filtered_data : filtered data (same size as data)
@@ -393,29 +628,163 @@ def _apply_firwin_filter_data(data, taps):
     taps:
     {taps}
     """
-    data = np.asanyarray(data).astype("float64")
+    data = np.asanyarray(data, dtype="float64")
 
-    # add pads
-    yy = []
-    b = data[0:delay][::-1]
-    e = data[-delay:][::-1]
-    yy = np.append(b, data)
-    yy = np.append(yy, e)
+    if data.shape[axis] < delay:
+        raise ValueError(
+            f"filter I/O length mismatch: input={data.shape[axis]} "
+            f"is shorter than the filter delay={delay}"
+        )
 
-    # forward pass
-    filtered_data = lfilter(taps, a, yy)
+    if engine not in ENGINES:
+        raise ValueError(f"engine={engine}, must be one of " + " ".join(ENGINES))
+
+    if engine == "auto":
+        engine = _choose_engine(data.shape[axis], N)
+
+    # The mirror image pads are [d c b a | a b c d | d c b a] and the
+    # forward pass output is rolled back by delay to compensate the
+    # phase shift, i.e., the centered convolution. All the time series
+    # along axis are filtered in one call.
+    if engine == "direct" and _kernels.COMPILED and _is_symmetric(taps):
+        # the compiled kernel halves the multiplies, time on the last axis
+        series = np.ascontiguousarray(np.moveaxis(data, axis, -1))
+        filtered_data = _kernels.fir_symmetric(
+            series.reshape(-1, series.shape[-1]), np.asarray(taps, dtype="float64")
+        )
+        filtered_data = np.moveaxis(filtered_data.reshape(series.shape), -1, axis)
+    elif engine == "direct":
+        # the pads are ndimage "reflect" mode
+        filtered_data = ndimage.convolve1d(data, taps, axis=axis, mode="reflect")
+    else:
+        pads = [(0, 0)] * data.ndim
+        pads[axis] = (delay, delay)
+        taps_shape = [1] * data.ndim
+        taps_shape[axis] = N
+        convolve = signal.fftconvolve if engine == "fft" else signal.oaconvolve
+
+        # filter batches of the time series along another axis, the
+        # padded copy and transforms are several times their size
+        batch_axis = 1 if axis % data.ndim == 0 else 0
+        n_series = data.shape[batch_axis] if data.ndim > 1 else 1
+        batch_size = max(1, FFT_BATCH_BYTES * n_series // max(data.nbytes, 1))
+
+        filtered_data = np.empty(data.shape)
+        for start in range(0, n_series, batch_size):
+            batch = [slice(None)] * data.ndim
+            if data.ndim > 1:
+                batch[batch_axis] = slice(start, start + batch_size)
+            batch = tuple(batch)
+            filtered_data[batch] = convolve(
+                np.pad(data[batch], pads, mode="symmetric"),
+                np.reshape(taps, taps_shape),
+                mode="valid",
+                axes=axis,
+            )
 
-    # roll the phase shift by delay back to 0
-    filtered_data = np.roll(filtered_data, -delay)[delay:-delay]
+    return filtered_data
+
+
+def _multirate_factor(ftype, cutoff_hz, width_hz, sfreq, **_fp):
+    """decimation factor that puts the new Nyquist 2x above the stop edge
+
+    Only lowpass and highpass are multirate filtered. A bandpass or
+    bandstop needs a full rate filter as long as the single rate one
+    for its upper edge anyway, so it gains nothing, factor 1.
+    """
+    if ftype not in ["lowpass", "highpass"]:
+        return 1
+    f_stop = cutoff_hz + width_hz / 2.0
+    return max(1, int(sfreq // (4.0 * f_stop)))
+
+
+def _multirate_lowpass(data, q, axis=0, engine="auto", **_fp):
+    """decimate by q, lowpass filter at the low rate, interpolate back
+
+    The one anti-aliasing filter is used for the polyphase decimation
+    and interpolation. Its passband runs to the lowpass stop edge and
+    its stopband starts where the images and aliases would land on it,
+    i.e., the new sampling rate less the stop edge. It is designed with
+    10 dB more ripple attenuation than requested so the passband errors
+    of the three filters in cascade stay within `ripple_db`.
+    """
+    sfreq, width_hz = _fp["sfreq"], _fp["width_hz"]
+    f_stop = _fp["cutoff_hz"] + width_hz / 2.0
+    aa_taps = _design_firwin_filter(
+        ftype="lowpass",
+        cutoff_hz=sfreq / (2.0 * q),
+        sfreq=sfreq,
+        width_hz=sfreq / q - 2.0 * f_stop,
+        ripple_db=_fp["ripple_db"] + 10.0,
+        window="kaiser",
+    )
+    taps = _design_firwin_filter(**dict(_fp, ftype="lowpass", sfreq=sfreq / q))
+
+    # upfirdn is several times faster along contiguous rows
+    n_samples = data.shape[axis]
+    data = np.ascontiguousarray(np.moveaxis(data, axis, -1))
+    low = signal.resample_poly(data, 1, q, axis=-1, window=aa_taps, padtype="symmetric")
+    low = _apply_firwin_filter_data(low, taps, axis=-1, engine=engine)
+    filtered_data = signal.resample_poly(
+        low, q, 1, axis=-1, window=aa_taps, padtype="symmetric"
+    )
+    return np.moveaxis(filtered_data[..., :n_samples], -1, axis)
 
-    if not len(data) == len(filtered_data):
-        raise ValueError(
-            f"filter I/O length mismatch: input={len(data)} output={len(filtered_data)}"
-        )
+
+def _apply_multirate_filter(data, axis=0, engine="auto", **_fp):
+    """filter the narrow low frequency band at a decimated sampling rate
+
+    The taps for a narrow transition band grow as sfreq / width_hz,
+    for the low frequency part of the filter they needn't. A lowpass
+    is filtered at the decimated rate and a highpass is the input less
+    the multirate lowpass.
+
+    Parameters
+    ----------
+    data : array
+        1-D time series or N-D array of time series along `axis`
+
+    axis : int, optional
+        the time axis
+
+    engine : str {'auto', 'direct', 'fft', 'overlap-add'}, optional
+        convolution algorithm for the filters at the decimated rate
+
+    **_fp : dict
+        filter parameters from :py:func:`check_filter_params`
+
+
+    Returns
+    -------
+    filtered_data : np.ndarray or None
+        filtered array the same size as data, None if the filter isn't
+        a lowpass or highpass or the cutoff is too high for decimation
+        by at least MULTIRATE_MIN_FACTOR to pay.
+
+    """
+
+    q = _multirate_factor(**_fp)
+    if q < MULTIRATE_MIN_FACTOR:
+        return None
+
+    data = np.asanyarray(data, dtype="float64")
+    filtered_data = _multirate_lowpass(data, q, axis=axis, engine=engine, **_fp)
+    if _fp["ftype"] == "highpass":
+        filtered_data = data - filtered_data
 
     return filtered_data
 
 
+def _filter_data(data, engine="auto", multirate=False, **_fp):
+    """multirate filter if asked and it pays, else the full rate filter"""
+    if multirate:
+        filtered_data = _apply_multirate_filter(data, engine=engine, **_fp)
+        if filtered_data is not None:
+            return filtered_data
+    taps = _design_firwin_filter(**_fp)
+    return _apply_firwin_filter_data(data, taps, engine=engine)
+
+
 # ------------------------------------------------------------
 # public functions
 
@@ -533,7 +902,6 @@ def show_filter(
     window=None,
     show_output=True,
 ):
-
     """Text summary and graphic display of filter attributes for the specified parameters.
 
     Figures are plotted for the transfer function, coefficients, and
@@ -555,7 +923,7 @@ def show_filter(
        band ripple (dB)
     window : {'kaiser','hamming','hann','blackman'}, optional
         window type for firwin
-    show_output : bool 
+    show_output : bool
         plot example filter input-output, default=True
 
 
@@ -668,13 +1036,15 @@ def fir_filter_dt(
     width_hz=None,
     ripple_db=None,
     window=None,
+    engine="auto",
+    multirate=False,
+    inplace=False,
 ):
-
     """apply FIRLS filtering to columns of dataframe-like synchronized discrete time series
 
     Parameters
     ----------
-    dt : pd.DataFrame or structured numpy nd.array with named data types 
+    dt : pd.DataFrame or structured numpy nd.array with named data types
         regularly sampled time-series data table: time (row) x data (columns)
 
     col_names: list of str
@@ -683,11 +1053,28 @@ def fir_filter_dt(
     key=val
         see :ref:`check_filter params() Parameters <filter_parameters_label>`
 
+    engine : str {'auto', 'direct', 'fft', 'overlap-add'}, optional
+        convolution algorithm, the default 'auto' picks the cheapest
+        for the filter length and data length
+
+    multirate : bool, optional
+        if True, lowpass and highpass filter the low frequency band at
+        a decimated sampling rate and interpolate back, much faster for
+        very low cutoffs, e.g., 0.1 Hz highpass. Bandpass and bandstop,
+        which gain nothing, and cutoffs too high to decimate by at least
+        4 fall back to the full rate filter. The response stays within
+        ripple_db but is not identical to the full rate filter.
+
+    inplace : bool, optional
+        if True, filter the columns in dt itself and return None
+
 
     Returns
     -------
-    pd.DataFrame or np.ndarray
-        table-like copy with filtered data columns, the same size and object type as dt
+    pd.DataFrame or np.ndarray or None
+        table-like copy with filtered data columns, the same size and
+        object type as dt. A DataFrame copy shares the other columns
+        with dt only when pandas copy-on-write is on.
 
 
     Notes
@@ -730,8 +1117,6 @@ def fir_filter_dt(
         window=window,
     )
 
-    taps = _design_firwin_filter(**_fp)
-
     # modicum of guarding
     if isinstance(dt, pd.DataFrame) or (
         isinstance(dt, np.ndarray) and dt.dtype.names is not None
@@ -740,12 +1125,18 @@ def fir_filter_dt(
     else:
         raise TypeError("dt must be pandas.DataFrame or structured numpy.ndarray")
 
-    filt_dt = dt.copy()
+    if inplace:
+        filt_dt = dt
+    elif isinstance(dt, pd.DataFrame):
+        # unfiltered columns are shared only if edits can't leak back to dt
+        filt_dt = dt.copy(deep=not _copy_on_write())
+    else:
+        filt_dt = dt.copy()
     for column in col_names:
 
-        filt_dt[column] = _apply_firwin_filter_data(dt[column], taps)
+        filt_dt[column] = _filter_data(dt[column], engine, multirate, **_fp)
 
-    return filt_dt
+    return None if inplace else filt_dt
 
 
 def fir_filter_data(
@@ -756,8 +1147,9 @@ def fir_filter_data(
     width_hz=None,
     ripple_db=None,
     window=None,
+    engine="auto",
+    multirate=False,
 ):
-
     """
     Finite Impulse Response filter
 
@@ -768,6 +1160,18 @@ def fir_filter_data(
     key=val
         see :ref:`check_filter params() Parameters <filter_parameters_label>`
 
+    engine : str {'auto', 'direct', 'fft', 'overlap-add'}, optional
+        convolution algorithm, the default 'auto' picks the cheapest
+        for the filter length and data length
+
+    multirate : bool, optional
+        if True, lowpass and highpass filter the low frequency band at
+        a decimated sampling rate and interpolate back, much faster for
+        very low cutoffs, e.g., 0.1 Hz highpass. Bandpass and bandstop,
+        which gain nothing, and cutoffs too high to decimate by at least
+        4 fall back to the full rate filter. The response stays within
+        ripple_db but is not identical to the full rate filter.
+
     Returns
     -------
     1D array
@@ -789,15 +1193,146 @@ def fir_filter_data(
         window=window,
     )
 
-    taps = _design_firwin_filter(**_fp)
-    filt_data = _apply_firwin_filter_data(data, taps)
+    filt_data = _filter_data(data, engine, multirate, **_fp)
     return filt_data
 
 
+class StreamingFIRFilter:
+    """FIR filter for continuous data arriving in successive chunks
+
+    The filter state carries over from one chunk to the next so memory
+    use is constant however long the recording. The linear phase
+    delay is compensated by emitting output `delay` samples late and
+    the edges are mirror padded like :func:`fir_filter_data`, so the
+    concatenated output of all the chunks and the final ``flush()`` is
+    the one-shot ``fir_filter_data()`` output for the concatenated
+    input.
+
+
+    Parameters
+    ----------
+    key=val
+        see :ref:`check_filter params() Parameters <filter_parameters_label>`
+
+
+    Attributes
+    ----------
+    taps : np.ndarray
+        FIR filter coefficients
+    delay : int
+        filter delay in samples, 1/2 the filter length
+
+
+    Examples
+    --------
+    >>> params = dict(ftype="lowpass", cutoff_hz=10, width_hz=5, ripple_db=60, sfreq=250, window="hamming")
+    >>> stream_filter = StreamingFIRFilter(**params)
+    >>> filtered = [stream_filter.filter(chunk) for chunk in chunks]
+    >>> filtered.append(stream_filter.flush())
+    >>> filtered = np.concatenate(filtered)
+
+    """
+
+    def __init__(
+        self,
+        ftype=None,
+        cutoff_hz=None,
+        sfreq=None,
+        width_hz=None,
+        ripple_db=None,
+        window=None,
+    ):
+        _fp = check_filter_params(
+            ftype=ftype,
+            cutoff_hz=cutoff_hz,
+            sfreq=sfreq,
+            width_hz=width_hz,
+            ripple_db=ripple_db,
+            window=window,
+        )
+        self.taps = _design_firwin_filter(**_fp)
+        self.delay = int((len(self.taps) - 1) / 2)
+        self.reset()
+
+    def reset(self):
+        """clear the filter state to start a new recording"""
+        self._zi = None  # lfilter state
+        self._head = None  # first samples, until there are enough to mirror pad
+        self._tail = None  # last delay samples, to mirror pad at the end
+        self._n_discard = 2 * self.delay  # outputs from the pad at the start
+
+    def _push(self, samples):
+        # run samples through the filter and drop the start-up outputs
+        if self._zi is None:
+            self._zi = np.zeros((len(self.taps) - 1,) + samples.shape[1:])
+        filtered, self._zi = lfilter(self.taps, 1.0, samples, axis=0, zi=self._zi)
+        n_drop = min(self._n_discard, len(filtered))
+        self._n_discard -= n_drop
+        return filtered[n_drop:]
+
+    def _keep_tail(self, samples):
+        if self._tail is not None:
+            samples = np.concatenate([self._tail, samples])
+        self._tail = samples[len(samples) - self.delay :].copy()
+
+    def filter(self, chunk):
+        """filter the next chunk of samples
+
+        Parameters
+        ----------
+        chunk : array-like, shape=(n_samples,) or (n_samples, n_channels)
+            next samples, time on the first axis
+
+        Returns
+        -------
+        np.ndarray
+            filtered output, time on the first axis. The output lags
+            the input by `delay` samples
+        """
+        chunk = np.asanyarray(chunk).astype("float64")
+
+        if self._zi is None:
+            # not started, need delay samples for the mirror image pad
+            if self._head is not None:
+                chunk = np.concatenate([self._head, chunk])
+            if len(chunk) < self.delay:
+                self._head = chunk
+                return np.empty((0,) + chunk.shape[1:])
+            self._head = None
+            self._keep_tail(chunk)
+            return self._push(np.concatenate([chunk[: self.delay][::-1], chunk]))
+
+        self._keep_tail(chunk)
+        return self._push(chunk)
+
+    def flush(self):
+        """filter the mirror image pad at the end and reset for a new recording
+
+        Returns
+        -------
+        np.ndarray
+            the last `delay` samples of filtered output
+        """
+        if self._head is not None or self._tail is None:
+            n_samples = 0 if self._head is None else len(self._head)
+            self.reset()
+            raise ValueError(
+                f"filter I/O length mismatch: input={n_samples} "
+                f"is shorter than the filter delay={self.delay}"
+            )
+        filtered = self._push(self._tail[::-1])
+        self.reset()
+        return filtered
+
+
 def filters_effect(
-    ftype=None, cutoff_hz=None, sfreq=None, width_hz=None, ripple_db=None, window=None,
+    ftype=None,
+    cutoff_hz=None,
+    sfreq=None,
+    width_hz=None,
+    ripple_db=None,
+    window=None,
 ):
-
     """
     Generate example filter input-output plots for pure sinewave data.
 
@@ -881,11 +1416,18 @@ def filters_effect(
     t1, y1 = _sins_test_data(y1_freqs, y1_amplitude_list, sfreq, duration)
     y_filt = fir_filter_data(y, **_fparams)  # apply the filter
 
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(figsize=(16, 4))
     ax.plot(t, y, ".-", color="c", linestyle="-", label="input")
     ax.plot(t, y1, ".-", color="b", linestyle="-", label="ideal output")
     ax.plot(
-        t, y_filt, ".-", color="r", linestyle="-", label="%s filter output" % ftype,
+        t,
+        y_filt,
+        ".-",
+        color="r",
+        linestyle="-",
+        label="%s filter output" % ftype,
     )
 
     # format for the title
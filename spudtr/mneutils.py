@@ -1,11 +1,12 @@
+import functools
+from pathlib import Path
 import numpy as np
 import pandas as pd
-import patsy
-import mne
-from mne.epochs import EpochsArray
+import pyarrow as pa
+from pyarrow import feather
 from collections import OrderedDict
 
-from spudtr.epf import _epochs_QC
+from spudtr.epf import EPOCH_ID, TIME, _epochs_data, _epochs_QC_layout
 from spudtr import RESOURCES_DIR
 import yaml
 
@@ -14,14 +15,81 @@ import yaml
 # default
 EEG_LOCATIONS_F = RESOURCES_DIR / "mne_32chan_xyz_spherical.yml"
 
+MONTAGE_CACHE_SIZE = 64  # parsed location files and channel subset montages
 
-def _streams2mne_digmont(eeg_streams, eeg_locations_f):
 
+def _locations_key(eeg_locations_f):
+    """cache key for a locations file, changes when the file does"""
+    eeg_locations_f = Path(eeg_locations_f).resolve()
+    return str(eeg_locations_f), eeg_locations_f.stat().st_mtime_ns
+
+
+@functools.lru_cache(maxsize=MONTAGE_CACHE_SIZE)
+def _read_eeg_locations(eeg_locations_f, mtime_ns):
+    """parse a sensor locations .yml or load the precompiled .npz
+
+    Returns
+    -------
+    ch_pos : dict
+        sensor name: np.ndarray x, y, z in file order
+    fiducials : dict
+        ``lpa``, ``rpa``, ``nasion``: np.ndarray x, y, z
+    """
+
+    if Path(eeg_locations_f).suffix == ".npz":
+        with np.load(eeg_locations_f) as locs:
+            ch_pos = OrderedDict(zip(locs["ch_names"].tolist(), locs["ch_pos"]))
+            fiducials = {key: locs[key] for key in ["lpa", "rpa", "nasion"]}
+    else:
+        with open(eeg_locations_f, "r") as stream:
+            mne_32chan = yaml.safe_load(stream)
+        ch_pos = OrderedDict(
+            (key, np.array(list(val.values())))
+            for key, val in mne_32chan["sensors"].items()
+        )
+        fiducials = {
+            key: np.array(list(mne_32chan["fiducials"][key].values()))
+            for key in ["lpa", "rpa", "nasion"]
+        }
+
+    for pos in list(ch_pos.values()) + list(fiducials.values()):
+        pos.setflags(write=False)  # shared by the cached montages
+    return ch_pos, fiducials
+
+
+@functools.lru_cache(maxsize=MONTAGE_CACHE_SIZE)
+def _cached_digmont(eeg_streams, eeg_locations_f, mtime_ns):
+    """memoized montage for the channel subset, don't modify, copy"""
+    import mne
+
+    ch_pos, fiducials = _read_eeg_locations(eeg_locations_f, mtime_ns)
+    missing_streams = set(eeg_streams) - set(ch_pos)
+    if missing_streams:
+        raise ValueError(f"eeg_streams not found in cap: {missing_streams}")
+
+    dig_ch_pos = OrderedDict((key, ch_pos[key]) for key in eeg_streams)
+    return mne.channels.make_dig_montage(
+        nasion=fiducials["nasion"],
+        lpa=fiducials["lpa"],
+        rpa=fiducials["rpa"],
+        ch_pos=dig_ch_pos,
+        coord_frame="head",
+    )
+
+
+def _streams2mne_digmont(eeg_streams, eeg_locations_f):
     """Parameters
     ------------
     eeg_streams : list of str
         column names of the data streams
     eeg_locations_f : path and file of mne_32chan_xyz_spherical.yml
+        or the .npz from :py:func:`compile_eeg_locations`
+
+    Returns
+    -------
+    mne.channels.DigMontage
+        a new copy, the parsed locations and montages for each channel
+        subset are cached by file path and modification time
 
     Examples
     --------
@@ -30,48 +98,63 @@ def _streams2mne_digmont(eeg_streams, eeg_locations_f):
     montage.plot(kind='topomap', show_names=True);
     """
 
-    with open(eeg_locations_f, "r") as stream:
-        mne_32chan = yaml.safe_load(stream)
-    mne_streams = mne_32chan["sensors"]
-    eeg_locs = list(mne_streams.keys())
-    missing_streams = set(eeg_streams) - set(eeg_locs)
-    if missing_streams:
-        raise ValueError(f"eeg_streams not found in cap: {missing_streams}")
+    montage = _cached_digmont(tuple(eeg_streams), *_locations_key(eeg_locations_f))
+    return montage.copy()
+
+
+def compile_eeg_locations(eeg_locations_f, npz_f=None):
+    """save the sensor and fiducial locations from a .yml file in binary .npz
 
-    ch_names = []
-    pos = []
-    for key in eeg_streams:
-        if key in mne_streams:
-            ch_names.append(key)
-            val = mne_streams[key]
-            pos.append(list(val.values()))
-    dig_ch_pos = OrderedDict(zip(ch_names, np.array(pos)))
-
-    fiducials = mne_32chan["fiducials"]
-    lpa = np.array(list(fiducials["lpa"].values()))
-    rpa = np.array(list(fiducials["rpa"].values()))
-    nasion = np.array(list(fiducials["nasion"].values()))
-
-    montage = mne.channels.make_dig_montage(
-        nasion=nasion, lpa=lpa, rpa=rpa, ch_pos=dig_ch_pos, coord_frame="head"
+    Workers that load the .npz skip the YAML parsing, pass it as the
+    ``eeg_locations_f`` for :py:func:`read_spudtr_epochs`.
+
+    Parameters
+    ----------
+    eeg_locations_f : str or Path
+        sensor locations .yml, e.g., ``mne_32chan_xyz_spherical.yml``
+    npz_f : str or Path, optional
+        output file, default is `eeg_locations_f` with suffix .npz
+
+    Returns
+    -------
+    Path
+        the .npz file
+    """
+
+    ch_pos, fiducials = _read_eeg_locations(*_locations_key(eeg_locations_f))
+    if npz_f is None:
+        npz_f = Path(eeg_locations_f).with_suffix(".npz")
+    np.savez(
+        npz_f,
+        ch_names=np.array(list(ch_pos)),
+        ch_pos=np.array(list(ch_pos.values())),
+        **fiducials,
     )
-    return montage
+    return Path(npz_f)
+
+
+def clear_montage_cache():
+    """empty the parsed sensor locations and montage caches"""
+    _read_eeg_locations.cache_clear()
+    _cached_digmont.cache_clear()
 
 
 def categories2eventid(epochs_df, categories, epoch_id, time, time_stamp):
     """Build an MNE events array and event_id dict from one or more categorical variables.
 
-    This uses patsy formulas and dummy coded (full rank) design
-    matrixes to construct the MNE format event_id dictionary and
+    This constructs the MNE format event_id dictionary and
     corresponding events array (events x 3) for tagging and binning
     single-trial epochs for time-domain aggregation into
     ``mne.Evoked``, e.g., average event-related potentials (ERPs).
+    The labels and event codes are the columns of the patsy dummy
+    coded (full rank) design matrix, computed directly from the
+    category level codes without building the matrix.
 
     A single category is split into the category levels, a.k.a conditions, bins,
     like so: ``~ 0 + a``.
 
     Multiple categories fully crossed like so: ``~ 0 +  a:b`` and ``~ 0 + a:b:c``
-    
+
     Parameters
     ----------
     epochs_df : pandas.DataFrame
@@ -88,11 +171,17 @@ def categories2eventid(epochs_df, categories, epoch_id, time, time_stamp):
         The name of the column with the regular epoch time stamps, e.g., ``time``,
         ``time_ms``, ``time_s``.
 
-    time_stamp : int The time stamp in the epoch to look up the
-        categorical variable values, e.g., ``0``
+    time_stamp : int or list of int
+        The time stamp in the epoch to look up the categorical
+        variable values, e.g., ``0``. For a list, e.g., multiple event
+        anchors in each epoch, the events for all the time stamps are
+        looked up in one pass.
 
     Returns
     -------
+    For a list of time stamps, a list with one ``(mne_event_id,
+    mne_events)`` tuple per time stamp, otherwise
+
     mne_event_id : dict
 
        An MNE Python event_id dictionary where each item is ``label:
@@ -102,14 +191,14 @@ def categories2eventid(epochs_df, categories, epoch_id, time, time_stamp):
        in the design matrix.
 
     mne_events : np.array, shape=(number_of_epochs, 3) there is one
-       row for each epoch in ``epochs_df``. Each row is
+       row for each epoch in ``epochs_df``, in order of appearance. Each row is
 
-         ``[epoch_id, 0, mne_event_code]`` 
+         ``[epoch_id, 0, mne_event_code]``
 
        where ``mne_event_code`` is the newly
        constructed event code derived from the ``patsy`` design matrix
        column
-        
+
 
     Examples
     --------
@@ -151,98 +240,179 @@ def categories2eventid(epochs_df, categories, epoch_id, time, time_stamp):
         categories = [categories]
 
     # check spudtr epochs format
-    _ = _epochs_QC(epochs_df, categories, epoch_id=epoch_id, time=time)
+    layout = _epochs_QC_layout(epochs_df, categories, epoch_id=epoch_id, time=time)
+
+    time_stamps = np.atleast_1d(time_stamp)
+    time_idxs = pd.Index(layout.times).get_indexer(time_stamps)
+    for stamp, time_idx in zip(time_stamps, time_idxs):
+        if time_idx < 0:
+            raise ValueError(f"time_stamp {stamp} not found in epochs_df['{time}']")
+
+    # rows of every epoch at all the time stamps in one slice, epochs
+    # in layout order
+    n_epochs, n_times = layout.n_epochs, layout.n_times
+    grid_idxs = (np.arange(n_epochs)[:, np.newaxis] * n_times + time_idxs).T.ravel()
+    if not layout.is_sorted:
+        grid_idxs = layout.row_order[grid_idxs]
+    stamps_df = epochs_df[categories].iloc[grid_idxs]
+
+    eventids = []
+    for i in range(len(time_stamps)):
+        events_df = stamps_df.iloc[i * n_epochs : (i + 1) * n_epochs]
+        mne_event_id, event_codes = _crossed_event_codes(events_df, categories)
+
+        # mne array: n-events x 3
+        mne_events = np.stack(
+            [layout.epoch_ids, np.zeros(n_epochs), event_codes], axis=1
+        ).astype("int")
+        eventids.append((mne_event_id, mne_events))
+
+    if np.ndim(time_stamp) == 0:
+        return eventids[0]
+    return eventids
+
+
+def _crossed_event_codes(events_df, categories):
+    """patsy ``~ 0 + a:b:c`` column labels and 1-based column of each row
+
+    Same labels and column order as the full rank patsy design matrix,
+    the first category varies fastest, without building it. The code
+    for levels ia, ib, ic of categories a, b, c with na, nb levels is
+    1 + ia + na * ib + na * nb * ic.
 
-    if time_stamp not in epochs_df[time].unique():
-        raise ValueError(f"time_stamp {time_stamp} not found in epochs_df['{time}']")
-
-    # slice the epoch row at the specified time_stamp, e.g., time==0
-    # the category columns at this row are used to build the new
-    # event_id dictionary
-    events_df = epochs_df[epochs_df[time] == time_stamp].copy()
+    Returns
+    -------
+    mne_event_id : dict
+        label: event_code, for the event codes in `events_df`
+    event_codes : np.ndarray of int, shape=(len(events_df),)
+    """
+    event_codes = np.zeros(len(events_df), dtype=int)
+    labels = [""]
+    stride = 1
     for cat in categories:
-        events_df[cat] = pd.Categorical(events_df[cat])
-
-    # ensure dm is a full rank indicator matrix n columns = product of
-    # factor levels w/ exactly one 1 in each row
-    formula = "~ 0 + " + ":".join(categories)
-    dm = patsy.dmatrix(formula, events_df)
-    assert all(np.equal(1, [len(a) for a in map(lambda x: np.where(x == 1)[0], dm)]))
-    dm_cols = dm.design_info.column_names
-
-    # convert indidcator design  matrix to a 1-base vector that indexes
-    # which column of dm has the indicator 1 via binary summation
-    # e.g., dm = [[1, 0, 0], [0, 1, 0], [0, 0, 1]] -> [1, 2, 3]
-
-    dm_col_code = np.array(
-        [np.where(dm[i, :] == 1)[0] + 1 for i in range(len(dm))]
-    ).squeeze()
-    assert dm_col_code.min() == 1
-    assert dm_col_code.max() == dm.shape[1]
-
-    # 1-base mne event code dict with column labels from patsy
-    mne_event_id1 = dict([(dm_col, i + 1) for i, dm_col in enumerate(dm_cols)])
-
-    # mne array: n-events x 3
-    mne_events = np.stack(
-        [events_df["epoch_id"].to_numpy(), np.zeros(len(events_df)), dm_col_code],
-        axis=1,
-    ).astype("int")
-    # pdb.set_trace()
-    real_event_id = np.unique(mne_events[:, 2])
+        # levels like patsy, the sorted values or the pd.Categorical categories
+        values = pd.Categorical(events_df[cat])
+        if (values.codes < 0).any():
+            raise ValueError(f"category {cat} has missing values")
+        event_codes += stride * values.codes
+        stride *= len(values.categories)
+        labels = [
+            f"{label}:{cat}[{level}]" if label else f"{cat}[{level}]"
+            for level in values.categories
+            for label in labels
+        ]
+    event_codes += 1
+
+    present = np.zeros(len(labels) + 1, dtype=bool)
+    present[event_codes] = True
     mne_event_id = {
-        key: value for key, value in mne_event_id1.items() if value in real_event_id
+        label: code for code, label in enumerate(labels, 1) if present[code]
     }
-    return mne_event_id, mne_events
+    return mne_event_id, event_codes
+
+
+@functools.lru_cache(maxsize=None)
+def _epochs_spudtr_class():
+    """EpochsSpudtr is defined on first use so mne only loads when needed"""
+    import mne
+    from mne.epochs import EpochsArray
+
+    class EpochsSpudtr(EpochsArray):
+        def __init__(
+            self,
+            input_fname,
+            eeg_streams,
+            eeg_locations_f,
+            categories,
+            time_stamp,
+            epoch_id=None,
+            time=None,
+            time_unit=None,
+        ):
+
+            epochs_df = _read_epochs_input(
+                input_fname, _epochs_columns(eeg_streams, categories, epoch_id, time)
+            )
+            # check dataframe format
+            layout = _epochs_QC_layout(
+                epochs_df, eeg_streams, epoch_id=epoch_id, time=time
+            )
+
+            mne_event_ids, mne_events = categories2eventid(
+                epochs_df, categories, epoch_id, time, time_stamp
+            )
+
+            # no point to an event ids dict without the actual events
+            if mne_event_ids is not None and mne_events is None:
+                raise ValueError(
+                    "mne_events must also be specified to use mne_event_ids"
+                )
+
+            # compute sfreq samples / second from the time-stamps
+            if layout.sampling_interval is None:
+                raise ValueError(f"{time} time stamps must be regularly sampled")
+            sfreq = 1.0 / (layout.sampling_interval * time_unit)  # samples per second
+
+            montage = _streams2mne_digmont(eeg_streams, eeg_locations_f)
+            info = mne.create_info(montage.ch_names, sfreq=sfreq, ch_types="eeg")
+            info.set_montage(montage)  # for mne >0.19
+
+            tmin = layout.times[0] * time_unit
+
+            # (n_epochs, n_times, n_channels) in one reshape -> MNE
+            # (n_epochs, n_channels, n_times). The layout and the events
+            # both have the epochs in order of first appearance.
+            epochs_data = _epochs_data(epochs_df, montage.ch_names, layout)
+            epochs_data = epochs_data.transpose(0, 2, 1)
+            super().__init__(
+                epochs_data,
+                info=info,
+                tmin=tmin,
+                events=mne_events,
+                event_id=mne_event_ids,
+            )
+
+    EpochsSpudtr.__module__ = __name__
+    EpochsSpudtr.__qualname__ = "EpochsSpudtr"
+    return EpochsSpudtr
+
+
+def __getattr__(name):
+    # mneutils.EpochsSpudtr, mne is imported on first access
+    if name == "EpochsSpudtr":
+        return _epochs_spudtr_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _epochs_columns(eeg_streams, categories, epoch_id, time):
+    """the columns EpochsSpudtr uses, in order without duplicates"""
+    if isinstance(categories, str):
+        categories = [categories]
+    columns = [epoch_id, time, *categories, *eeg_streams]
+    return list(dict.fromkeys(col for col in columns if col is not None))
 
 
-class EpochsSpudtr(EpochsArray):
-    def __init__(
-        self,
-        input_fname,
-        eeg_streams,
-        eeg_locations_f,
-        categories,
-        time_stamp,
-        epoch_id=None,
-        time=None,
-        time_unit=None,
-    ):
+def _read_epochs_input(epochs_input, columns):
+    """spudtr epochs DataFrame from a DataFrame, Arrow table or feather file
 
-        epochs_df = pd.read_feather(input_fname)
-        # check dataframe format
-        _epochs_QC(epochs_df, eeg_streams, epoch_id=epoch_id, time=time)
+    A DataFrame is used as is, an Arrow table is narrowed to the
+    columns before converting, a feather file is memory mapped and
+    only the columns are read so wide metadata columns never load.
+    """
+    if isinstance(epochs_input, pd.DataFrame):
+        return epochs_input
 
-        mne_event_ids, mne_events = categories2eventid(
-            epochs_df, categories, epoch_id, time, time_stamp
-        )
+    if isinstance(epochs_input, pa.Table):
+        missing = [col for col in columns if col not in epochs_input.column_names]
+        if missing:
+            raise ValueError(f"columns not found in the epochs table: {missing}")
+        return epochs_input.select(columns).to_pandas()
 
-        # no point to an event ids dict without the actual events
-        if mne_event_ids is not None and mne_events is None:
-            raise ValueError("mne_events must also be specified to use mne_event_ids")
-
-        # compute sfreq samples / second from the time-stamps. _epochs_QC should
-        # ensure regular sampling interval but check anyway ...
-        timestamps = epochs_df[time].unique()
-        sampling_interval = list(set((timestamps - np.roll(timestamps, 1))[1:]))
-        assert len(sampling_interval) == 1  # should be guaranteed by _epochs_QC
-        sfreq = 1.0 / (sampling_interval[0] * time_unit)  # samples per second
-
-        montage = _streams2mne_digmont(eeg_streams, eeg_locations_f)
-        info = mne.create_info(montage.ch_names, sfreq=sfreq, ch_types="eeg")
-        info.set_montage(montage)  # for mne >0.19
-
-        tmin = epochs_df[time].min() * time_unit
-        epochs_data = []
-        # import pdb; pdb.set_trace()
-        for epoch_i in epochs_df[epoch_id].unique():
-            epoch1 = epochs_df[montage.ch_names][
-                epochs_df.epoch_id == epoch_i
-            ].to_numpy()
-            epochs_data.append(epoch1.T)
-        super().__init__(
-            epochs_data, info=info, tmin=tmin, events=mne_events, event_id=mne_event_ids
-        )
+    try:
+        table = feather.read_table(epochs_input, columns=columns, memory_map=True)
+    except pa.ArrowInvalid as err:
+        raise ValueError(f"{epochs_input}: {err}") from err
+    return table.to_pandas()
 
 
 # API
@@ -256,11 +426,13 @@ def read_spudtr_epochs(
     time=None,
     time_unit=None,
 ):
-
     """Parameters
     ------------
     convert spudtr format epochs data to MNE Epochs
-    input_fname : file name of spudtr format epochs data. 
+    input_fname : str, Path, pandas.DataFrame or pyarrow.Table
+        spudtr format epochs data, a feather file name or the already
+        loaded data. Only the ``epoch_id``, ``time``, category and
+        ``eeg_streams`` columns are read from the file, memory mapped.
 
     eeg_streams : list of str
         column names of the data streams
@@ -277,7 +449,7 @@ def read_spudtr_epochs(
         name of the epoch index
 
     time : str
-        name of the time stamp index, e.g., "time_ms" 
+        name of the time stamp index, e.g., "time_ms"
 
     time_unit : float
         time stamp unit in seconds, e.g., 0.001 for milliseconds, 1.0
@@ -289,7 +461,7 @@ def read_spudtr_epochs(
 
     """
 
-    return EpochsSpudtr(
+    return _epochs_spudtr_class()(
         input_fname,
         eeg_streams,
         eeg_locations_f,
@@ -299,3 +471,73 @@ def read_spudtr_epochs(
         time,
         time_unit,
     )
+
+
+def to_spudtr_epochs(epochs, epoch_id=EPOCH_ID, time=TIME, time_unit=0.001, picks=None):
+    """convert MNE Epochs to spudtr format epochs data
+
+    The reverse of ``read_spudtr_epochs``, the epochs data array is
+    transposed and reshaped once into the long format, the epoch ids
+    are the ``epochs.events`` sample column and the time stamps are
+    ``epochs.times`` in ``time_unit``. The data values are copied as
+    is, no unit scaling.
+
+    Parameters
+    ----------
+    epochs : mne.Epochs
+
+    epoch_id : str, optional
+        name of the epoch index column to create
+
+    time : str, optional
+        name of the time stamp column to create, e.g., "time_ms"
+
+    time_unit : float
+        time stamp unit in seconds, e.g., 0.001 for milliseconds, 1.0
+        for seconds. Time stamps that land on whole units are integers.
+
+    picks : list of str or None
+        names of the channels to include, default is all of them
+
+    Returns
+    -------
+    epochs_df : pandas.DataFrame
+       ``epoch_id``, ``time``, the ``epochs.metadata`` columns, if any,
+       repeated for each time stamp, and one column per channel
+
+    """
+
+    ch_names = list(epochs.ch_names) if picks is None else list(picks)
+    data = epochs.get_data(picks=ch_names)  # (n_epochs, n_channels, n_times)
+    n_epochs, n_channels, n_times = data.shape
+
+    times = epochs.times / time_unit
+    if np.allclose(times, np.round(times), rtol=0, atol=1e-6):
+        times = np.round(times).astype(np.int64)
+
+    index_df = pd.DataFrame(
+        {
+            epoch_id: np.repeat(epochs.events[:, 0], n_times),
+            time: np.tile(times, n_epochs),
+        }
+    )
+
+    # one row take of the metadata, not a loop over epochs
+    frames = [index_df]
+    if epochs.metadata is not None:
+        metadata = epochs.metadata.take(np.repeat(np.arange(n_epochs), n_times))
+        frames.append(metadata.reset_index(drop=True))
+
+    # (n_epochs, n_times, n_channels) rows are epochs x times in order
+    frames.append(
+        pd.DataFrame(
+            data.transpose(0, 2, 1).reshape(n_epochs * n_times, n_channels),
+            columns=ch_names,
+            copy=False,
+        )
+    )
+    epochs_df = pd.concat(frames, axis=1)
+    if epochs_df.columns.duplicated().any():
+        dupes = list(epochs_df.columns[epochs_df.columns.duplicated()])
+        raise ValueError(f"duplicate epochs_df column names: {dupes}")
+    return epochs_df
@@ -0,0 +1,654 @@
+"""lazy, fused chains of epf transforms
+
+A Pipeline records epf transforms and runs them later on a spudtr
+format epochs data frame or an EpochsTensor. Each run validates the
+data once and loads the data streams once into a float64 (n_epochs,
+n_times, n_streams) block. Adjacent re-references and mean baselines
+are combined into one linear operator and the steps that work epoch by
+epoch run together on one cache sized block of epochs at a time.
+
+Examples
+--------
+>>> pipe = (
+...     Pipeline(eeg_streams)
+...     .re_reference(eeg_streams, ["A1", "A2"], "linked_pair")
+...     .center_eeg(eeg_streams, -200, 0)
+...     .fir_filter_epochs(eeg_streams, by_epoch=True, **filter_params)
+...     .drop_bad_epochs("eeg_artifact")
+... )
+>>> epochs_df = pipe.run(epochs_df)
+>>> pipe.stage_seconds
+{'validate': 0.004, 'drop_bad_epochs': 0.001, 'load': 0.05, ...}
+
+"""
+
+import contextlib
+from collections import namedtuple
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from scipy import signal
+
+from spudtr import epf
+from spudtr.epf import EPOCH_ID, TIME, EpochsTensor
+from spudtr.filters import (
+    _apply_firwin_filter_data,
+    _design_firwin_filter,
+    check_filter_params,
+)
+
+try:
+    from spudtr import _spudtr as _kernels  # optional compiled kernels
+except ImportError:
+    from spudtr import _kernels
+
+PIPELINE_BLOCK_BYTES = 2**20  # epochs per block of an epoch by epoch pass, ~L2 sized
+_LOAD_BLOCK_BYTES = 2**19  # rows per block when loading the data streams
+
+_Step = namedtuple("_Step", ["name", "streams", "params"])
+
+
+class Pipeline:
+    """lazy chain of epf transforms, validated and loaded once per run
+
+    The step methods take the same arguments as the epf functions,
+    less the epochs data, record the step and return the pipeline so
+    the steps chain. Nothing is computed until :meth:`run`.
+
+    Parameters
+    ----------
+    data_streams : list of str
+        all the streams the steps read or transform, the other columns
+        are carried along as they are
+    epoch_id : str, optional
+        column name for the epoch index
+    time : str, optional
+        column name for the time stamps
+
+    Attributes
+    ----------
+    steps : list
+        the recorded (name, streams, params) steps in order
+    stage_seconds : dict
+        seconds spent in each stage of the last run in the order run.
+        Fused steps are reported together, e.g.,
+        "re_reference+center_eeg".
+
+
+    Notes
+    -----
+
+    The results are the same as calling the epf functions one after
+    the other with two differences. The `by_epoch=False` filter runs
+    the epochs end to end in epoch, time order, epochs in order of
+    first appearance, instead of data frame row order, the same thing
+    when the rows are sorted. And `drop_bad_epochs` reads the bads at
+    time 0 before any step runs so the dropped epochs aren't loaded at
+    all, which means the `bads_column` can't be a stream an earlier
+    step changes. Blocks of epochs with NaN samples run the fused
+    re-references and baselines one step at a time so the NaN samples
+    only reach the streams the epf functions would spread them to.
+
+    """
+
+    def __init__(self, data_streams, epoch_id=EPOCH_ID, time=TIME):
+        if not isinstance(data_streams, list) or not all(
+            isinstance(item, str) for item in data_streams
+        ):
+            raise ValueError("data_streams should be a list of strings.")
+        self.data_streams = list(data_streams)
+        self.epoch_id = epoch_id
+        self.time = time
+        self.steps = []
+        self.stage_seconds = {}
+
+    def __repr__(self):
+        return f"Pipeline({' -> '.join(step.name for step in self.steps)})"
+
+    def _add(self, name, streams, reads=(), **params):
+        missing_streams = (set(streams) | set(reads)) - set(self.data_streams)
+        if missing_streams:
+            raise ValueError(
+                f"{name} streams must be in the pipeline data_streams, "
+                f"the following are missing: {list(missing_streams)}"
+            )
+        self.steps.append(_Step(name, list(streams), params))
+        return self
+
+    def check_epochs(self):
+        """validate the epochs data, see epf.check_epochs
+
+        Each run validates the data once before anything else with or
+        without this step.
+        """
+        return self._add("check_epochs", [])
+
+    def re_reference(self, eeg_streams, ref, ref_type):
+        """see epf.re_reference"""
+        refs = epf._reference_streams(ref, ref_type)
+        return self._add(
+            "re_reference", eeg_streams, reads=refs, ref=ref, ref_type=ref_type
+        )
+
+    def center_eeg(self, eeg_streams, start, stop, mode="mean"):
+        """see epf.center_eeg"""
+        epf._check_baseline_mode(mode)
+        return self._add("center_eeg", eeg_streams, start=start, stop=stop, mode=mode)
+
+    def fir_filter_epochs(
+        self,
+        data_columns,
+        ftype=None,
+        cutoff_hz=None,
+        width_hz=None,
+        ripple_db=None,
+        window=None,
+        sfreq=None,
+        trim_edges=False,
+        by_epoch=False,
+        engine="auto",
+    ):
+        """see epf.fir_filter_epochs"""
+        taps = _design_firwin_filter(
+            **check_filter_params(
+                ftype=ftype,
+                cutoff_hz=cutoff_hz,
+                sfreq=sfreq,
+                width_hz=width_hz,
+                ripple_db=ripple_db,
+                window=window,
+            )
+        )
+        return self._add(
+            "fir_filter_epochs",
+            data_columns,
+            taps=taps,
+            trim_edges=trim_edges,
+            by_epoch=by_epoch,
+            engine=engine,
+        )
+
+    def drop_bad_epochs(self, bads_column):
+        """see epf.drop_bad_epochs"""
+        for step in self.steps:
+            if bads_column in step.streams:
+                raise ValueError(
+                    f"bads_column {bads_column} is changed by an earlier "
+                    f"{step.name} step"
+                )
+        return self._add("drop_bad_epochs", [], bads_column=bads_column)
+
+    def resample_epochs(
+        self, new_sfreq, sfreq=None, width_hz=None, ripple_db=53.0, window="kaiser"
+    ):
+        """see epf.resample_epochs, this resamples all the data_streams"""
+        return self._add(
+            "resample_epochs",
+            self.data_streams,
+            new_sfreq=new_sfreq,
+            sfreq=sfreq,
+            width_hz=width_hz,
+            ripple_db=ripple_db,
+            window=window,
+        )
+
+    @contextlib.contextmanager
+    def _stage(self, label):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._add_seconds(label, perf_counter() - start)
+
+    def _add_seconds(self, label, seconds):
+        self.stage_seconds[label] = self.stage_seconds.get(label, 0.0) + seconds
+
+    def _plan(self, times):
+        """fuse the steps into passes over data with these time stamps
+
+        Returns
+        -------
+        passes : list of (by_block, ops)
+            ops are (label, func) pairs applied in turn. A by_block pass
+            runs func(block) one block of epochs at a time, the others
+            run func(data, state) on all the data at once.
+        hoisted : list of str
+            bads_columns to drop before the data are loaded
+        time_idxs : np.ndarray or None
+            positions of the output time stamps in the input, None if
+            resampled
+        times : np.ndarray
+            the output time stamps
+        """
+        streams = self.data_streams
+        n_streams = len(streams)
+        time_idxs = np.arange(len(times))
+        passes, ops, hoisted = [], [], []
+        end_to_end = False  # an end to end filter keeps drops in place
+        linear = None  # pending [labels, A, B, window, steps], see _linear_op
+
+        def new_linear():
+            return [[], np.eye(n_streams), np.zeros((n_streams, n_streams)), None, []]
+
+        def flush_linear():
+            nonlocal linear
+            if linear is not None:
+                labels, A, B, window, step_ops = linear
+                ops.append(("+".join(labels), _linear_op(A, B, window, step_ops)))
+                linear = None
+
+        def flush_pass():
+            flush_linear()
+            if ops:
+                passes.append((True, list(ops)))
+                ops.clear()
+
+        for step in self.steps:
+            idxs = [streams.index(stream) for stream in step.streams]
+            params = step.params
+
+            if step.name == "re_reference":
+                # x @ W subtracts the weighted refs from the eeg streams
+                weights = epf._reference_weights(
+                    streams, params["ref"], params["ref_type"]
+                )
+                W = np.eye(n_streams)
+                W[:, idxs] -= weights[:, np.newaxis]
+                if linear is None:
+                    linear = new_linear()
+                linear[0].append(step.name)
+                linear[1] = linear[1] @ W
+                linear[2] = linear[2] @ W
+                linear[4].append(
+                    _reference_op(idxs, streams, params["ref"], params["ref_type"])
+                )
+
+            elif step.name == "center_eeg" and params["mode"] == "mean":
+                window = epf._find_subscript(times, params["start"], params["stop"])
+                if linear is not None and linear[3] not in (None, window):
+                    flush_linear()
+                if linear is None:
+                    linear = new_linear()
+
+                # the baseline means of x @ A - m @ B over the same window
+                # are m @ (A - B), subtract them from the centered streams
+                centered = np.zeros(n_streams)
+                centered[idxs] = 1.0
+                labels, A, B, _, step_ops = linear
+                linear = [
+                    labels + [step.name],
+                    A,
+                    B + (A - B) * centered,
+                    window,
+                    step_ops + [_baseline_op(idxs, window, "mean")],
+                ]
+
+            elif step.name == "center_eeg":
+                window = epf._find_subscript(times, params["start"], params["stop"])
+                flush_linear()
+                ops.append((step.name, _baseline_op(idxs, window, params["mode"])))
+
+            elif step.name == "fir_filter_epochs":
+                taps = params["taps"]
+                if params["by_epoch"]:
+                    epf._check_epoch_length(len(times), taps)
+                    flush_linear()
+                    ops.append((step.name, _filter_op(idxs, taps, params["engine"])))
+                else:
+                    flush_pass()
+                    op = _filter_flat_op(idxs, taps, params["engine"])
+                    passes.append((False, [(step.name, op)]))
+                    end_to_end = True
+                if params["trim_edges"]:
+                    n_edge = int(np.floor(len(taps) / 2.0))
+                    trim = slice(n_edge, len(times) - n_edge)
+                    times = times[trim]
+                    if time_idxs is not None:
+                        time_idxs = time_idxs[trim]
+                    ops.append(("trim_edges", _trim_op(trim)))
+
+            elif step.name == "drop_bad_epochs":
+                if end_to_end:
+                    flush_pass()
+                    passes.append(
+                        (False, [(step.name, _drop_op(params["bads_column"]))])
+                    )
+                else:
+                    hoisted.append(params["bads_column"])
+
+            elif step.name == "resample_epochs":
+                start, up, down, taps, times = epf._resample_params(
+                    times,
+                    params["sfreq"],
+                    params["new_sfreq"],
+                    params["width_hz"],
+                    params["ripple_db"],
+                    params["window"],
+                    time=self.time,
+                )
+                flush_linear()
+                ops.append((step.name, _resample_op(start, up, down, taps)))
+                time_idxs = None
+
+        flush_pass()
+        return passes, hoisted, time_idxs, times
+
+    def run(self, epochs):
+        """run the steps on epochs data
+
+        Parameters
+        ----------
+        epochs : pd.DataFrame or EpochsTensor
+            spudtr format epochs data with the pipeline data_streams
+
+        Returns
+        -------
+        pd.DataFrame or EpochsTensor
+            new epochs data like `epochs`, which is left as it was
+
+        """
+
+        self.stage_seconds = {}
+        is_tensor = isinstance(epochs, EpochsTensor)
+
+        with self._stage("validate"):
+            if is_tensor:
+                layout = None
+                epochs.stream_index(self.data_streams)
+                times, n_epochs = epochs.times, epochs.shape[0]
+            else:
+                layout = epf._epochs_QC_layout(
+                    epochs, self.data_streams, epoch_id=self.epoch_id, time=self.time
+                )
+                times, n_epochs = layout.times, layout.n_epochs
+            passes, hoisted, time_idxs, new_times = self._plan(times)
+
+        state = dict(goods={}, epoch_idxs=np.arange(n_epochs))
+        bads_columns = [
+            step.params["bads_column"]
+            for step in self.steps
+            if step.name == "drop_bad_epochs"
+        ]
+        if bads_columns:
+            with self._stage("drop_bad_epochs"):
+                for bads_column in bads_columns:
+                    state["goods"][bads_column] = _good_epochs(
+                        epochs, layout, bads_column
+                    )
+                for bads_column in hoisted:
+                    epoch_idxs = state["epoch_idxs"]
+                    state["epoch_idxs"] = epoch_idxs[
+                        state["goods"][bads_column][epoch_idxs]
+                    ]
+
+        with self._stage("load"):
+            data = self._load(epochs, layout, state["epoch_idxs"])
+
+        for by_block, ops in passes:
+            if by_block:
+                data = self._run_blocks(ops, data)
+                continue
+            for label, func in ops:
+                with self._stage(label):
+                    data = func(data, state)
+
+        with self._stage("output"):
+            data = data.reshape(len(data), len(new_times), len(self.data_streams))
+            if is_tensor:
+                return self._tensor_output(
+                    epochs, data, state["epoch_idxs"], time_idxs, new_times
+                )
+            return self._df_output(
+                epochs, layout, data, state["epoch_idxs"], time_idxs, new_times
+            )
+
+    def _load(self, epochs, layout, epoch_idxs):
+        """(n_epochs, n_times, n_streams) float64 data of these epochs"""
+        times = epochs.times if layout is None else layout.times
+        n_times, n_streams = len(times), len(self.data_streams)
+        data = np.empty((len(epoch_idxs), n_times, n_streams))
+
+        if layout is None:
+            stream_idxs = epochs.stream_index(self.data_streams)
+            data[:] = epochs.data[np.ix_(epoch_idxs, np.arange(n_times), stream_idxs)]
+            return data
+
+        # column by column into cache sized blocks of rows, not a copy
+        # of all the columns at once
+        rows = np.arange(len(epochs))
+        if not layout.is_sorted or len(epoch_idxs) < layout.n_epochs:
+            rows = _grid_rows(layout, epoch_idxs, np.arange(n_times))
+        columns = [epochs[stream].to_numpy() for stream in self.data_streams]
+        flat_data = data.reshape(-1, n_streams)
+        block_size = max(1, _LOAD_BLOCK_BYTES // (8 * n_streams))
+        for start in range(0, len(rows), block_size):
+            block_rows = rows[start : start + block_size]
+            block = flat_data[start : start + block_size]
+            for i, column in enumerate(columns):
+                block[:, i] = column[block_rows]
+        return data
+
+    def _run_blocks(self, ops, data):
+        """run the ops on cache sized blocks of epochs in turn"""
+        n_epochs = len(data)
+        block_size = max(1, PIPELINE_BLOCK_BYTES // max(1, data[:1].nbytes))
+        seconds = dict.fromkeys((label for label, _ in ops), 0.0)
+
+        out = data
+        for start in range(0, n_epochs, block_size):
+            block = in_block = data[start : start + block_size]
+            for label, func in ops:
+                op_start = perf_counter()
+                block = func(block)
+                seconds[label] += perf_counter() - op_start
+
+            if block is not in_block:
+                if out is data and block.shape[1:] != data.shape[1:]:
+                    out = np.empty((n_epochs,) + block.shape[1:])
+                out[start : start + block_size] = block
+
+        for label, label_seconds in seconds.items():
+            self._add_seconds(label, label_seconds)
+        return out
+
+    def _tensor_output(self, epochs, data, epoch_idxs, time_idxs, new_times):
+        metadata = epochs.metadata.iloc[epoch_idxs].reset_index(drop=True)
+        if time_idxs is None:
+            # resampled, only the data streams like epf.resample_epochs
+            resampled = EpochsTensor(
+                data,
+                new_times,
+                self.data_streams,
+                metadata,
+                epoch_id=epochs.epoch_id,
+                time=epochs.time,
+            )
+            resampled._columns = epochs._columns
+            return resampled
+
+        if epochs.streams != self.data_streams:
+            new_data = epf._float_copy(
+                epochs.data[np.ix_(epoch_idxs, time_idxs, np.arange(epochs.shape[2]))]
+            )
+            new_data[:, :, epochs.stream_index(self.data_streams)] = data
+            data = new_data
+        return epochs.copy(data=data, times=new_times, metadata=metadata)
+
+    def _df_output(self, epochs_df, layout, data, epoch_idxs, time_idxs, new_times):
+        streams = self.data_streams
+        flat_data = data.reshape(-1, len(streams))
+
+        if time_idxs is None:
+            # resampled, the other columns become epoch metadata like
+            # EpochsTensor.from_epochs_df
+            time_idx = epf._metadata_time_idx(layout.times)
+            meta_rows = _grid_rows(layout, epoch_idxs, [time_idx])
+            meta_cols = [
+                col
+                for col in epochs_df.columns
+                if col not in streams and col != self.time
+            ]
+            resampled = EpochsTensor(
+                data,
+                new_times,
+                streams,
+                epochs_df[meta_cols].iloc[meta_rows].reset_index(drop=True),
+                epoch_id=self.epoch_id,
+                time=self.time,
+            )
+            resampled._columns = list(epochs_df.columns)
+            return resampled.to_epochs_df()
+
+        if len(epoch_idxs) == layout.n_epochs and len(time_idxs) == layout.n_times:
+            if not layout.is_sorted:
+                sorted_data, flat_data = flat_data, np.empty_like(flat_data)
+                flat_data[layout.row_order] = sorted_data
+            return epf._replace_streams(epochs_df, streams, flat_data, layout)
+
+        # dropped epochs or trimmed edges, the rows left in their order
+        rows = _grid_rows(layout, epoch_idxs, time_idxs)
+        if not layout.is_sorted:
+            order = np.argsort(rows)
+            rows, flat_data = rows[order], flat_data[order]
+        columns = {stream: flat_data[:, i] for i, stream in enumerate(streams)}
+        return pd.DataFrame(
+            {
+                col: columns[col] if col in columns else epochs_df[col].array.take(rows)
+                for col in epochs_df.columns
+            },
+            index=epochs_df.index[rows],
+            copy=False,
+        ).__finalize__(epochs_df)
+
+
+def _grid_rows(layout, epoch_idxs, time_idxs):
+    """data frame rows at these epoch, time positions of the layout"""
+    rows = (
+        np.asarray(epoch_idxs)[:, np.newaxis] * layout.n_times
+        + np.asarray(time_idxs)[np.newaxis, :]
+    ).ravel()
+    if not layout.is_sorted:
+        rows = layout.row_order[rows]
+    return rows
+
+
+def _good_epochs(epochs, layout, bads_column):
+    """True for the epochs with a 0 bads_column code at time 0"""
+    times = epochs.times if layout is None else layout.times
+    time_idx = np.flatnonzero(times == 0)
+
+    if layout is None and bads_column in epochs.metadata.columns:
+        return epochs.metadata[bads_column].to_numpy() == 0
+    if len(time_idx) == 0:
+        raise ValueError("drop_bad_epochs needs the time stamp 0")
+
+    if layout is None:
+        if bads_column not in epochs.streams:
+            raise ValueError(f"bads_column not found: {bads_column}")
+        stream_idx = epochs.stream_index([bads_column])[0]
+        return epochs.data[:, time_idx[0], stream_idx] == 0
+
+    if bads_column not in epochs.columns:
+        raise ValueError(f"bads_column not found: {bads_column}")
+    rows = _grid_rows(layout, np.arange(layout.n_epochs), time_idx[:1])
+    return epochs[bads_column].to_numpy()[rows] == 0
+
+
+# ------------------------------------------------------------
+# the ops, func(block) for by block passes, func(data, state) for the others
+
+
+def _linear_op(A, B, window, step_ops):
+    """x @ A - m @ B with m the baseline means of x over the window
+
+    A sequence of re-references and mean baselines on the same window
+    all come down to this, one matrix product and one baseline mean
+    per epoch and stream. The products would spread a NaN sample to
+    every stream, so blocks with NaN run the step_ops one at a time
+    instead, like the epf functions.
+    """
+    identity = np.array_equal(A, np.eye(len(A)))
+
+    def linear(block):
+        if np.isnan(block).any():
+            for step_op in step_ops:
+                block = step_op(block)
+            return block
+        if window is not None:
+            istart, istop = window
+            if not block.flags.c_contiguous:
+                block = np.ascontiguousarray(block)
+            means = _kernels.baseline_means(block, istart, istop)
+        out = block if identity else block @ A
+        if window is not None:
+            out -= (means @ B)[:, np.newaxis, :]
+        return out
+
+    return linear
+
+
+def _reference_op(idxs, streams, ref, ref_type):
+    def re_reference(block):
+        new_ref = epf._nan_references(block, streams, [(idxs, ref, ref_type)], -1)
+        block[:, :, idxs] -= new_ref
+        return block
+
+    return re_reference
+
+
+def _baseline_op(idxs, window, mode):
+    def center_eeg(block):
+        data = np.ascontiguousarray(block[:, :, idxs])
+        block[:, :, idxs] = epf._baseline_epochs_data(data, *window, mode=mode)
+        return block
+
+    return center_eeg
+
+
+def _filter_op(idxs, taps, engine):
+    def fir_filter_epochs(block):
+        block[:, :, idxs] = _apply_firwin_filter_data(
+            block[:, :, idxs], taps, axis=1, engine=engine
+        )
+        return block
+
+    return fir_filter_epochs
+
+
+def _filter_flat_op(idxs, taps, engine):
+    def fir_filter_epochs(data, state):
+        # the epochs end to end like the data frame columns
+        data = np.ascontiguousarray(data)
+        flat_data = data.reshape(-1, data.shape[2])
+        flat_data[:, idxs] = _apply_firwin_filter_data(
+            flat_data[:, idxs], taps, axis=0, engine=engine
+        )
+        return data
+
+    return fir_filter_epochs
+
+
+def _trim_op(trim):
+    def trim_edges(block):
+        return block[:, trim, :]
+
+    return trim_edges
+
+
+def _drop_op(bads_column):
+    def drop_bad_epochs(data, state):
+        good = state["goods"][bads_column][state["epoch_idxs"]]
+        state["epoch_idxs"] = state["epoch_idxs"][good]
+        return data[good]
+
+    return drop_bad_epochs
+
+
+def _resample_op(start, up, down, taps):
+    def resample_epochs(block):
+        return signal.resample_poly(
+            block[:, start:, :], up, down, axis=1, window=taps, padtype="symmetric"
+        )
+
+    return resample_epochs
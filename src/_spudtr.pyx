@@ -1,10 +1,173 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""compiled kernels for the epochs hot loops
+
+Optional, built by setup.py when Cython is available. The pure Python
+spudtr/_kernels.py has the same functions with the same call
+signatures and is used when this extension isn't built.
+
+The data arrays are C-contiguous float64 (n_epochs, n_times,
+n_streams) or (n_series, n_samples), the callers take care of that.
+"""
+
 import numpy as np
-cimport numpy as np
 
-cython: language_level=3
+from libc.math cimport NAN
+
+COMPILED = True
+
+
+cdef _check_slice(Py_ssize_t start, Py_ssize_t stop, Py_ssize_t n_times):
+    if not 0 <= start < stop <= n_times:
+        raise ValueError(f"time slice [{start}, {stop}) is empty or out of bounds")
+
+
+def baseline_means(const double[:, :, ::1] data, Py_ssize_t start, Py_ssize_t stop):
+    """mean of each epoch and stream over the time slice [start, stop)
+
+    Returns
+    -------
+    np.ndarray, shape=(n_epochs, n_streams)
+    """
+    cdef Py_ssize_t n_epochs = data.shape[0], n_streams = data.shape[2]
+    cdef Py_ssize_t e, t, s
+    cdef double n = stop - start
+
+    _check_slice(start, stop, data.shape[1])
+    means = np.zeros((n_epochs, n_streams), dtype=np.float64)
+    cdef double[:, ::1] mns = means
+    with nogil:
+        for e in range(n_epochs):
+            for t in range(start, stop):
+                for s in range(n_streams):
+                    mns[e, s] += data[e, t, s]
+            for s in range(n_streams):
+                mns[e, s] /= n
+    return means
+
+
+def grid_rows(
+    const Py_ssize_t[::1] epoch_codes,
+    const Py_ssize_t[::1] time_codes,
+    Py_ssize_t n_epochs,
+    Py_ssize_t n_times,
+):
+    """row index at each (epoch, time) position of the epochs grid
+
+    Returns
+    -------
+    np.ndarray of intp, shape=(n_epochs * n_times,) or None
+        rows in epoch, time order or None if there are missing or
+        duplicate epoch_id, time combinations
+    """
+    cdef Py_ssize_t n_rows = epoch_codes.shape[0], row, g
+    cdef bint ok = n_rows == n_epochs * n_times
+
+    if not ok:
+        return None
+
+    rows = np.full(n_rows, -1, dtype=np.intp)
+    cdef Py_ssize_t[::1] _rows = rows
+    with nogil:
+        for row in range(n_rows):
+            g = epoch_codes[row] * n_times + time_codes[row]
+            if _rows[g] != -1:
+                ok = False  # duplicate, so another one is missing
+                break
+            _rows[g] = row
+    if not ok:
+        return None
+    return rows
+
+
+cdef enum:
+    _BLOCK = 1024  # samples per block of interior output
+
+
+cdef inline Py_ssize_t _reflect(Py_ssize_t i, Py_ssize_t n) noexcept nogil:
+    # [d c b a | a b c d | d c b a]
+    while i < 0 or i >= n:
+        if i < 0:
+            i = -i - 1
+        else:
+            i = 2 * n - i - 1
+    return i
+
+
+def fir_symmetric(const double[:, ::1] data, const double[::1] taps):
+    """centered FIR convolution of each row with mirror padded edges
+
+    The taps must be symmetric with odd length, the usual linear phase
+    FIR filter, so each pair of samples equidistant from the center is
+    summed before multiplying, half the multiplies of the convolution.
+
+    Returns
+    -------
+    np.ndarray, shape=(n_series, n_samples)
+    """
+    cdef Py_ssize_t n_series = data.shape[0], n_samples = data.shape[1]
+    cdef Py_ssize_t n_taps = taps.shape[0], delay = (n_taps - 1) // 2
+    cdef Py_ssize_t r, i, k, block, block_stop
+    cdef double tap
+
+    if n_taps % 2 == 0:
+        raise ValueError(f"symmetric FIR taps must have odd length not {n_taps}")
+
+    filtered = np.empty((n_series, n_samples), dtype=np.float64)
+    cdef double[:, ::1] out = filtered
+    cdef double[::1] padded = np.empty(n_samples + 2 * delay, dtype=np.float64)
+    with nogil:
+        for r in range(n_series):
+            # [d c b a | a b c d | d c b a]
+            for i in range(n_samples + 2 * delay):
+                padded[i] = data[r, _reflect(i - delay, n_samples)]
+
+            # tap by tap over cache sized blocks so the inner loop vectorizes
+            block = 0
+            while block < n_samples:
+                block_stop = min(block + _BLOCK, n_samples)
+                for i in range(block, block_stop):
+                    out[r, i] = taps[delay] * padded[i + delay]
+                for k in range(1, delay + 1):
+                    tap = taps[delay + k]
+                    for i in range(block, block_stop):
+                        out[r, i] += tap * (
+                            padded[i + delay - k] + padded[i + delay + k]
+                        )
+                block = block_stop
+    return filtered
+
+
+def peak_to_peak(const double[:, :, ::1] data, Py_ssize_t start, Py_ssize_t stop):
+    """max - min of each epoch and stream over the time slice [start, stop)
+
+    NaN anywhere in the slice gives NaN like np.ptp.
 
-cdef int int_math(int i, int j):
-     cdef int sum
-     sum = i + j
-     return 0
+    Returns
+    -------
+    np.ndarray, shape=(n_epochs, n_streams)
+    """
+    cdef Py_ssize_t n_epochs = data.shape[0], n_streams = data.shape[2]
+    cdef Py_ssize_t e, t, s
+    cdef double x
 
+    _check_slice(start, stop, data.shape[1])
+    ptps = np.empty((n_epochs, n_streams), dtype=np.float64)
+    cdef double[:, ::1] _ptps = ptps
+    cdef double[::1] lows = np.empty(n_streams, dtype=np.float64)
+    cdef double[::1] highs = np.empty(n_streams, dtype=np.float64)
+    cdef unsigned char[::1] nans = np.empty(n_streams, dtype=np.uint8)
+    with nogil:
+        for e in range(n_epochs):
+            for s in range(n_streams):
+                lows[s] = data[e, start, s]
+                highs[s] = data[e, start, s]
+                nans[s] = data[e, start, s] != data[e, start, s]
+            for t in range(start + 1, stop):
+                for s in range(n_streams):
+                    x = data[e, t, s]
+                    lows[s] = x if x < lows[s] else lows[s]
+                    highs[s] = x if x > highs[s] else highs[s]
+                    nans[s] |= x != x
+            for s in range(n_streams):
+                _ptps[e, s] = NAN if nans[s] else highs[s] - lows[s]
+    return ptps
@@ -6,7 +6,7 @@ from spudtr import DATA_DIR  # , P3_F, P5_F, WR_F
 
 # Zenodo archive feather files used starting with v0.0.9
 from spudtr import get_demo_df, WR_100_FEATHER, P5_1500_FEATHER
-from spudtr import epf
+from spudtr import epf, filters
 import spudtr.fake_epochs_data as fake_data
 from spudtr.epf import EPOCH_ID, TIME
 
@@ -271,6 +271,126 @@ def test_duplicate_values_of_epoch_id():
     assert "Duplicate values of epoch_id" in str(excinfo.value)
 
 
+def test_epochs_QC_row_order():
+    epochs_table, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+    )
+
+    # row order doesn't matter, only the epoch_id x time grid
+    shuffled_table = epochs_table.sample(frac=1, random_state=0)
+    epf._epochs_QC(shuffled_table, channels)
+
+    # a stray time stamp leaves a hole in the grid
+    shuffled_table.loc[shuffled_table.index[5], TIME] = 1000
+    with pytest.raises(ValueError) as excinfo:
+        epf.check_epochs(shuffled_table, channels)
+    assert "differs from previous snapshot" in str(excinfo.value)
+
+
+def test_factorize_missing():
+    codes, uniques = epf._factorize(np.array([3.0, np.nan, 1.0, 3.0]), sort=True)
+    assert all(codes == [1, 2, 0, 1])
+    assert np.array_equal(uniques, [1.0, 3.0, np.nan], equal_nan=True)
+
+    codes, uniques = epf._factorize(np.array(["a", None, "b"], dtype=object))
+    assert all(codes == [0, 2, 1])
+    assert uniques[:2].tolist() == ["a", "b"] and pd.isna(uniques[2])
+
+
+def test_epochs_layout():
+    epochs_table, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+    )
+
+    layout = epf.check_epochs(epochs_table, channels)
+    assert (layout.n_epochs, layout.n_times) == (20, 100)
+    assert all(layout.epoch_ids == epochs_table[EPOCH_ID].unique())
+    assert all(layout.times == np.arange(100))
+    assert layout.sampling_interval == 1
+    assert layout.is_sorted and layout.row_order is None
+
+    # cached with the data frame until the time column changes
+    assert epochs_table.spudtr.layout() is layout
+    epochs_table[TIME] = epochs_table[TIME] * 2
+    layout_2 = epochs_table.spudtr.layout()
+    assert layout_2 is not layout and layout_2.sampling_interval == 2
+
+    # row_order sorts shuffled rows
+    shuffled_table = epochs_table.sample(frac=1, random_state=0)
+    layout_3 = epf.check_epochs(shuffled_table, channels)
+    assert not layout_3.is_sorted
+    sorted_table = shuffled_table.iloc[layout_3.row_order]
+    assert all(sorted_table[EPOCH_ID] == np.repeat(layout_3.epoch_ids, 100))
+    assert all(sorted_table[TIME] == np.tile(layout_3.times, 20))
+
+
+def test_epochs_layout_reuse(monkeypatch):
+    epochs_table, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+    )
+
+    n_validations = []
+    _epochs_layout = epf._epochs_layout
+
+    def _counting_layout(*args, **kwargs):
+        n_validations.append(1)
+        return _epochs_layout(*args, **kwargs)
+
+    monkeypatch.setattr(epf, "_epochs_layout", _counting_layout)
+
+    epochs_table = epf.center_eeg(epochs_table, channels, 0, 20)
+    epochs_table = epf.re_reference(epochs_table, channels, channels, "common_average")
+    epochs_table = epf.fir_filter_epochs(
+        epochs_table,
+        channels,
+        ftype="lowpass",
+        cutoff_hz=20,
+        width_hz=5,
+        ripple_db=60,
+        window="kaiser",
+        sfreq=250,
+    )
+    epochs_table = epf.center_eeg(epochs_table, channels, 0, 20)
+    assert len(n_validations) == 1
+
+    # the user API always re-validates
+    epf.check_epochs(epochs_table, channels)
+    assert len(n_validations) == 2
+
+
+def test_epochs_layout_inplace_edit():
+    epochs_table, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+    )
+    epf.center_eeg(epochs_table, channels, 0, 20)
+
+    # same column memory, different values
+    epochs_table.loc[epochs_table[EPOCH_ID] == 3, EPOCH_ID] = 2
+    with pytest.raises(ValueError) as excinfo:
+        epf.center_eeg(epochs_table, channels, 0, 20)
+    assert "Duplicate values of epoch_id" in str(excinfo.value)
+
+
 @pytest.mark.parametrize(
     "data_streams",
     [
@@ -281,10 +401,14 @@ def test_duplicate_values_of_epoch_id():
 )
 @pytest.mark.parametrize(
     "_epoch_id",
-    ["epoch_id", pytest.param("epoch_id_xfail", marks=pytest.mark.xfail(strict=True)),],
+    [
+        "epoch_id",
+        pytest.param("epoch_id_xfail", marks=pytest.mark.xfail(strict=True)),
+    ],
 )
 @pytest.mark.parametrize(
-    "_time", ["time", pytest.param("time_xfail", marks=pytest.mark.xfail(strict=True))],
+    "_time",
+    ["time", pytest.param("time_xfail", marks=pytest.mark.xfail(strict=True))],
 )
 def test_check_epochs(data_streams, _epoch_id, _time):
     """test UI wrapper for epochs QC"""
@@ -358,6 +482,98 @@ def test_center_eeg():
     epf._epochs_QC(centered_epochs_df, eeg_streams, epoch_id=epoch_id, time=time)
 
 
+def test_center_eeg_row_order():
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    centered_df = epf.center_eeg(epochs_df, channels[:2], 0, 20)
+    assert centered_df[channels[2:]].equals(epochs_df[channels[2:]])
+    baseline = centered_df[centered_df[TIME].between(0, 20, inclusive="left")]
+    assert np.allclose(0, baseline.groupby(EPOCH_ID)[channels[:2]].mean())
+
+    # shuffled rows are centered in place, row for row
+    shuffled_df = epochs_df.sample(frac=1, random_state=0)
+    shuffled_centered_df = epf.center_eeg(shuffled_df, channels[:2], 0, 20)
+    assert shuffled_centered_df.index.equals(shuffled_df.index)
+    assert np.allclose(
+        shuffled_centered_df.sort_index()[channels].to_numpy(),
+        centered_df[channels].to_numpy(),
+    )
+
+    # just the centered streams
+    streams_df = epf.center_eeg(shuffled_df, channels[:2], 0, 20, streams_only=True)
+    assert list(streams_df.columns) == channels[:2]
+    assert streams_df.equals(shuffled_centered_df[channels[:2]])
+
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+    streams = epf.center_eeg(epochs, channels[:2], 0, 20, streams_only=True)
+    assert streams.streams == channels[:2]
+    assert np.allclose(
+        streams.to_epochs_df()[channels[:2]].to_numpy(),
+        centered_df[channels[:2]].to_numpy(),
+    )
+
+
+def test_center_eeg_modes():
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    # masked artifact samples in and out of the baseline
+    epochs_df.loc[[3, 50, 150], channels[0]] = np.nan
+
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+    data = epochs.data[:, :, :2]
+    baseline = data[:, :20, :]
+    positions = np.arange(100)
+    slopes, intercepts = np.zeros((20, 2)), np.zeros((20, 2))
+    for epoch in range(20):
+        for stream in range(2):
+            good = ~np.isnan(baseline[epoch, :, stream])
+            slopes[epoch, stream], intercepts[epoch, stream] = np.polyfit(
+                positions[:20][good], baseline[epoch, good, stream], 1
+            )
+
+    means = np.nanmean(baseline, axis=1)[:, None, :]
+    expected = {
+        "nanmean": data - means,
+        "median": data - np.nanmedian(baseline, axis=1)[:, None, :],
+        "zscore": (data - means) / np.nanstd(baseline, axis=1)[:, None, :],
+        "percent": 100 * (data - means) / means,
+        "detrend": data
+        - intercepts[:, None, :]
+        - slopes[:, None, :] * positions[None, :, None],
+    }
+    for mode, expected_data in expected.items():
+        centered_df = epf.center_eeg(epochs_df, channels[:2], 0, 20, mode=mode)
+        centered = epf.EpochsTensor.from_epochs_df(centered_df, channels)
+        assert np.allclose(centered.data[:, :, :2], expected_data, equal_nan=True)
+        assert np.isnan(centered.data[:, :, 0]).sum() == 3
+        assert centered_df[channels[2:]].equals(epochs_df[channels[2:]])
+
+        centered = epf.center_eeg(epochs, channels[:2], 0, 20, mode=mode)
+        assert np.allclose(centered.data[:, :, :2], expected_data, equal_nan=True)
+
+    # plain mean propagates the baseline NaN over the epoch
+    centered_df = epf.center_eeg(epochs_df, channels[:2], 0, 20)
+    assert centered_df[channels[0]].isna().sum() == 100 + 1
+
+    with pytest.raises(ValueError) as excinfo:
+        epf.center_eeg(epochs_df, channels, 0, 20, mode="mode_xfail")
+    assert "unknown baseline mode" in str(excinfo.value)
+
+
 def test_drop_bad_epochs():
     epoch_id = "epoch_id"
     time = "time_ms"
@@ -377,10 +593,46 @@ def test_drop_bad_epochs():
     assert epochs_df_good.shape[0] + epochs_df_bad.shape[0] == epochs_df.shape[0]
     epochs_df_good = epf.drop_bad_epochs(epochs_df, bads_column, epoch_id, time)
     epf._epochs_QC(
-        epochs_df_good, epochs_df_good.columns.tolist(), epoch_id=epoch_id, time=time,
+        epochs_df_good,
+        epochs_df_good.columns.tolist(),
+        epoch_id=epoch_id,
+        time=time,
     )
 
 
+def test_drop_bad_epochs_tensor():
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    epochs_df[TIME] -= 20
+
+    # bad at time 0 only, not at the first time stamp
+    bads = epochs_df[EPOCH_ID] % 3 == 1
+    epochs_df["bads"] = (bads & (epochs_df[TIME] == 0)).astype(int)
+    expected = epf.drop_bad_epochs(epochs_df, "bads", time=TIME)
+    assert expected[EPOCH_ID].nunique() == 13
+
+    # bads as a data stream and as metadata
+    for streams in [channels + ["bads"], channels]:
+        epochs = epf.EpochsTensor.from_epochs_df(epochs_df, streams)
+        good_epochs = epf.drop_bad_epochs(epochs, "bads")
+        assert np.array_equal(good_epochs.epoch_ids, expected[EPOCH_ID].unique())
+        assert np.allclose(good_epochs.to_epochs_df()[channels], expected[channels])
+
+    # no time 0 to read the bads stream at
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels + ["bads"])
+    epochs = epochs.copy(times=epochs.times + 0.5)
+    with pytest.raises(ValueError) as excinfo:
+        epf.drop_bad_epochs(epochs, "bads")
+    assert "needs the time stamp 0" in str(excinfo.value)
+
+
 def test_re_reference():
 
     # create a fake data
@@ -441,6 +693,68 @@ def test_re_reference_2(eeg_streams, ref, ref_type, expected):
     epf._epochs_QC(br_epochs_df, eeg_streams, epoch_id=EPOCH_ID, time=TIME)
 
 
+def test_re_reference_nan():
+    epochs_df = pd.DataFrame(
+        np.array(
+            [[0, -3, 1, 2, 3], [0, -2, np.nan, 5, 6], [0, -1, 7, 8, 9]],
+        ),
+        columns=[EPOCH_ID, TIME, "a", "b", "c"],
+    )
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, ["a", "b", "c"])
+
+    # NaN in one reference stream is skipped by the common average
+    for eeg_streams, ref, ref_type, expected in [
+        (["b", "c"], ["a", "b"], "common_average", [0.5, 0.0, 0.5]),
+        (["b", "c"], ["a"], "linked_pair", [1.5, np.nan, 4.5]),
+        (["a", "b"], ["c"], "new_common", [-1.0, -1.0, -1.0]),
+    ]:
+        br_epochs_df = epf.re_reference(epochs_df, eeg_streams, ref, ref_type)
+        assert np.allclose(br_epochs_df.b, expected, equal_nan=True)
+
+        br_epochs = epf.re_reference(epochs, eeg_streams, ref, ref_type)
+        assert np.allclose(br_epochs.to_epochs_df().b, expected, equal_nan=True)
+
+
+def test_re_reference_many():
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=6,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    references = {
+        "linked_pair": (channels[1:], channels[:1], "linked_pair"),
+        "common_average": (channels, channels, "common_average"),
+        "new_common": (channels[:3], channels[4], "new_common"),
+    }
+    for _epochs_df in [epochs_df, epochs_df.sample(frac=1, random_state=0)]:
+        re_referenced = epf.re_reference_many(_epochs_df, references)
+        assert list(re_referenced) == list(references)
+        for name, (eeg_streams, ref, ref_type) in references.items():
+            ref_data = _epochs_df[ref].to_numpy().reshape(len(_epochs_df), -1)
+            new_ref = ref_data.mean(axis=1, keepdims=True)
+            if ref_type == "linked_pair":
+                new_ref /= 2.0
+            expected = _epochs_df[eeg_streams].to_numpy() - new_ref
+            assert re_referenced[name].index.equals(_epochs_df.index)
+            assert list(re_referenced[name].columns) == list(_epochs_df.columns)
+            assert np.allclose(re_referenced[name][eeg_streams], expected)
+            other = _epochs_df.columns.difference(eeg_streams)
+            assert re_referenced[name][other].equals(_epochs_df[other])
+
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+    re_referenced_epochs = epf.re_reference_many(epochs, references)
+    re_referenced = epf.re_reference_many(epochs_df, references)
+    for name in references:
+        assert np.allclose(
+            re_referenced_epochs[name].to_epochs_df()[channels],
+            re_referenced[name][channels],
+        )
+
+
 @pytest.mark.parametrize(
     "trim_edges,df_shape", [(False, (335_250, 45)), (True, (253_896, 45))]
 )
@@ -464,7 +778,12 @@ def test_fir_filter_epochs(trim_edges, df_shape):
     )
 
     filt_test_df = epf.fir_filter_epochs(
-        epochs_df, eeg_cols, trim_edges=trim_edges, epoch_id=epoch_id, time=time, **_fp,
+        epochs_df,
+        eeg_cols,
+        trim_edges=trim_edges,
+        epoch_id=epoch_id,
+        time=time,
+        **_fp,
     )
     epf.check_epochs(filt_test_df, data_streams=eeg_cols, epoch_id=epoch_id, time=time)
 
@@ -488,3 +807,377 @@ def test_fir_filter_epochs(trim_edges, df_shape):
             assert not all(epochs_df[col] == filt_test_df[col])
         else:
             assert all(epochs_df[col] == filt_test_df[col])
+
+
+def test_epochs_tensor():
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    epochs_df.drop(columns="continuous", inplace=True)  # not epoch-level
+
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+    assert epochs.shape == (20, 100, 4)
+    assert list(epochs.metadata.columns) == [EPOCH_ID, "categorical"]
+    assert epochs.to_epochs_df().equals(epochs_df)
+
+    # row order doesn't matter
+    shuffled_epochs = epf.EpochsTensor.from_epochs_df(
+        epochs_df.sample(frac=1, random_state=0), channels
+    )
+    shuffled_df = shuffled_epochs.to_epochs_df()
+    assert shuffled_df.sort_values([EPOCH_ID, TIME], ignore_index=True).equals(
+        epochs_df
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        epochs.stream_index(["channel_xfail"])
+    assert "data_streams should all be present" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("trim_edges", [False, True])
+def test_epochs_tensor_transforms(trim_edges):
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    epochs_df.drop(columns="continuous", inplace=True)
+    epochs_df["bads"] = np.repeat(np.arange(20) % 3, 100)
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+
+    _fp = dict(
+        ftype="lowpass",
+        cutoff_hz=20,
+        width_hz=10,
+        ripple_db=60,
+        window="kaiser",
+        sfreq=250,
+    )
+    for transform, args, kwargs in [
+        (epf.center_eeg, (channels, 0, 20), {}),
+        (epf.re_reference, (channels[1:], channels[:1], "linked_pair"), {}),
+        (epf.re_reference, (channels, channels[:2], "common_average"), {}),
+        (epf.fir_filter_epochs, (channels,), dict(trim_edges=trim_edges, **_fp)),
+        (epf.drop_bad_epochs, ("bads",), dict(time=TIME)),
+    ]:
+        expected_df = transform(epochs_df, *args, **kwargs)
+        tensor_df = transform(epochs, *args, **kwargs).to_epochs_df()
+        assert isinstance(transform(epochs, *args, **kwargs), epf.EpochsTensor)
+        assert np.allclose(
+            expected_df[channels].to_numpy(), tensor_df[channels].to_numpy()
+        )
+        assert np.array_equal(
+            expected_df[[EPOCH_ID, TIME]].to_numpy(),
+            tensor_df[[EPOCH_ID, TIME]].to_numpy(),
+        )
+
+
+def test_transforms_inplace():
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    epochs_df["categorical"] = epochs_df["categorical"].astype(str)
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+
+    _fp = dict(
+        ftype="lowpass",
+        cutoff_hz=20,
+        width_hz=10,
+        ripple_db=60,
+        window="kaiser",
+        sfreq=250,
+    )
+    for transform, args, kwargs in [
+        (epf.center_eeg, (channels[1:], 0, 20), {}),
+        (epf.center_eeg, (channels[1:], 0, 20), dict(mode="median")),
+        (epf.re_reference, (channels[1:], channels[:1], "linked_pair"), {}),
+        (epf.re_reference, (channels, channels, "common_average"), {}),
+        (epf.fir_filter_epochs, (channels[1:],), _fp),
+        (epf.fir_filter_epochs, (channels[1:],), dict(by_epoch=True, **_fp)),
+    ]:
+        expected_df = transform(epochs_df, *args, **kwargs)
+
+        # untouched numeric columns are shared only copy-on-write
+        for col in [TIME, channels[0]]:
+            if col not in args[0]:
+                assert (
+                    np.shares_memory(
+                        expected_df[col].to_numpy(), epochs_df[col].to_numpy()
+                    )
+                    == filters._copy_on_write()
+                )
+        pd.testing.assert_frame_equal(
+            expected_df.drop(columns=args[0]), epochs_df.drop(columns=args[0])
+        )
+
+        inplace_df = epochs_df.copy()
+        assert transform(inplace_df, *args, inplace=True, **kwargs) is None
+        assert inplace_df.equals(expected_df)
+        epf._epochs_QC(inplace_df, channels)
+
+        expected = transform(epochs, *args, **kwargs)
+        inplace_epochs = epochs.copy()
+        assert transform(inplace_epochs, *args, inplace=True, **kwargs) is None
+        assert np.allclose(inplace_epochs.data, expected.data)
+
+    with pytest.raises(ValueError) as excinfo:
+        epf.fir_filter_epochs(epochs_df, channels, trim_edges=True, inplace=True, **_fp)
+    assert "can't be done inplace" in str(excinfo.value)
+
+    with pytest.raises(ValueError) as excinfo:
+        epf.center_eeg(epochs_df, channels, 0, 20, streams_only=True, inplace=True)
+    assert "can't both be True" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("copy_on_write", [True, False])
+def test_transforms_copy(monkeypatch, copy_on_write):
+    if not copy_on_write:
+        # force the explicit copies, pandas >= 3 is always copy-on-write
+        monkeypatch.setattr(epf, "_copy_on_write", lambda: False)
+        monkeypatch.setattr(filters, "_copy_on_write", lambda: False)
+    elif not filters._copy_on_write():
+        pytest.skip("pandas copy-on-write is off")
+
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    epochs_df["bads"] = 0
+    original_df = epochs_df.copy()
+
+    _fp = dict(
+        ftype="lowpass",
+        cutoff_hz=20,
+        width_hz=10,
+        ripple_db=60,
+        window="kaiser",
+        sfreq=250,
+    )
+    for transform, args, kwargs in [
+        (epf.center_eeg, (channels[1:], 0, 20), {}),
+        (epf.re_reference, (channels[1:], channels[:1], "linked_pair"), {}),
+        (epf.fir_filter_epochs, (channels[1:],), _fp),
+        (epf.fir_filter_epochs, (channels[1:],), dict(by_epoch=True, **_fp)),
+        (epf.drop_bad_epochs, ("bads",), dict(time=TIME)),
+    ]:
+        new_df = transform(epochs_df, *args, **kwargs)
+
+        # edits to the result don't reach the input
+        new_df.loc[new_df.index[0], [EPOCH_ID, TIME, "continuous"]] = -1
+        new_df.loc[new_df.index[0], channels[0]] = 1000.0
+        new_df["categorical"] = "x"
+        assert epochs_df.equals(original_df)
+        epf.check_epochs(epochs_df, channels)
+
+
+def test_fir_filter_epochs_by_epoch():
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    _fp = dict(
+        ftype="lowpass",
+        cutoff_hz=20,
+        width_hz=10,
+        ripple_db=60,
+        window="kaiser",
+        sfreq=250,
+    )
+
+    # each epoch filtered on its own is the same as filtering it alone
+    filt_df = epf.fir_filter_epochs(epochs_df, channels, by_epoch=True, **_fp)
+    for epoch_id in [0, 7, 19]:
+        epoch_df = epochs_df[epochs_df[EPOCH_ID] == epoch_id]
+        filt_epoch_df = filters.fir_filter_dt(epoch_df, channels, **_fp)
+        assert np.allclose(
+            filt_df[epochs_df[EPOCH_ID] == epoch_id][channels], filt_epoch_df[channels]
+        )
+
+    # row order doesn't matter
+    shuffled_df = epochs_df.sample(frac=1, random_state=0)
+    filt_shuffled_df = epf.fir_filter_epochs(
+        shuffled_df, channels, by_epoch=True, **_fp
+    )
+    assert filt_shuffled_df.sort_index().equals(filt_df)
+
+    # same for an EpochsTensor
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+    filt_epochs = epf.fir_filter_epochs(epochs, channels, by_epoch=True, **_fp)
+    assert np.allclose(filt_epochs.to_epochs_df()[channels], filt_df[channels])
+
+    # epochs shorter than the filter delay
+    _fp.update(width_hz=1)
+    with pytest.raises(ValueError) as excinfo:
+        epf.fir_filter_epochs(epochs_df, channels, by_epoch=True, **_fp)
+    assert "too short" in str(excinfo.value)
+
+
+def test_resample_epochs():
+    sfreq, new_sfreq = 500.0, 125.0
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=250,
+        n_categories=2,
+        n_channels=2,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    # ms time stamps, -100 to 398 ms, and a 5 Hz sine in channel0
+    epochs_df[TIME] = epochs_df[TIME] * 2 - 100
+    sine = lambda ms: np.sin(2.0 * np.pi * 5.0 * ms / 1000.0)
+    epochs_df[channels[0]] = sine(epochs_df[TIME])
+
+    res_df = epf.resample_epochs(epochs_df, channels, new_sfreq, sfreq=sfreq)
+    layout = epf.check_epochs(res_df, channels)
+    assert layout.n_epochs == epochs_df[EPOCH_ID].nunique()
+    assert layout.sampling_interval == 8
+    assert 0 in layout.times and layout.times[0] >= -100
+    assert res_df[TIME].dtype == epochs_df[TIME].dtype
+    assert list(res_df.columns) == list(epochs_df.columns)
+
+    # metadata carried over, per-sample columns at time 0
+    meta = epochs_df.groupby(EPOCH_ID)["categorical"].first()
+    res_meta = res_df.groupby(EPOCH_ID)["categorical"].first()
+    assert meta.equals(res_meta)
+    at_zero = epochs_df[epochs_df[TIME] == 0].set_index(EPOCH_ID)["continuous"]
+    res_at_zero = res_df.groupby(EPOCH_ID)["continuous"].agg(["min", "max"])
+    assert (res_at_zero["min"] == res_at_zero["max"]).all()
+    assert res_at_zero["min"].equals(at_zero.rename("min"))
+
+    # band limited signal is unchanged away from the edges
+    interior = res_df[TIME].between(0, 300)
+    assert np.allclose(
+        res_df.loc[interior, channels[0]], sine(res_df.loc[interior, TIME]), atol=1e-2
+    )
+
+    # same for an EpochsTensor
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+    res_epochs = epf.resample_epochs(epochs, channels, new_sfreq, sfreq=sfreq)
+    assert np.array_equal(res_epochs.times, layout.times)
+    assert np.allclose(res_epochs.to_epochs_df()[channels], res_df[channels])
+
+    # round trip to a rational rate and back
+    up_df = epf.resample_epochs(res_df, channels, 200.0, sfreq=new_sfreq)
+    assert epf.check_epochs(up_df, channels).sampling_interval == 5
+
+    # float time stamps in seconds, evenly spaced to within rounding
+    secs_df = epochs_df.copy()
+    secs_df[TIME] = secs_df[TIME] * 0.001
+    assert len(np.unique(np.diff(np.unique(secs_df[TIME])))) > 1
+    secs_res_df = epf.resample_epochs(secs_df, channels, new_sfreq, sfreq=sfreq)
+    assert np.allclose(secs_res_df[TIME], res_df[TIME] * 0.001)
+    assert np.allclose(secs_res_df[channels], res_df[channels])
+
+    with pytest.raises(ValueError) as excinfo:
+        epf.resample_epochs(epochs_df, channels, new_sfreq)
+    assert "sfreq=None" in str(excinfo.value)
+
+
+def test_peak_to_peak():
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=100,
+        n_categories=2,
+        n_channels=4,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+
+    ptp = epf.peak_to_peak(epochs_df, channels)
+    expected = epochs_df.groupby(EPOCH_ID)[channels].agg(lambda x: x.max() - x.min())
+    assert ptp.index.name == EPOCH_ID
+    assert np.allclose(ptp, expected.loc[ptp.index])
+
+    # start <= time < stop like center_eeg
+    ptp = epf.peak_to_peak(epochs_df, channels, 10, 50)
+    in_interval = epochs_df[epochs_df[TIME].between(10, 49)]
+    expected = in_interval.groupby(EPOCH_ID)[channels].agg(lambda x: x.max() - x.min())
+    assert np.allclose(ptp, expected.loc[ptp.index])
+
+    # row order doesn't matter, nor does the container
+    shuffled_df = epochs_df.sample(frac=1, random_state=0)
+    assert (
+        epf.peak_to_peak(shuffled_df, channels, 10, 50)
+        .sort_index()
+        .equals(ptp.sort_index())
+    )
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+    assert epf.peak_to_peak(epochs, channels, 10, 50).equals(ptp)
+
+
+def test_read_epochs(tmp_path):
+    epochs_df, channels = fake_data._generate(
+        n_epochs=10,
+        n_samples=20,
+        n_categories=2,
+        n_channels=32,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=0,
+    )
+    epochs_df["dblock_path"] = epochs_df[EPOCH_ID].map("dblock/{}".format)
+    epochs_df["log_evcodes"] = epochs_df.index.map("{},1".format)
+    epochs_f = tmp_path / "fake.epochs.feather"
+    epochs_df.to_feather(epochs_f, compression="uncompressed")
+
+    # all of it, low cardinality strings are categoricals
+    read_df = epf.read_epochs(epochs_f)
+    assert read_df["categorical"].dtype == "category"
+    assert list(read_df["categorical"].cat.categories) == ["cat0", "cat1"]
+    assert read_df["dblock_path"].dtype == "category"  # 1 per epoch
+    assert read_df["log_evcodes"].dtype != "category"  # 1 per row
+    pd.testing.assert_frame_equal(
+        read_df.astype({"categorical": str, "dblock_path": str}), epochs_df
+    )
+    assert not isinstance(
+        epf.read_epochs(epochs_f, categorical=False)["categorical"].dtype,
+        pd.CategoricalDtype,
+    )
+
+    # projected and filtered, epoch_id and time always included
+    epoch_ids = [3, 0, 7]
+    read_df = epf.read_epochs(
+        epochs_f, columns=["channel4"], epoch_ids=epoch_ids, start=5, stop=10
+    )
+    expected = epochs_df.loc[
+        epochs_df[EPOCH_ID].isin(epoch_ids) & epochs_df[TIME].between(5, 9),
+        [EPOCH_ID, TIME, "channel4"],
+    ].reset_index(drop=True)
+    pd.testing.assert_frame_equal(read_df, expected)
+    epf.check_epochs(read_df, ["channel4"])
+
+    with pytest.raises(ValueError) as excinfo:
+        epf.read_epochs(epochs_f, columns=["channel99"])
+    assert "channel99" in str(excinfo.value)
+
+    with pytest.raises(ValueError) as excinfo:
+        epf.read_epochs(epochs_f, epoch_id="item_id")
+    assert "epoch_id column not found" in str(excinfo.value)
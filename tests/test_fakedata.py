@@ -1,3 +1,9 @@
+import numpy as np
+import pandas as pd
+import patsy
+import pytest
+
+from spudtr import epf
 from spudtr.epf import EPOCH_ID, TIME
 import spudtr.fake_epochs_data as fake_data
 
@@ -28,3 +34,64 @@ def test__generate():
     )
 
     epochs_df = fake_data._get_df()
+
+
+def test__get_df():
+    epochs_df = fake_data._get_df()
+    balanced = pd.DataFrame(patsy.balanced(a=2, b=3))
+    assert np.array_equal(
+        epochs_df[["a", "b"]].to_numpy(), np.repeat(balanced.to_numpy(), 4, axis=0)
+    )
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_generate_epochs(dtype):
+
+    chunks, channels = fake_data.generate_epochs(
+        n_epochs=25, n_samples=100, n_channels=8, chunk_epochs=10, dtype=dtype, seed=1
+    )
+    chunks = list(chunks)
+    assert [chunk[EPOCH_ID].nunique() for chunk in chunks] == [10, 10, 5]
+    epochs_df = pd.concat(chunks, ignore_index=True)
+    epf.check_epochs(epochs_df, channels)
+    assert (epochs_df[channels].dtypes == dtype).all()
+    assert epochs_df[TIME].iloc[0] == -200 and epochs_df[TIME].dtype == np.int64
+    assert list(epochs_df["categorical"].unique()) == ["cat0", "cat1"]
+
+    # reproducible chunk by chunk
+    chunks2, _ = fake_data.generate_epochs(
+        n_epochs=25, n_samples=100, n_channels=8, chunk_epochs=10, dtype=dtype, seed=1
+    )
+    next(chunks2)
+    pd.testing.assert_frame_equal(next(chunks2), chunks[1])
+
+
+def test_generate_epochs_signal():
+
+    chunks, channels = fake_data.generate_epochs(
+        n_epochs=400, n_samples=250, n_channels=4, artifact_rate=0.1, seed=0
+    )
+    epochs_df = next(chunks)
+    data = epochs_df[channels].to_numpy().reshape(400, 250, 4)
+    blinks = epochs_df.groupby(EPOCH_ID)["eeg_artifact"].first().to_numpy() == 1
+    assert 0.05 < blinks.mean() < 0.15
+    assert np.abs(data[blinks]).max() > 3 * np.abs(data[~blinks]).max()
+
+    # 1/f background, more power at low frequencies
+    power = np.abs(np.fft.rfft(data[~blinks], axis=1)) ** 2
+    assert power[:, 2:6].mean() > 4 * power[:, 40:60].mean()
+
+    # P3-like bump at 350 ms bigger for cat1
+    p3 = epochs_df[epochs_df[TIME] == 348].groupby("categorical")[channels].mean()
+    assert (p3.loc["cat1"] > p3.loc["cat0"]).all() and (p3.loc["cat0"] > 0).all()
+
+
+def test_write_epochs(tmp_path):
+
+    epochs_f = tmp_path / "fake.epochs.feather"
+    channels = fake_data.write_epochs(epochs_f, 25, 100, 8, chunk_epochs=10, seed=1)
+    chunks, _ = fake_data.generate_epochs(25, 100, 8, chunk_epochs=10, seed=1)
+    expected = pd.concat(chunks, ignore_index=True)
+    epochs_df = epf.read_epochs(epochs_f, categorical=False)
+    pd.testing.assert_frame_equal(epochs_df, expected)
+    assert list(epochs_df.columns[-len(channels) :]) == channels
@@ -4,7 +4,6 @@ import pytest
 import spudtr.filters as filters
 import matplotlib.pyplot as plt
 
-
 xfve = pytest.mark.xfail(strict=True, reason=ValueError)
 
 
@@ -122,6 +121,15 @@ def test_fir_filter_dt(_ftype, _cutoff_hz, _window):
         elif isinstance(dt, np.ndarray):
             assert filt_dt.dtype.names == ("fakedata",)
 
+        # the input is left alone unless inplace
+        assert np.array_equal(dt["fakedata"], y)
+        inplace_dt = dt.copy()
+        assert (
+            filters.fir_filter_dt(inplace_dt, ["fakedata"], inplace=True, **_params)
+            is None
+        )
+        assert np.array_equal(inplace_dt["fakedata"], filt_dt["fakedata"])
+
     # np.array should fail
     with pytest.raises(TypeError) as excinfo:
         filt_dt = filters.fir_filter_dt(y, ["fakedata"], **_params)
@@ -247,6 +255,44 @@ def test__apply_firwin_filter_data():
     assert "filter I/O length mismatch" in str(excinfo.value)
 
 
+@pytest.mark.parametrize("_batch_bytes", (filters.FFT_BATCH_BYTES, 64))
+@pytest.mark.parametrize("_engine", ("auto", "fft", "overlap-add"))
+@pytest.mark.parametrize(
+    "_shape,_axis", [((1000,), 0), ((3, 400, 2), 1), ((400, 3, 2), 0)]
+)
+def test__apply_firwin_filter_data_engines(
+    monkeypatch, _engine, _shape, _axis, _batch_bytes
+):
+    monkeypatch.setattr(filters, "FFT_BATCH_BYTES", _batch_bytes)
+    taps = filters._design_firwin_filter(
+        ftype="highpass",
+        cutoff_hz=2.0,
+        sfreq=250,
+        width_hz=1.0,
+        ripple_db=53,
+        window="kaiser",
+    )
+    assert len(taps) > 64  # too long for auto to use direct
+
+    data = np.random.default_rng(0).normal(size=_shape)
+    direct = filters._apply_firwin_filter_data(data, taps, axis=_axis, engine="direct")
+    filt_data = filters._apply_firwin_filter_data(
+        data, taps, axis=_axis, engine=_engine
+    )
+    assert filt_data.shape == data.shape
+    assert np.allclose(direct, filt_data)
+
+    with pytest.raises(ValueError) as excinfo:
+        filters._apply_firwin_filter_data(data, taps, axis=_axis, engine="Xfft")
+    assert "engine=Xfft, must be one of" in str(excinfo.value)
+
+
+def test__choose_engine():
+    assert filters._choose_engine(n_samples=10_000, n_taps=31) == "direct"
+    assert filters._choose_engine(n_samples=10_000, n_taps=501) == "fft"
+    assert filters._choose_engine(n_samples=1_000_000, n_taps=501) == "overlap-add"
+
+
 @pytest.mark.parametrize("window_type", ("kaiser", "hamming", "hann", "blackman"))
 def test_fir_filter_data(window_type):
     # creat a fakedata to show the filter
@@ -323,3 +369,159 @@ def test_filters_effect(_ftype, _cutoff_hz):
     )
     plt.clf()
     plt.close("all")
+
+
+def test_design_cache(tmp_path):
+    _params = dict(
+        ftype="bandpass",
+        cutoff_hz=[10, 20],
+        sfreq=250,
+        width_hz=5,
+        ripple_db=60,
+        window="kaiser",
+    )
+    filters.clear_design_cache()
+    taps = filters._design_firwin_filter(**_params)
+    assert not taps.flags.writeable
+
+    # same design, normalized parameters
+    _params.update(cutoff_hz=np.array([10.0, 20.0]), sfreq=250.0)
+    assert filters._design_firwin_filter(**_params) is taps
+    _params_case = dict(_params, ftype="Bandpass", window="KAISER")
+    assert filters._design_firwin_filter(**_params_case) is taps
+    info = filters.design_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 1, 1)
+
+    # on-disk store
+    filters.set_design_cache_dir(tmp_path)
+    try:
+        filters.clear_design_cache()
+        taps_2 = filters._design_firwin_filter(**_params)
+        assert len(list(tmp_path.glob("*.npy"))) == 1
+
+        filters.clear_design_cache()
+        taps_3 = filters._design_firwin_filter(**_params)
+        assert filters.design_cache_info().disk_hits == 1
+        assert np.array_equal(taps, taps_2) and np.array_equal(taps, taps_3)
+    finally:
+        filters.set_design_cache_dir(None)
+
+    # the store is best-effort, missing directories are made, ones that
+    # can't be fall back to memory
+    not_a_dir = tmp_path / "not_a_dir"
+    not_a_dir.touch()
+    for cache_dir, stored in [
+        (tmp_path / "new" / "dir", True),
+        (not_a_dir / "x", False),
+    ]:
+        filters.set_design_cache_dir(cache_dir)
+        try:
+            filters.clear_design_cache()
+            if stored:
+                taps_4 = filters._design_firwin_filter(**_params)
+            else:
+                with pytest.warns(UserWarning, match="filter design not stored"):
+                    taps_4 = filters._design_firwin_filter(**_params)
+            assert np.array_equal(taps, taps_4)
+            assert cache_dir.is_dir() == stored
+            assert len(list(tmp_path.glob("**/*.npy"))) == 2
+        finally:
+            filters.set_design_cache_dir(None)
+
+    # bad parameters are not cached
+    with pytest.raises(ValueError):
+        filters._design_firwin_filter(**dict(_params, window="Xkaiser"))
+    with pytest.raises(ValueError):
+        filters._design_firwin_filter(**dict(_params, cutoff_hz="_nn"))
+
+
+@pytest.mark.parametrize("_shape", [(2000,), (2000, 3)])
+def test_streaming_fir_filter(_shape):
+    _params = dict(
+        ftype="bandpass",
+        cutoff_hz=[1, 20],
+        sfreq=250,
+        width_hz=2,
+        ripple_db=53,
+        window="hamming",
+    )
+    data = np.random.default_rng(0).normal(size=_shape)
+    expected = np.stack(
+        [filters.fir_filter_data(col, **_params) for col in data.reshape(2000, -1).T],
+        axis=1,
+    ).reshape(_shape)
+
+    stream_filter = filters.StreamingFIRFilter(**_params)
+    assert stream_filter.delay > 50  # first chunks are shorter than the delay
+
+    # uneven chunks, twice to check the reset
+    for _ in range(2):
+        bounds = [0, 7, 30, 31, 500, 1003, 1004, 1500, 2000]
+        filtered = [
+            stream_filter.filter(data[start:stop])
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        assert len(stream_filter._tail) == stream_filter.delay
+        filtered.append(stream_filter.flush())
+        filtered = np.concatenate(filtered)
+        assert filtered.shape == data.shape
+        assert np.allclose(filtered, expected)
+
+    with pytest.raises(ValueError) as excinfo:
+        stream_filter.filter(data[:10])
+        stream_filter.flush()
+    assert "shorter than the filter delay" in str(excinfo.value)
+
+
+@pytest.mark.parametrize(
+    "_ftype,_cutoff_hz,_multirate",
+    [
+        ("lowpass", 1.0, True),
+        ("highpass", 0.3, True),
+        ("bandpass", [0.3, 30.0], False),  # falls back to full rate
+        ("bandstop", [0.5, 2.0], False),
+        ("lowpass", 40.0, False),  # too high to decimate
+    ],
+)
+def test_fir_filter_data_multirate(_ftype, _cutoff_hz, _multirate):
+    _params = dict(
+        ftype=_ftype,
+        cutoff_hz=_cutoff_hz,
+        sfreq=500.0,
+        width_hz=0.2,
+        ripple_db=53.0,
+        window="kaiser",
+    )
+    _fp = filters.check_filter_params(**_params)
+    q = filters._multirate_factor(**_fp)
+    assert (q >= filters.MULTIRATE_MIN_FACTOR) == _multirate
+
+    # sinusoids in the pass and stop bands, clear of the transitions
+    freqs = np.array([0.0, 0.05, 0.7, 1.5, 10.0, 50.0])
+    lo_hz, hi_hz = np.array(_cutoff_hz).min(), np.array(_cutoff_hz).max()
+    passed = {
+        "lowpass": freqs < lo_hz,
+        "highpass": freqs > hi_hz,
+        "bandpass": (freqs > lo_hz) & (freqs < hi_hz),
+        "bandstop": (freqs < lo_hz) | (freqs > hi_hz),
+    }[_ftype]
+
+    sfreq = _params["sfreq"]
+    times = np.arange(int(sfreq * 200)) / sfreq
+    sins = np.cos(2.0 * np.pi * freqs[:, None] * times + 0.3)
+    data = sins.sum(axis=0)
+    expected = sins[passed].sum(axis=0)
+
+    filtered = filters.fir_filter_data(data, multirate=True, **_params)
+    assert filtered.shape == data.shape
+
+    # interior is within the ripple for each of the sinusoids
+    n_edge = len(filters._design_firwin_filter(**_fp))
+    errs = np.abs(filtered - expected)[n_edge:-n_edge]
+    assert errs.max() < 3 * 10 ** (-_params["ripple_db"] / 20) * len(freqs)
+
+    # columns of a DataFrame
+    dt = pd.DataFrame({"a": data, "b": -data})
+    filt_dt = filters.fir_filter_dt(dt, ["a", "b"], multirate=True, **_params)
+    assert np.array_equal(filt_dt["a"], filtered)
+    assert np.allclose(filt_dt["b"], -filtered)
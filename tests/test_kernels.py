@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from scipy import ndimage
+from spudtr import _kernels, filters
+
+# compiled kernels if the extension is built
+try:
+    from spudtr import _spudtr
+except ImportError:
+    _spudtr = None
+
+KERNELS = [
+    _kernels,
+    pytest.param(
+        _spudtr,
+        marks=pytest.mark.skipif(_spudtr is None, reason="extension not built"),
+    ),
+]
+
+
+@pytest.fixture
+def epochs_data():
+    data = np.random.default_rng(0).normal(size=(20, 50, 3))
+    data[3, 10, 1] = np.nan
+    return data
+
+
+@pytest.mark.parametrize("kernels", KERNELS)
+def test_baseline_means(kernels, epochs_data):
+    means = kernels.baseline_means(epochs_data, 5, 20)
+    assert means.shape == (20, 3)
+    assert np.allclose(means, epochs_data[:, 5:20, :].mean(axis=1), equal_nan=True)
+    assert np.isnan(means[3, 1]) and np.isnan(means).sum() == 1
+
+    for start, stop in [(20, 20), (20, 5), (-1, 5), (5, 51)]:
+        with pytest.raises(ValueError) as excinfo:
+            kernels.baseline_means(epochs_data, start, stop)
+        assert "empty or out of bounds" in str(excinfo.value)
+
+
+@pytest.mark.parametrize("kernels", KERNELS)
+def test_peak_to_peak(kernels, epochs_data):
+    ptps = kernels.peak_to_peak(epochs_data, 0, 50)
+    assert np.array_equal(ptps, np.ptp(epochs_data, axis=1), equal_nan=True)
+    assert np.isnan(ptps[3, 1]) and np.isnan(ptps).sum() == 1
+
+    # NaN at the start of the slice
+    ptps = kernels.peak_to_peak(epochs_data, 10, 12)
+    assert np.isnan(ptps[3, 1])
+    assert np.array_equal(
+        ptps, np.ptp(epochs_data[:, 10:12, :], axis=1), equal_nan=True
+    )
+
+
+@pytest.mark.parametrize("kernels", KERNELS)
+def test_grid_rows(kernels):
+    n_epochs, n_times = 4, 3
+    epoch_codes = np.repeat(np.arange(n_epochs), n_times)
+    time_codes = np.tile(np.arange(n_times), n_epochs)
+
+    rows = kernels.grid_rows(epoch_codes, time_codes, n_epochs, n_times)
+    assert np.array_equal(rows, np.arange(n_epochs * n_times))
+
+    order = np.random.default_rng(0).permutation(n_epochs * n_times)
+    rows = kernels.grid_rows(epoch_codes[order], time_codes[order], n_epochs, n_times)
+    assert np.array_equal(order[rows], np.arange(n_epochs * n_times))
+
+    # missing and duplicate
+    assert kernels.grid_rows(epoch_codes[1:], time_codes[1:], n_epochs, n_times) is None
+    time_codes[1] = 0
+    assert kernels.grid_rows(epoch_codes, time_codes, n_epochs, n_times) is None
+
+
+@pytest.mark.parametrize("kernels", KERNELS)
+@pytest.mark.parametrize("n_samples", [10, 79, 80, 1000, 5000])
+def test_fir_symmetric(kernels, n_samples):
+    taps = filters._design_firwin_filter(
+        ftype="bandpass",
+        cutoff_hz=[1, 20],
+        sfreq=250,
+        width_hz=5,
+        ripple_db=53,
+        window="kaiser",
+    )
+    data = np.random.default_rng(0).normal(size=(4, n_samples))
+    filtered = kernels.fir_symmetric(data, taps)
+    assert np.allclose(filtered, ndimage.convolve1d(data, taps, mode="reflect"))
+
+    with pytest.raises(ValueError) as excinfo:
+        kernels.fir_symmetric(data, taps[1:])
+    assert "odd length" in str(excinfo.value)
@@ -1,8 +1,11 @@
+import os
 import pytest
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 import patsy
-from spudtr import DATA_DIR, mneutils, get_demo_df, RESOURCES_DIR
+from spudtr import DATA_DIR, epf, mneutils, get_demo_df, RESOURCES_DIR
+import spudtr.fake_epochs_data as fake_data
 
 epochs_df = get_demo_df("sub000p3.ms100.epochs.feather")
 
@@ -111,3 +114,237 @@ def test_categories2eventid():
     with pytest.raises(ValueError) as excinfo:
         mneutils.categories2eventid(epochs_df, categories, epoch_id, time, time_stamp)
     assert "time_stamp" in str(excinfo.value)
+
+
+def test_read_spudtr_epochs_data(tmp_path):
+
+    eeg_streams = ["MiPf", "MiCe", "MiPa", "MiOc"]
+    fake_df, channels = fake_data._generate(
+        n_epochs=5,
+        n_samples=20,
+        n_categories=2,
+        n_channels=len(eeg_streams),
+        time="time_ms",
+        epoch_id="epoch_id",
+        seed=0,
+    )
+    fake_df = fake_df.rename(columns=dict(zip(channels, eeg_streams)))
+
+    # row order doesn't matter
+    input_fname = tmp_path / "fake.epochs.feather"
+    fake_df.sample(frac=1, random_state=0).reset_index(drop=True).to_feather(
+        input_fname
+    )
+
+    epochs = mneutils.read_spudtr_epochs(
+        input_fname,
+        eeg_streams,
+        RESOURCES_DIR / "mne_32chan_xyz_spherical.yml",
+        "categorical",
+        0,
+        "epoch_id",
+        "time_ms",
+        0.004,
+    )
+    assert epochs.info["sfreq"] == 250.0
+    assert epochs.ch_names == eeg_streams
+
+    # MNE epochs x channels x times, epochs in the events order
+    expected = (
+        fake_df.set_index(["epoch_id", "time_ms"])[eeg_streams]
+        .to_numpy()
+        .reshape(10, 20, 4)
+        .transpose(0, 2, 1)[epochs.events[:, 0]]
+    )
+    assert np.allclose(epochs.get_data(), expected)
+
+
+@pytest.mark.parametrize(
+    "_categories", ["a", ["a", "b"], ["b", "a"], ["a", "b", "c"], ["c", "a"]]
+)
+def test_categories2eventid_patsy(_categories):
+
+    rng = np.random.default_rng(0)
+    n_epochs, times = 60, np.arange(-2, 3)
+    epochs_df = pd.DataFrame(
+        {
+            "item": np.repeat(np.arange(100, 100 + n_epochs), len(times)),
+            "time_s": np.tile(times, n_epochs),
+            "a": rng.choice(["a2", "a1"], n_epochs * len(times)),
+            "b": rng.choice([3, 1, 2], n_epochs * len(times)),
+            "c": np.repeat(rng.choice(["yes", "no"], n_epochs), len(times)),
+        }
+    )
+    # category order and a level that never occurs are design matrix columns
+    epochs_df["c"] = pd.Categorical(epochs_df["c"], categories=["yes", "no", "maybe"])
+
+    eventids = mneutils.categories2eventid(
+        epochs_df, _categories, "item", "time_s", [0, -2]
+    )
+    assert len(eventids) == 2
+
+    categories = [_categories] if isinstance(_categories, str) else _categories
+    for time_stamp, (mne_event_id, mne_events) in zip([0, -2], eventids):
+        events_df = epochs_df[epochs_df["time_s"] == time_stamp].copy()
+        for cat in categories:
+            events_df[cat] = pd.Categorical(events_df[cat])
+        dm = patsy.dmatrix("~ 0 + " + ":".join(categories), events_df)
+        dm_codes = np.asarray(dm).argmax(axis=1) + 1
+        dm_event_id = {
+            label: code
+            for code, label in enumerate(dm.design_info.column_names, 1)
+            if code in dm_codes
+        }
+        assert mne_event_id == dm_event_id
+        assert list(mne_event_id) == list(dm_event_id)
+        assert np.array_equal(mne_events[:, 0], events_df["item"])
+        assert np.array_equal(mne_events[:, 2], dm_codes)
+
+    # single time stamp and row order
+    mne_event_id, mne_events = mneutils.categories2eventid(
+        epochs_df.sample(frac=1, random_state=0), _categories, "item", "time_s", -2
+    )
+    assert mne_event_id == eventids[1][0]
+    assert np.array_equal(mne_events[np.argsort(mne_events[:, 0])], eventids[1][1])
+
+    with pytest.raises(ValueError) as excinfo:
+        mneutils.categories2eventid(epochs_df, _categories, "item", "time_s", [0, 9])
+    assert "time_stamp 9 not found" in str(excinfo.value)
+
+
+def test_streams2mne_digmont_cache(tmp_path):
+
+    eeg_streams = ["MiPf", "MiCe", "MiPa", "MiOc"]
+    eeg_locations_f = tmp_path / "cap.yml"
+    eeg_locations_f.write_text(
+        (RESOURCES_DIR / "mne_32chan_xyz_spherical.yml").read_text()
+    )
+
+    mneutils.clear_montage_cache()
+    montage = mneutils._streams2mne_digmont(eeg_streams, eeg_locations_f)
+    assert mneutils._read_eeg_locations.cache_info().misses == 1
+
+    # new copies of the memoized montage, parsed once
+    montage2 = mneutils._streams2mne_digmont(eeg_streams, eeg_locations_f)
+    assert montage2 is not montage and montage2 == montage
+    assert mneutils._cached_digmont.cache_info().hits == 1
+    mneutils._streams2mne_digmont(eeg_streams[:2], eeg_locations_f)
+    assert mneutils._read_eeg_locations.cache_info().misses == 1
+
+    # same locations from the precompiled binary file
+    npz_f = mneutils.compile_eeg_locations(eeg_locations_f)
+    assert npz_f == tmp_path / "cap.npz"
+    assert mneutils._streams2mne_digmont(eeg_streams, npz_f) == montage
+
+    # file changes are picked up
+    ch_pos = montage.get_positions()["ch_pos"]
+    eeg_locations_f.write_text(eeg_locations_f.read_text().replace("MiPf:", "XXXX:"))
+    os.utime(eeg_locations_f, ns=(0, eeg_locations_f.stat().st_mtime_ns + 10**9))
+    montage = mneutils._streams2mne_digmont(["XXXX", "MiCe"], eeg_locations_f)
+    assert np.array_equal(montage.get_positions()["ch_pos"]["XXXX"], ch_pos["MiPf"])
+    with pytest.raises(ValueError) as excinfo:
+        mneutils._streams2mne_digmont(eeg_streams, eeg_locations_f)
+    assert "eeg_streams not found in cap" in str(excinfo.value)
+
+
+def test_read_spudtr_epochs_inputs(tmp_path):
+
+    eeg_streams = ["MiPf", "MiCe", "MiPa", "MiOc"]
+    fake_df, channels = fake_data._generate(
+        n_epochs=5,
+        n_samples=20,
+        n_categories=2,
+        n_channels=len(eeg_streams),
+        time="time_ms",
+        epoch_id="epoch_id",
+        seed=0,
+    )
+    fake_df = fake_df.rename(columns=dict(zip(channels, eeg_streams)))
+    fake_df["dblock_path"] = "wide/unused/metadata"  # never read
+
+    input_fname = tmp_path / "fake.epochs.feather"
+    fake_df.to_feather(input_fname)
+    args = (
+        eeg_streams,
+        RESOURCES_DIR / "mne_32chan_xyz_spherical.yml",
+        "categorical",
+        0,
+        "epoch_id",
+        "time_ms",
+        0.004,
+    )
+
+    columns = mneutils._epochs_columns(
+        eeg_streams, "categorical", "epoch_id", "time_ms"
+    )
+    assert columns == ["epoch_id", "time_ms", "categorical"] + eeg_streams
+    assert list(mneutils._read_epochs_input(input_fname, columns)) == columns
+
+    epochs = mneutils.read_spudtr_epochs(input_fname, *args)
+    for epochs_input in [fake_df, pa.Table.from_pandas(fake_df), str(input_fname)]:
+        epochs2 = mneutils.read_spudtr_epochs(epochs_input, *args)
+        assert np.array_equal(epochs2.get_data(), epochs.get_data())
+        assert np.array_equal(epochs2.events, epochs.events)
+        assert epochs2.event_id == epochs.event_id
+
+    for epochs_input in [input_fname, pa.Table.from_pandas(fake_df)]:
+        with pytest.raises(ValueError) as excinfo:
+            mneutils.read_spudtr_epochs(epochs_input, eeg_streams + ["LLPf"], *args[1:])
+        assert "LLPf" in str(excinfo.value)
+
+
+def test_to_spudtr_epochs():
+
+    eeg_streams = ["MiPf", "MiCe", "MiPa", "MiOc"]
+    fake_df, channels = fake_data._generate(
+        n_epochs=5,
+        n_samples=20,
+        n_categories=2,
+        n_channels=len(eeg_streams),
+        time="time_ms",
+        epoch_id="epoch_id",
+        seed=0,
+    )
+    fake_df = fake_df.rename(columns=dict(zip(channels, eeg_streams)))
+    fake_df["epoch_id"] += 100
+
+    epochs = mneutils.read_spudtr_epochs(
+        fake_df,
+        eeg_streams,
+        RESOURCES_DIR / "mne_32chan_xyz_spherical.yml",
+        "categorical",
+        0,
+        "epoch_id",
+        "time_ms",
+        0.004,
+    )
+    epochs_df = mneutils.to_spudtr_epochs(
+        epochs, epoch_id="epoch_id", time="time_ms", time_unit=0.004
+    )
+    layout = epf.check_epochs(epochs_df, eeg_streams, "epoch_id", "time_ms")
+    assert layout.is_sorted
+    assert epochs_df["time_ms"].dtype == np.int64
+
+    # same data, rows in the events order
+    expected = (
+        fake_df.set_index(["epoch_id", "time_ms"])
+        .loc[epochs_df.set_index(["epoch_id", "time_ms"]).index, eeg_streams]
+        .reset_index()
+    )
+    pd.testing.assert_frame_equal(epochs_df, expected)
+
+    # metadata broadcast to every time stamp, channel picks
+    epochs.metadata = pd.DataFrame(
+        {"item": np.arange(len(epochs)), "cond": pd.Categorical(["a", "b"] * 5)}
+    )
+    epochs_df = mneutils.to_spudtr_epochs(
+        epochs, time="time_s", time_unit=1.0, picks=["MiOc", "MiPf"]
+    )
+    assert list(epochs_df) == ["epoch_id", "time_s", "item", "cond", "MiOc", "MiPf"]
+    assert epochs_df["cond"].dtype == "category"
+    assert np.array_equal(epochs_df["item"], np.repeat(np.arange(10), 20))
+    assert np.allclose(epochs_df["time_s"].unique(), epochs.times)
+
+    with pytest.raises(ValueError) as excinfo:
+        mneutils.to_spudtr_epochs(epochs, epoch_id="item")
+    assert "duplicate" in str(excinfo.value)
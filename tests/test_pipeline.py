@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+from spudtr import epf
+import spudtr.fake_epochs_data as fake_data
+from spudtr.epf import EPOCH_ID, TIME
+from spudtr.pipeline import Pipeline
+
+import pytest
+
+FILTER_PARAMS = dict(
+    ftype="lowpass", cutoff_hz=25.0, width_hz=10.0, ripple_db=53.0, window="kaiser"
+)
+
+
+def _epochs_df(seed=0):
+    epochs_df, channels = fake_data._generate(
+        n_epochs=12,
+        n_samples=100,
+        n_categories=2,
+        n_channels=5,
+        time=TIME,
+        epoch_id=EPOCH_ID,
+        seed=seed,
+    )
+    epochs_df[TIME] = (epochs_df[TIME] - 20) * 4  # 250 Hz, time 0 at sample 20
+    epochs_df["eeg_artifact"] = (epochs_df[EPOCH_ID] % 3 == 1).astype(int)
+    return epochs_df, channels
+
+
+def _sequential(epochs, channels, end_to_end=False, resample=False):
+    # the same steps one epf call at a time
+    epochs = epf.re_reference(epochs, channels[1:], channels[:1], "linked_pair")
+    epochs = epf.center_eeg(epochs, channels, -40, 0)
+    epochs = epf.center_eeg(epochs, channels[2:], -80, 0, mode="median")
+    epochs = epf.drop_bad_epochs(epochs, "eeg_artifact", time=TIME)
+    epochs = epf.fir_filter_epochs(
+        epochs, channels[:3], sfreq=250, by_epoch=not end_to_end, **FILTER_PARAMS
+    )
+    epochs = epf.re_reference(epochs, channels, channels, "common_average")
+    if resample:
+        epochs = epf.resample_epochs(epochs, channels, 125, sfreq=250)
+    return epochs
+
+
+def _pipeline(channels, end_to_end=False, resample=False):
+    pipe = (
+        Pipeline(channels)
+        .check_epochs()
+        .re_reference(channels[1:], channels[:1], "linked_pair")
+        .center_eeg(channels, -40, 0)
+        .center_eeg(channels[2:], -80, 0, mode="median")
+        .drop_bad_epochs("eeg_artifact")
+        .fir_filter_epochs(
+            channels[:3], sfreq=250, by_epoch=not end_to_end, **FILTER_PARAMS
+        )
+        .re_reference(channels, channels, "common_average")
+    )
+    if resample:
+        pipe.resample_epochs(125, sfreq=250)
+    return pipe
+
+
+@pytest.mark.parametrize("end_to_end", [False, True])
+@pytest.mark.parametrize("resample", [False, True])
+def test_pipeline(end_to_end, resample):
+    epochs_df, channels = _epochs_df()
+    expected = _sequential(epochs_df, channels, end_to_end, resample)
+
+    pipe = _pipeline(channels, end_to_end, resample)
+    pipe_df = pipe.run(epochs_df)
+    assert list(pipe_df.columns) == list(expected.columns)
+    assert pipe_df.index.equals(expected.index)
+    assert np.allclose(pipe_df[channels], expected[channels])
+    others = list(epochs_df.columns.difference(channels))
+    pd.testing.assert_frame_equal(pipe_df[others], expected[others])
+
+    assert list(pipe.stage_seconds) == [
+        "validate",
+        "drop_bad_epochs",
+        "load",
+        "re_reference+center_eeg",
+        "center_eeg",
+        "fir_filter_epochs",
+        "re_reference",
+    ] + ["resample_epochs"] * resample + ["output"]
+
+    # shuffled rows, end to end filters run in epoch, time order not row order
+    if not end_to_end:
+        shuffled_df = epochs_df.sample(frac=1, random_state=0)
+        expected = _sequential(shuffled_df, channels, resample=resample)
+        shuffled_pipe_df = pipe.run(shuffled_df)
+        assert shuffled_pipe_df.index.equals(expected.index)
+        assert np.allclose(shuffled_pipe_df[channels], expected[channels])
+
+    epochs = epf.EpochsTensor.from_epochs_df(epochs_df, channels)
+    expected = _sequential(epochs, channels, end_to_end, resample)
+    pipe_epochs = pipe.run(epochs)
+    assert pipe_epochs.streams == expected.streams
+    assert np.allclose(pipe_epochs.times, expected.times)
+    assert np.allclose(pipe_epochs.data, expected.data)
+    assert pipe_epochs.metadata.equals(expected.metadata)
+
+
+def test_pipeline_nan():
+    epochs_df, channels = _epochs_df()
+
+    # NaN in a stream nothing references and in a common average ref
+    epochs_df.loc[epochs_df.index[130], channels[4]] = np.nan
+    epochs_df.loc[epochs_df.index[260], channels[2]] = np.nan
+
+    expected = epf.re_reference(epochs_df, channels[1:4], channels[:1], "linked_pair")
+    expected = epf.center_eeg(expected, channels, -40, 0)
+    expected = epf.re_reference(expected, channels[:4], channels[1:3], "common_average")
+    pipe = (
+        Pipeline(channels)
+        .re_reference(channels[1:4], channels[:1], "linked_pair")
+        .center_eeg(channels, -40, 0)
+        .re_reference(channels[:4], channels[1:3], "common_average")
+    )
+    for epochs in [epochs_df, epf.EpochsTensor.from_epochs_df(epochs_df, channels)]:
+        pipe_epochs = pipe.run(epochs)
+        assert "re_reference+center_eeg+re_reference" in pipe.stage_seconds
+        if isinstance(epochs, epf.EpochsTensor):
+            pipe_epochs = pipe_epochs.to_epochs_df()
+        assert np.allclose(pipe_epochs[channels], expected[channels], equal_nan=True)
+        # the NaN samples stay put
+        assert pipe_epochs[channels].isna().to_numpy().sum() == 2
+
+
+def test_pipeline_trim_edges():
+    epochs_df, channels = _epochs_df()
+    expected = epf.fir_filter_epochs(
+        epf.center_eeg(epochs_df, channels, -40, 0),
+        channels,
+        sfreq=250,
+        trim_edges=True,
+        by_epoch=True,
+        **FILTER_PARAMS,
+    )
+    expected = epf.center_eeg(expected, channels, 80, 120)
+    pipe = (
+        Pipeline(channels)
+        .center_eeg(channels, -40, 0)
+        .fir_filter_epochs(
+            channels, sfreq=250, trim_edges=True, by_epoch=True, **FILTER_PARAMS
+        )
+        .center_eeg(channels, 80, 120)
+    )
+    pipe_df = pipe.run(epochs_df)
+    assert pipe_df.index.equals(expected.index)
+    assert np.allclose(pipe_df[channels], expected[channels])
+    assert pipe_df[TIME].equals(expected[TIME])
+
+
+def test_pipeline_drop_after_end_to_end():
+    # the dropped epochs are filtered end to end first so they stay loaded
+    epochs_df, channels = _epochs_df()
+    expected = epf.drop_bad_epochs(
+        epf.fir_filter_epochs(epochs_df, channels, sfreq=250, **FILTER_PARAMS),
+        "eeg_artifact",
+        time=TIME,
+    )
+    pipe = (
+        Pipeline(channels)
+        .fir_filter_epochs(channels, sfreq=250, **FILTER_PARAMS)
+        .drop_bad_epochs("eeg_artifact")
+    )
+    pipe_df = pipe.run(epochs_df)
+    assert pipe_df.index.equals(expected.index)
+    assert np.allclose(pipe_df[channels], expected[channels])
+    assert list(pipe.stage_seconds) == [
+        "validate",
+        "drop_bad_epochs",
+        "load",
+        "fir_filter_epochs",
+        "output",
+    ]
+
+
+def test_pipeline_not_inplace():
+    epochs_df, channels = _epochs_df()
+    original_df = epochs_df.copy()
+    pipe = Pipeline(channels).center_eeg(channels, -40, 0)
+    pipe.run(epochs_df)
+    pd.testing.assert_frame_equal(epochs_df, original_df)
+
+
+def test_pipeline_errors():
+    epochs_df, channels = _epochs_df()
+
+    with pytest.raises(ValueError, match="missing"):
+        Pipeline(channels[:2]).center_eeg(channels, -40, 0)
+
+    with pytest.raises(ValueError, match="missing"):
+        Pipeline(channels[1:]).re_reference(channels[1:], channels[0], "new_common")
+
+    with pytest.raises(ValueError, match="unknown baseline mode"):
+        Pipeline(channels).center_eeg(channels, -40, 0, mode="mode")
+
+    # the bads are read before any step runs
+    with pytest.raises(ValueError, match="changed by an earlier"):
+        Pipeline(channels + ["eeg_artifact"]).center_eeg(
+            ["eeg_artifact"], -40, 0
+        ).drop_bad_epochs("eeg_artifact")
+
+    with pytest.raises(ValueError, match="bads_column not found"):
+        Pipeline(channels).drop_bad_epochs("bads").run(epochs_df)
+
+    # validated before anything runs
+    with pytest.raises(ValueError):
+        Pipeline(channels + ["not_a_stream"]).center_eeg(channels, -40, 0).run(
+            epochs_df
+        )
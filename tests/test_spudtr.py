@@ -21,3 +21,171 @@ def test_get_demo_df(_url):
 
     _ = spudtr.get_demo_df(test_f, _url)  # download and cache
     _ = spudtr.get_demo_df(test_f, _url)  # read cached
+
+
+@pytest.fixture
+def demo_server(tmp_path, monkeypatch):
+    """local HTTP stand-in for Zenodo serving demo files with byte ranges"""
+
+    import hashlib
+    import io
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import numpy as np
+    import pandas as pd
+
+    files, requests = {}, []
+    for sub in ["p3", "wr"]:
+        n_rows = 2000
+        df = pd.DataFrame({"epoch_id": np.repeat(np.arange(100.0), 20)})
+        for col in spudtr._MKH5_INTERNAL:
+            df[col] = np.arange(n_rows)
+        df["data_group"] = f"sub000{sub}"
+        df["MiPf"] = np.random.default_rng(0).standard_normal(n_rows)
+        fh = io.BytesIO()
+        df.to_feather(fh)
+        files[f"sub000{sub}.ms100.epochs.feather"] = fh.getvalue()
+
+    class Handler(BaseHTTPRequestHandler):
+        truncate = False  # send half the file then hang up
+
+        def do_GET(self):
+            requests.append((self.path, self.headers.get("Range")))
+            body = files.get(self.path.rsplit("/", 1)[-1])
+            if body is None:
+                self.send_error(404)
+                return
+
+            start = 0
+            if self.headers.get("Range"):
+                start = int(self.headers["Range"][len("bytes=") : -1])
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}"
+                )
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(body) - start))
+            self.end_headers()
+            if Handler.truncate:
+                Handler.truncate = False
+                self.wfile.write(body[start : len(body) // 2])
+                self.close_connection = True
+                return
+            self.wfile.write(body[start:])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(spudtr, "DATA_DIR", tmp_path)
+
+    yield dict(
+        url=f"http://127.0.0.1:{server.server_port}/files",
+        files=files,
+        requests=requests,
+        handler=Handler,
+        md5s={f: hashlib.md5(body).hexdigest() for f, body in files.items()},
+    )
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_demo_df_local(demo_server, tmp_path, monkeypatch):
+    import requests
+
+    test_f = "sub000p3.ms100.epochs.feather"
+    url, md5s = demo_server["url"], demo_server["md5s"]
+
+    # interrupted download leaves the chunks received to resume from
+    monkeypatch.setattr(spudtr, "DOWNLOAD_CHUNK_SIZE", 1024)
+    demo_server["handler"].truncate = True
+    with pytest.raises(requests.exceptions.RequestException):
+        spudtr.get_demo_df(test_f, url)
+    n_bytes = (tmp_path / f"{test_f}.part").stat().st_size
+    assert 0 < n_bytes <= len(demo_server["files"][test_f]) // 2
+    assert not (tmp_path / test_f).exists()
+
+    df = spudtr.get_demo_df(test_f, url, manifest={test_f: f"md5:{md5s[test_f]}"})
+    assert demo_server["requests"][-1] == (f"/files/{test_f}", f"bytes={n_bytes}-")
+    assert list(df.columns[:4]) == ["epoch_id", "time_ms", "sub_id", "eeg_artifact"]
+    assert not set(spudtr._MKH5_INTERNAL) & set(df.columns)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [test_f]
+
+    # cached, no request
+    n_requests = len(demo_server["requests"])
+    assert spudtr.get_demo_df(test_f, url).equals(df)
+    assert len(demo_server["requests"]) == n_requests
+
+    # projected reads
+    df2 = spudtr.get_demo_df(test_f, columns=["MiPf"], epoch_ids=[3, 1], start=60)
+    assert list(df2.columns) == ["epoch_id", "time_ms", "MiPf"]
+    assert df2.equals(df.loc[60:79, df2.columns].reset_index(drop=True))
+
+
+def test_get_demo_df_checksum(demo_server, tmp_path):
+
+    test_f = "sub000p3.ms100.epochs.feather"
+    manifest_f = tmp_path / "MD5SUMS"
+    manifest_f.write_text(f"{'0' * 32}  {test_f}\n")
+    with pytest.raises(ValueError) as excinfo:
+        spudtr.get_demo_df(test_f, demo_server["url"], manifest=manifest_f)
+    assert "checksum" in str(excinfo.value)
+    assert list(tmp_path.iterdir()) == [manifest_f]
+
+    manifest_f.write_text(f"{demo_server['md5s'][test_f]} *{test_f}\n")
+    spudtr.get_demo_df(test_f, demo_server["url"], manifest=manifest_f)
+
+
+def test_read_manifest(tmp_path):
+    manifest_f = tmp_path / "MD5SUMS"
+    manifest_f.write_text(
+        f"\n{'0' * 32}  a.feather\n  \nsha256:{'1' * 64} *b.feather\n"
+    )
+    assert spudtr._read_manifest(manifest_f) == {
+        "a.feather": f"md5:{'0' * 32}",
+        "b.feather": f"sha256:{'1' * 64}",
+    }
+
+    manifest_f.write_text(f"{'0' * 32}  a.feather\n{'0' * 32}\n")
+    with pytest.raises(ValueError) as excinfo:
+        spudtr._read_manifest(manifest_f)
+    assert "line 2" in str(excinfo.value)
+
+
+def test_fetch_demo_files(demo_server, tmp_path):
+
+    filenames = list(demo_server["files"])
+    paths = spudtr.fetch_demo_files(
+        filenames + filenames[:1], demo_server["url"], manifest=demo_server["md5s"]
+    )
+    assert paths == {f: tmp_path / f for f in filenames}
+    assert len(demo_server["requests"]) == len(filenames)
+    assert spudtr.get_demo_df(filenames[1])["sub_id"].iloc[0] == "sub000wr"
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "spudtr.epf",
+        "spudtr.filters",
+        "spudtr.mneutils",
+        "spudtr.fake_epochs_data",
+        "spudtr.epochs_plots",
+        "spudtr.epf, spudtr.filters, spudtr.mneutils",
+    ],
+)
+def test_headless_import(module):
+    import subprocess
+    import sys
+
+    # fresh interpreter, only the plotting and MNE functions need them
+    proc = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(' '.join(sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imported = {name.split(".")[0] for name in proc.stdout.split()}
+    assert not imported & {"matplotlib", "tkinter", "_tkinter", "mne"}